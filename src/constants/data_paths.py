@@ -6,5 +6,14 @@ app_data_path = os.getenv("FLET_APP_STORAGE_DATA")
 # Set our path for all stories, and our active story
 stories_directory_path = os.path.join(app_data_path, "stories")
 
+# Lightweight index of all our stories so we don't have to parse every story file on startup
+story_catalog_path = os.path.join(app_data_path, "story_catalog.json")
 
 
+
+
+# Cached parsed widget data of each story, so unchanged widget files aren't reparsed every launch
+parse_cache_path = os.path.join(app_data_path, "parse_cache")
+
+# Cached image tiles of our large canvas drawings, so the client doesn't have to draw every shape
+tile_cache_path = os.path.join(app_data_path, "tile_cache")
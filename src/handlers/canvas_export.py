@@ -0,0 +1,294 @@
+'''
+Headless export of our canvas drawings to PNG, JPEG, or SVG files, at any resolution.
+PNG and JPEG exports are split into bands of rows. Big exports render their bands in a process pool (using all our cores),
+And each band is written out as soon as its ready, so we never hold the whole image in memory.
+PNGs are written by us one band at a time. JPEGs go through a scratch file that Pillow reads through a memory map.
+SVG exports write our paths as vectors.
+'''
+
+import os
+import mmap
+import zlib
+import struct
+import concurrent.futures
+from handlers.canvas_paths import parse_color, flatten_path
+from handlers.spatial_index import path_bounds
+
+
+# Rows per band
+BAND_HEIGHT = 128
+
+# Exports with fewer pixels than this just render on our thread, since starting a process pool costs more than it saves
+PROCESS_POOL_MIN_PIXELS = 2_000_000
+
+# How far outside a band we still look for points, since we don't know their size until we draw them
+POINT_MARGIN = 50
+
+
+# Called by canvas.export_canvas (on a background thread)
+def export_drawing(
+    file_path: str,
+    paths: list,
+    points: list,
+    width: int,
+    height: int,
+    origin_x: float,
+    origin_y: float,
+    scale: float,
+    background: str = None,
+    quality: int = 90,
+    workers: int = None,
+) -> str:
+    ''' Exports a drawing to file_path. The format comes from its extension (.png, .jpg/.jpeg, or .svg). Returns our file path '''
+
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == ".svg":
+        export_svg(file_path, paths, points, width, height, origin_x, origin_y, scale, background)
+
+    elif extension in (".jpg", ".jpeg"):
+        _export_raster(file_path, "JPEG", paths, points, width, height, origin_x, origin_y, scale, background, quality, workers)
+
+    elif extension == ".png":
+        _export_raster(file_path, "PNG", paths, points, width, height, origin_x, origin_y, scale, background, quality, workers)
+
+    else:
+        raise ValueError(f"Unsupported export format: {extension}")
+
+    return file_path
+
+
+def split_bands(paths: list, points: list, height: int, origin_y: float, scale: float) -> list:
+    ''' Splits our image into bands of rows. Returns (band_top, band_height, band_min_y, band_paths, band_points) for each band,
+    Where each band only gets the paths and points that touch it, so we send less to our workers '''
+
+    boxes = [path_bounds(path) for path in paths]
+    bands = []
+    for band_top in range(0, height, BAND_HEIGHT):
+        band_height = min(BAND_HEIGHT, height - band_top)
+        band_min_y = origin_y + band_top / scale
+        band_max_y = origin_y + (band_top + band_height) / scale
+
+        band_paths = [path for path, box in zip(paths, boxes) if box is not None and box[1] <= band_max_y and box[3] >= band_min_y]
+        band_points = [point for point in points if band_min_y - POINT_MARGIN <= point[1] <= band_max_y + POINT_MARGIN]
+
+        bands.append((band_top, band_height, band_min_y, band_paths, band_points))
+
+    return bands
+
+
+def _export_raster(file_path, image_format, paths, points, width, height, origin_x, origin_y, scale, background, quality, workers):
+    ''' Renders our drawing band by band, writing each band to our file as it finishes '''
+
+    background_color = parse_color(background) if background else None
+
+    jobs = [
+        (band_top, band_height, band_paths, band_points, width, origin_x, band_min_y, scale, background_color, image_format)
+        for band_top, band_height, band_min_y, band_paths, band_points in split_bands(paths, points, height, origin_y, scale)
+    ]
+
+    temp_path = file_path + ".tmp"
+    write_bands = _write_png if image_format == "PNG" else _write_jpeg
+
+    # Big exports use all our cores. Bands come back in order, so we write each one as soon as its ready
+    if width * height >= PROCESS_POOL_MIN_PIXELS and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            write_bands(temp_path, width, height, executor.map(render_band, jobs), quality)
+
+    else:
+        write_bands(temp_path, width, height, map(render_band, jobs), quality)
+
+    os.replace(temp_path, file_path)
+
+
+def _write_png(file_path, width, height, bands, quality):
+    ''' Writes an RGBA PNG one band at a time. Each band is compressed and written as its own chunk, then thrown away '''
+
+    compressor = zlib.compressobj(6)
+    row_size = width * 4
+
+    with open(file_path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+
+        for band_top, band_height, band_pixels in bands:
+
+            # Every row starts with its filter type (0, no filter)
+            rows = bytearray()
+            for row in range(band_height):
+                rows += b"\x00"
+                rows += band_pixels[row * row_size:(row + 1) * row_size]
+
+            data = compressor.compress(bytes(rows))
+            if data:
+                f.write(_png_chunk(b"IDAT", data))
+
+        f.write(_png_chunk(b"IDAT", compressor.flush()))
+        f.write(_png_chunk(b"IEND", b""))
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+
+
+def _write_jpeg(file_path, width, height, bands, quality):
+    ''' Writes a JPEG. Pillow has to encode the whole image at once, so our bands go to a scratch file first,
+    Which Pillow reads through a memory map instead of us holding it all in memory '''
+
+    from PIL import Image
+
+    pixels_path = file_path + ".pixels"
+
+    try:
+        with open(pixels_path, "wb") as f:
+            for band_top, band_height, band_pixels in bands:
+                f.write(band_pixels)
+
+        with open(pixels_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pixels:
+            image = Image.frombuffer("RGBX", (width, height), pixels, "raw", "RGBX", 0, 1)
+            image.save(file_path, format="JPEG", quality=quality)
+
+            # Let go of our image before our memory map closes under it
+            del image
+
+    finally:
+        if os.path.exists(pixels_path):
+            os.remove(pixels_path)
+
+
+# Runs in our process pool, so it has to be a top level function
+def render_band(job: tuple) -> tuple:
+    ''' Renders one band of rows. Returns (band_top, band_height, pixel bytes), since raw bytes are cheap to send back from our workers.
+    PNG bands are RGBA. JPEGs have no transparency, so their bands are flattened onto our background (white if we don't have one) '''
+
+    # Only loaded for PNG and JPEG exports, so SVG exports don't need Pillow
+    from PIL import Image
+    from handlers.rasterizer import Raster
+
+    band_top, band_height, paths, points, width, origin_x, origin_y, scale, background, image_format = job
+
+    raster = Raster(width, band_height, origin_x=origin_x, origin_y=origin_y, scale=scale, background=background)
+    raster.draw(paths, points)
+    image = raster.to_image()
+
+    if image_format == "JPEG":
+        flat_image = Image.new("RGB", image.size, background[:3] if background else (255, 255, 255))
+        flat_image.paste(image, mask=image.getchannel("A"))
+        return band_top, band_height, flat_image.convert("RGBX").tobytes()
+
+    return band_top, band_height, image.tobytes()
+
+
+# Called for .svg exports
+def export_svg(file_path, paths, points, width, height, origin_x, origin_y, scale, background=None):
+    ''' Writes our drawing as an SVG. Erased (clear blend mode) strokes become masks over everything drawn before them '''
+
+    temp_path = file_path + ".tmp"
+
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n')
+
+        if background:
+            red, green, blue, alpha = parse_color(background)
+            f.write(f'<rect width="{width}" height="{height}" fill="rgb({red},{green},{blue})" fill-opacity="{alpha / 255:.3f}"/>\n')
+
+        # Everything drawn in canvas coordinates, moved and scaled into our image
+        f.write(f'<g transform="scale({scale:.6g}) translate({-origin_x:.6g} {-origin_y:.6g})">\n')
+
+        # Collect our shapes as strings, wrapping everything so far in a mask whenever we hit an eraser stroke
+        content = [_svg_point(point) for point in points]
+        defs = []
+        for path in paths:
+            paint = path.get('paint', {}) or {}
+
+            if str(paint.get('blend_mode', 'src_over') or 'src_over').split(".")[-1].lower() == 'clear':
+                mask_id = f"erase{len(defs)}"
+                stroke_width = paint.get('stroke_width', 1) or 1
+                defs.append(
+                    f'<mask id="{mask_id}" maskUnits="userSpaceOnUse" x="-1e6" y="-1e6" width="2e6" height="2e6">'
+                    f'<rect x="-1e6" y="-1e6" width="2e6" height="2e6" fill="white"/>'
+                    f'<path d="{_svg_path_data(path)}" fill="none" stroke="black" stroke-width="{stroke_width}" stroke-linecap="round" stroke-linejoin="round"/>'
+                    f'</mask>'
+                )
+                content = [f'<g mask="url(#{mask_id})">'] + content + ['</g>']
+                continue
+
+            content.append(_svg_path(path))
+
+        if defs:
+            f.write("<defs>\n" + "\n".join(defs) + "\n</defs>\n")
+
+        for line in content:
+            f.write(line + "\n")
+
+        f.write("</g>\n</svg>\n")
+
+    os.replace(temp_path, file_path)
+
+
+def _svg_paint(paint: dict, fill: bool) -> str:
+    ''' Returns the SVG attributes for a paint '''
+
+    red, green, blue, alpha = parse_color(paint.get('color', None))
+    color = f"rgb({red},{green},{blue})"
+    opacity = f"{alpha / 255:.3f}"
+
+    if fill:
+        return f'fill="{color}" fill-opacity="{opacity}" stroke="none"'
+
+    attributes = f'fill="none" stroke="{color}" stroke-opacity="{opacity}" stroke-width="{paint.get("stroke_width", 1) or 1}"'
+
+    stroke_cap = str(paint.get('stroke_cap', '') or '').split(".")[-1].lower()
+    if stroke_cap in ("butt", "round", "square"):
+        attributes += f' stroke-linecap="{stroke_cap}"'
+
+    stroke_join = str(paint.get('stroke_join', '') or '').split(".")[-1].lower()
+    if stroke_join in ("miter", "round", "bevel"):
+        attributes += f' stroke-linejoin="{stroke_join}"'
+
+    dash_pattern = paint.get('stroke_dash_pattern', None)
+    if dash_pattern:
+        attributes += f' stroke-dasharray="{" ".join(str(value) for value in dash_pattern)}"'
+
+    return attributes
+
+
+def _svg_path_data(path: dict) -> str:
+    ''' Returns the SVG path data (d attribute) for one of our paths '''
+
+    commands = []
+    for element in path.get('elements', []):
+        element_type = element.get('type', None)
+
+        if element_type == 'moveto':
+            commands.append(f"M{element['x']:.6g} {element['y']:.6g}")
+
+        elif element_type == 'lineto':
+            commands.append(f"L{element['x']:.6g} {element['y']:.6g}")
+
+        elif element_type == 'arcto':
+            radius = element.get('radius', 0) or 0
+            large_arc = 1 if element.get('large_arc', False) else 0
+            sweep = 1 if element.get('clockwise', True) else 0
+            commands.append(f"A{radius:.6g} {radius:.6g} {element.get('rotation', 0) or 0:.6g} {large_arc} {sweep} {element['x']:.6g} {element['y']:.6g}")
+
+        # Arcs are their own subpath, so we draw them as short lines
+        elif element_type == 'arc':
+            arc_points = flatten_path([element])[0]
+            commands.append(f"M{arc_points[0][0]:.6g} {arc_points[0][1]:.6g}")
+            commands.extend(f"L{x:.6g} {y:.6g}" for x, y in arc_points[1:])
+
+    return " ".join(commands)
+
+
+def _svg_path(path: dict) -> str:
+    paint = path.get('paint', {}) or {}
+    fill = str(paint.get('style', 'stroke') or 'stroke').endswith('fill')
+    return f'<path d="{_svg_path_data(path)}" {_svg_paint(paint, fill)}/>'
+
+
+def _svg_point(point) -> str:
+    paint = point[3] if len(point) > 3 and point[3] else {}
+    red, green, blue, alpha = parse_color(paint.get('color', None))
+    radius = (paint.get('stroke_width', 1) or 1) / 2
+    return f'<circle cx="{point[0]:.6g}" cy="{point[1]:.6g}" r="{radius:.6g}" fill="rgb({red},{green},{blue})" fill-opacity="{alpha / 255:.3f}"/>'
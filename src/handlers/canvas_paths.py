@@ -0,0 +1,142 @@
+'''
+Helpers for reading the path and point dicts our canvases store: turning their paint colors into RGBA,
+And flattening their elements (moveto, lineto, arcto, arc) into plain points. Used by our rasterizer and our exports.
+Nothing here needs Pillow, so SVG exports never load it.
+'''
+
+import math
+
+
+# Colors we know by name. Anything else we can't parse is drawn black
+NAMED_COLORS = {
+    'black': (0, 0, 0), 'white': (255, 255, 255), 'red': (244, 67, 54), 'pink': (233, 30, 99),
+    'purple': (156, 39, 176), 'deeppurple': (103, 58, 183), 'indigo': (63, 81, 181), 'blue': (33, 150, 243),
+    'lightblue': (3, 169, 244), 'cyan': (0, 188, 212), 'teal': (0, 150, 136), 'green': (76, 175, 80),
+    'lightgreen': (139, 195, 74), 'lime': (205, 220, 57), 'yellow': (255, 235, 59), 'amber': (255, 193, 7),
+    'orange': (255, 152, 0), 'deeporange': (255, 87, 34), 'brown': (121, 85, 72), 'grey': (158, 158, 158),
+    'gray': (158, 158, 158), 'bluegrey': (96, 125, 139), 'surface': (18, 18, 18), 'primary': (33, 150, 243),
+}
+
+
+# Called when drawing anything with a paint
+def parse_color(color) -> tuple:
+    ''' Turns a flet color ("#RRGGBB", "#AARRGGBB", "red", with an optional ",opacity") into an (r, g, b, a) tuple of 0-255 ints '''
+
+    if not color:
+        return (0, 0, 0, 255)
+
+    opacity = 1.0
+    color = str(color).strip()
+
+    # Our color pickers store opacity after a comma
+    if "," in color:
+        color, opacity_text = color.split(",", 1)
+        try:
+            opacity = float(opacity_text)
+        except ValueError:
+            opacity = 1.0
+
+    color = color.strip().lower()
+    alpha = 255
+
+    if color.startswith("#"):
+        hex_color = color[1:]
+        try:
+            if len(hex_color) == 8:
+                alpha = int(hex_color[0:2], 16)
+                hex_color = hex_color[2:]
+            red, green, blue = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+        except ValueError:
+            red, green, blue = 0, 0, 0
+
+    elif color == "transparent":
+        return (0, 0, 0, 0)
+
+    else:
+        red, green, blue = NAMED_COLORS.get(color.replace("_", "").split(".")[-1], (0, 0, 0))
+
+    return (red, green, blue, max(0, min(255, round(alpha * opacity))))
+
+
+# Called when drawing paths
+def flatten_path(elements: list) -> list:
+    ''' Turns our path elements into lists of (x, y) points (one list per subpath), with arcs broken into short lines '''
+
+    subpaths = []
+    current = None
+
+    for element in elements:
+        element_type = element.get('type', None)
+
+        if element_type == 'moveto':
+            current = [(element['x'], element['y'])]
+            subpaths.append(current)
+
+        elif element_type == 'lineto':
+            if current is None:
+                current = [(element['x'], element['y'])]
+                subpaths.append(current)
+            else:
+                current.append((element['x'], element['y']))
+
+        elif element_type == 'arcto':
+            end = (element['x'], element['y'])
+            if current is None:
+                current = [end]
+                subpaths.append(current)
+            else:
+                current.extend(_arc_to_points(current[-1], end, element.get('radius', 0), element.get('large_arc', False), element.get('clockwise', True)))
+
+        # Arcs start their own subpath, inside their box from x, y
+        elif element_type == 'arc':
+            center_x = element['x'] + element.get('width', 0) / 2
+            center_y = element['y'] + element.get('height', 0) / 2
+            start_angle, sweep_angle = element.get('start_angle', 0), element.get('sweep_angle', 0)
+            steps = max(2, int(abs(sweep_angle) / (math.pi / 16)) + 1)
+
+            current = [
+                (
+                    center_x + element.get('width', 0) / 2 * math.cos(start_angle + sweep_angle * step / steps),
+                    center_y + element.get('height', 0) / 2 * math.sin(start_angle + sweep_angle * step / steps),
+                )
+                for step in range(steps + 1)
+            ]
+            subpaths.append(current)
+
+    return subpaths
+
+
+def _arc_to_points(start: tuple, end: tuple, radius: float, large_arc: bool, clockwise: bool) -> list:
+    ''' Returns points along a circular arc from start to end (not including start) '''
+
+    chord_x, chord_y = end[0] - start[0], end[1] - start[1]
+    chord = math.hypot(chord_x, chord_y)
+
+    # Too small to be an arc, so its just a line
+    if chord == 0 or not radius:
+        return [end]
+
+    radius = max(abs(radius), chord / 2)
+
+    # Our arcs center is off the middle of our chord, on the side our direction and size pick
+    middle_x, middle_y = (start[0] + end[0]) / 2, (start[1] + end[1]) / 2
+    offset = math.sqrt(max(0.0, radius * radius - (chord / 2) ** 2))
+    side = 1 if large_arc != clockwise else -1
+    center_x = middle_x - side * offset * chord_y / chord
+    center_y = middle_y + side * offset * chord_x / chord
+
+    start_angle = math.atan2(start[1] - center_y, start[0] - center_x)
+    end_angle = math.atan2(end[1] - center_y, end[0] - center_x)
+    sweep = end_angle - start_angle
+
+    # Go the right way around
+    if clockwise and sweep < 0:
+        sweep += 2 * math.pi
+    elif not clockwise and sweep > 0:
+        sweep -= 2 * math.pi
+
+    steps = max(2, int(abs(sweep) / (math.pi / 16)) + 1)
+    return [
+        (center_x + radius * math.cos(start_angle + sweep * step / steps), center_y + radius * math.sin(start_angle + sweep * step / steps))
+        for step in range(1, steps + 1)
+    ]
@@ -5,8 +5,8 @@ def story_is_unique(new_story_title: str, text_field: ft.TextField) -> bool:
     from models.app import app
     
     # Compare against all existing story titles so we don't have any duplicates
-    for story in app.stories.values():
-        if story.title.lower() == new_story_title.lower():
+    for entry in app.story_catalog.entries.values():
+        if entry['title'].lower() == new_story_title.lower():
             text_field.error_text = "Title must be unique"  # Set error text on the text field
             return False
         
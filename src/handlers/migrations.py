@@ -0,0 +1,211 @@
+'''
+Migrations for our widget and story json files, for when the shape of our data changes between versions of the app.
+Every file has a 'schema_version': how many of our migrations it has had. Migrations are kept in the order they were added,
+And each only applies to the tags it was written for. Loading a current file is just one version check.
+Old files are migrated the first time they load, or all at once with:  python -m handlers.migrations <stories folder> [workers]
+Doesn't import flet, so it can run in worker processes.
+'''
+
+import os
+import sys
+import json
+import concurrent.futures
+from handlers import storage
+from handlers.story_paths import Story_Paths
+
+
+# Our migrations, in the order they were added, as (tags it applies to, function).
+# Never reorder or remove one, only add new ones to the end, or files will skip or repeat migrations
+MIGRATIONS: list = []
+
+# Tags of all our widgets that have their own json file
+WIDGET_TAGS = ("chapter", "note", "canvas", "character", "timeline", "map", "world_building")
+
+# Paths stories used to store, that now come from where the story is
+STORY_PATH_KEYS = (
+    'directory_path', 'content_directory_path', 'characters_directory_path', 'timelines_directory_path',
+    'world_building_directory_path', 'maps_directory_path', 'planning_directory_path',
+)
+
+# Files in our story folders that are never widgets or stories
+SKIPPED_FILES = ("workspace_layout.json",)
+SKIPPED_SUFFIXES = ("_text.json", "_display.json")
+
+
+def migration(*tags):
+    ''' Decorator that adds a migration for files with any of these tags to the end of our migrations '''
+
+    def register(function):
+        MIGRATIONS.append((tags, function))
+        return function
+
+    return register
+
+
+# 1. Character connections used to be a dict. Now they are a list of character names
+@migration("character")
+def connections_to_list(data: dict):
+    connections = data.get('connections', None)
+    if isinstance(connections, list):
+        return
+
+    names = []
+    if isinstance(connections, dict):
+        for key, value in connections.items():
+            if isinstance(value, str) and value:
+                names.append(value)
+            elif isinstance(key, str) and key:
+                names.append(key)
+
+    data['connections'] = names
+
+
+# 2. Map sub maps used to be a dict of maps. Now they are a list of sub map titles
+@migration("map")
+def sub_maps_to_titles(data: dict):
+    sub_maps = data.get('sub_maps', None)
+    if isinstance(sub_maps, list):
+        return
+
+    titles = []
+    if isinstance(sub_maps, dict):
+        for key, value in sub_maps.items():
+            if isinstance(value, dict) and value.get('title', None):
+                titles.append(value['title'])
+            else:
+                titles.append(key)
+
+    data['sub_maps'] = titles
+
+
+# 3. Widgets no longer choose which side their mini widgets show on
+@migration(*WIDGET_TAGS)
+def drop_mini_widgets_location(data: dict):
+    data.pop('mini_widgets_location', None)
+
+
+# 4. Story folder metadata was keyed by full paths. Now its keyed relative to our story folder, and our folder paths aren't stored
+@migration("story")
+def relative_story_paths(data: dict):
+    directory_path = data.get('directory_path', None)
+    folders = data.get('folders', None)
+    if directory_path and isinstance(folders, dict):
+        paths = Story_Paths(directory_path)
+        data['folders'] = {paths.relative(key): value for key, value in folders.items()}
+
+    for key in STORY_PATH_KEYS:
+        data.pop(key, None)
+
+
+# 5. Widgets no longer store their key or directory path. Both come from where their file is
+@migration(*WIDGET_TAGS)
+def drop_widget_paths(data: dict):
+    data.pop('key', None)
+    data.pop('directory_path', None)
+
+
+# The version new files start at, and old files are migrated up to
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# Called when a widget or story is built from its data, before its data is verified
+def migrate_data(data: dict) -> bool:
+    ''' Runs the migrations our data hasn't had yet. Returns if anything ran, so the caller knows to save '''
+
+    if not isinstance(data, dict):
+        return False
+
+    version = data.get('schema_version', 0)
+    if not isinstance(version, int) or version < 0:
+        version = 0
+
+    # Current files (and files from newer versions of the app) are left alone
+    if version >= SCHEMA_VERSION:
+        return False
+
+    tag = data.get('tag', None)
+    for tags, function in MIGRATIONS[version:]:
+        if tag in tags:
+            function(data)
+
+    data['schema_version'] = SCHEMA_VERSION
+    return True
+
+
+# Runs in our pool, so it has to be a top level function
+def migrate_file(file_path: str) -> tuple:
+    ''' Migrates one json file in place. Returns (file_path, if it was migrated, error) '''
+
+    try:
+        with open(file_path, "r", encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Only widgets and stories have migrations. Anything else in our folders is left alone
+        if not isinstance(data, dict) or data.get('tag', None) not in WIDGET_TAGS + ("story",):
+            return file_path, False, None
+
+        if not migrate_data(data):
+            return file_path, False, None
+
+        storage.write_json(file_path, data)
+        return file_path, True, None
+
+    except (json.JSONDecodeError, OSError, UnicodeDecodeError) as e:
+        return file_path, False, e
+
+
+def find_json_files(stories_directory: str) -> list:
+    ''' Returns every json file in our stories folder that could be a widget or story '''
+
+    file_paths = []
+    for dirpath, dirnames, filenames in os.walk(stories_directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".json") and filename not in SKIPPED_FILES and not filename.endswith(SKIPPED_SUFFIXES):
+                file_paths.append(os.path.join(dirpath, filename))
+
+    return file_paths
+
+
+# Run with the app closed, so nothing else is writing our files
+def migrate_directory(stories_directory: str, workers: int = 0) -> dict:
+    ''' Migrates every widget and story file under a folder, in parallel. Returns counts of files checked, migrated, and failed '''
+
+    file_paths = find_json_files(stories_directory)
+
+    # Zero means pick for us
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1
+
+    results = []
+    if workers == 1 or len(file_paths) < 8:
+        results = [migrate_file(file_path) for file_path in file_paths]
+    else:
+        chunk_size = max(1, len(file_paths) // (workers * 4))
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(migrate_file, file_paths, chunksize=chunk_size))
+
+        # If our pool can't start (no process support, etc.), just migrate them here
+        except (OSError, RuntimeError, concurrent.futures.BrokenExecutor) as e:
+            print(f"Error starting migration pool, migrating serially: {e}")
+            results = [migrate_file(file_path) for file_path in file_paths]
+
+    counts = {'checked': len(results), 'migrated': 0, 'failed': 0}
+    for file_path, migrated, error in results:
+        if error is not None:
+            counts['failed'] += 1
+            print(f"Error migrating {file_path}: {error}")
+        elif migrated:
+            counts['migrated'] += 1
+
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m handlers.migrations <stories folder> [workers]")
+        sys.exit(1)
+
+    counts = migrate_directory(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    print(f"Checked {counts['checked']} files. Migrated {counts['migrated']} to version {SCHEMA_VERSION}, {counts['failed']} failed")
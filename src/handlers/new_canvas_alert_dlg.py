@@ -133,16 +133,18 @@ def new_canvas_alert_dlg(page: ft.Page, story: Story, directory_path: str=None)
 
         title = title_textfield.value if title_textfield.value != "" else f"Canvas {len(story.canvases) + 1}"
 
-        story.create_canvas(
-            title=title,
-            directory_path=directory_path,
-            data=canvas_data
-        )
-
-        story.data['selected_rail'] = 'canvas'
-        story.save_dict()
-        story.workspaces_rail.reload_rail(story)
-        story.active_rail.display_active_rail(story)
+        # Creating our canvas and switching to our canvas rail both save and refresh, so do it all once
+        with story.batch():
+            story.create_canvas(
+                title=title,
+                directory_path=directory_path,
+                data=canvas_data
+            )
+
+            story.data['selected_rail'] = 'canvas'
+            story.save_dict()
+            story.workspaces_rail.reload_rail(story)
+            story.active_rail.display_active_rail(story)
 
         # Build the canvas here
         alert_dialog.open = False
@@ -0,0 +1,188 @@
+'''
+On disk cache of our already parsed widget files, so we don't reparse every JSON file on every launch (like .pyc files for our story data).
+Each story gets one pickle file holding the parsed data of all its widget files, keyed by file path.
+Every entry remembers the (mtime, size) of the file it came from. If the file on disk doesn't match anymore, we ignore the entry
+and read the JSON file like normal. Broken entries or cache files are treated the same way, so the cache can never give us bad data.
+'''
+
+import os
+import json
+import time
+import pickle
+import threading
+from handlers import storage
+
+
+# Bump this if the layout of our cache file changes, so old caches are ignored
+CACHE_VERSION = 1
+
+# Files changed this recently might change again without their mtime moving, so we don't trust them yet
+RACY_SECONDS = 2.0
+
+
+class Parse_Cache:
+
+    # Constructor. Nothing is read until we first need it
+    def __init__(self, cache_path: str):
+
+        # Where our pickle file is stored
+        self.cache_path: str = cache_path
+
+        # Our entries, keyed by normalized file path. Each is (mtime_ns, size, pickled data)
+        self.entries: dict = {}
+
+        # Paths we've looked up or added this session. Anything else is dropped on save if its file is gone
+        self.used: set = set()
+
+        # If we've read our cache file yet
+        self.loaded: bool = False
+
+        # If we have changes that aren't saved yet
+        self.dirty: bool = False
+
+        # We save on a background thread while the UI thread can still read
+        self.lock = threading.RLock()
+
+        # Counts for checking how well our cache is doing
+        self.stats: dict = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def _key(self, file_path: str) -> str:
+        return os.path.normcase(os.path.abspath(file_path))
+
+    # Called the first time we look anything up
+    def load(self):
+        ''' Reads our cache file. Any problem just leaves us with an empty cache '''
+
+        with self.lock:
+            if self.loaded:
+                return
+
+            self.loaded = True
+
+            try:
+                with open(self.cache_path, "rb") as f:
+                    cache_data = pickle.load(f)
+
+                if isinstance(cache_data, dict) and cache_data.get('version', None) == CACHE_VERSION:
+                    self.entries = cache_data.get('entries', {})
+
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error loading parse cache {self.cache_path}, ignoring it: {e}")
+                self.entries = {}
+
+    # Called before reading a widget file
+    def get(self, file_path: str, stat: os.stat_result = None):
+        ''' Returns a fresh copy of a files parsed data if our entry still matches the file on disk, otherwise None '''
+
+        self.load()
+        key = self._key(file_path)
+
+        with self.lock:
+            self.used.add(key)
+            entry = self.entries.get(key, None)
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            if stat is None:
+                stat = os.stat(file_path)
+
+            # File changed since we cached it
+            if entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                self.stats['stale'] += 1
+                with self.lock:
+                    self.entries.pop(key, None)
+                    self.dirty = True
+                return None
+
+            # Unpickle every time so callers can change their data without changing our cache
+            data = pickle.loads(entry[2])
+
+        # Broken entry or missing file, so let our caller read the file like normal
+        except Exception:
+            with self.lock:
+                self.entries.pop(key, None)
+                self.dirty = True
+            return None
+
+        self.stats['hits'] += 1
+        return data
+
+    # Called after reading and parsing a widget file
+    def put(self, file_path: str, data, stat: os.stat_result = None):
+        ''' Caches the parsed data of a file. Stat should be from before the file was read '''
+
+        self.load()
+
+        try:
+            if stat is None:
+                stat = os.stat(file_path)
+
+            # Too new to trust that its mtime will change with its next write
+            if time.time() - stat.st_mtime < RACY_SECONDS:
+                return
+
+            entry = (stat.st_mtime_ns, stat.st_size, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+        except Exception as e:
+            print(f"Error caching {file_path}: {e}")
+            return
+
+        with self.lock:
+            key = self._key(file_path)
+            self.used.add(key)
+            self.entries[key] = entry
+            self.dirty = True
+
+    # Called by anything that reads a widget file
+    def read_json(self, file_path: str):
+        ''' Returns the parsed data of a JSON file, from our cache if its still good, otherwise from the file. Raises like json.load '''
+
+        stat = os.stat(file_path)
+
+        data = self.get(file_path, stat)
+        if data is not None:
+            return data
+
+        with open(file_path, "r", encoding='utf-8') as f:
+            data = json.load(f)
+
+        self.put(file_path, data, stat)
+        return data
+
+    # Called after loading our story
+    def save(self):
+        ''' Writes our cache file if anything changed, dropping entries for files that don't exist anymore '''
+
+        with self.lock:
+            if not self.dirty:
+                return
+
+            for key in [key for key in self.entries if key not in self.used and not os.path.exists(key)]:
+                del self.entries[key]
+
+            blob = pickle.dumps({'version': CACHE_VERSION, 'entries': self.entries}, protocol=pickle.HIGHEST_PROTOCOL)
+            self.dirty = False
+
+        try:
+            storage.write_bytes(self.cache_path, blob)
+        except Exception as e:
+            print(f"Error saving parse cache {self.cache_path}: {e}")
+
+    # Called when our story is deleted
+    def delete(self):
+        ''' Clears our cache and deletes its file '''
+
+        with self.lock:
+            self.entries.clear()
+            self.used.clear()
+            self.dirty = False
+
+        try:
+            os.remove(self.cache_path)
+        except OSError:
+            pass
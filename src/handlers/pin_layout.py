@@ -0,0 +1,157 @@
+'''
+Layout engine for our workspace pins.
+Works out which visible widgets belong in which pin (and in what order), then changes our pins' control lists with the fewest moves:
+Widgets that left a pin are detached, and widgets that joined or moved are inserted at their index. Pins that already match are never touched,
+So our workspace only has to send the pins that actually changed to the page.
+Doesn't import flet, so it works on any list of objects with 'data' and 'visible' attributes.
+'''
+
+import time
+
+
+# Our five pin locations in our workspace
+PIN_LOCATIONS = ("top", "left", "main", "right", "bottom")
+
+# Pins we steal a widget from (in order) when our main pin would be empty, so we are always fullscreen
+STEAL_ORDER = ("left", "right", "top", "bottom")
+
+
+# Called when arranging our workspace
+def plan_layout(widgets: list) -> dict:
+    ''' Returns a dict of pin location -> ordered list of the visible widgets that belong in it '''
+
+    targets = {pin_location: [] for pin_location in PIN_LOCATIONS}
+
+    # Lets widgets keep their order between sessions
+    for widget in sorted(widgets, key=lambda w: w.data.get('index', 0) or 0):
+
+        # Skip non visible widgets
+        if widget.visible != True:
+            continue
+
+        pin_location = widget.data.get('pin_location', None) if widget.data else None
+
+        # If no valid pin_location, default to main pin
+        if pin_location not in targets:
+            print("Invalid pin location, adding to main pin")
+            pin_location = "main"
+
+        targets[pin_location].append(widget)
+
+    return targets
+
+
+# Called when arranging our workspace, after planning
+def steal_for_main(targets: dict):
+    ''' If our main pin would be empty, moves the last widget of another pin into it. Returns the widget we moved, or None '''
+
+    if targets["main"]:
+        return None
+
+    for pin_location in STEAL_ORDER:
+        if targets[pin_location]:
+            widget = targets[pin_location].pop()
+            targets["main"].append(widget)
+            return widget
+
+    return None
+
+
+def same_controls(controls: list, target: list) -> bool:
+    ''' Returns if a pin already holds exactly our target widgets, in order '''
+    return len(controls) == len(target) and all(control is widget for control, widget in zip(controls, target))
+
+
+# Called when arranging our workspace, after planning
+def apply_layout(pins: dict, targets: dict) -> set:
+    ''' Changes each pins control list to match its target with the fewest moves. Returns the set of pin locations that changed '''
+
+    changed = {pin_location for pin_location, controls in pins.items() if not same_controls(controls, targets[pin_location])}
+
+    # Detach first, so a widget moving between pins is never in two at once.
+    # Controls compare by identity here, since flet controls can compare equal by their fields
+    for pin_location in changed:
+        controls = pins[pin_location]
+        target_ids = {id(widget) for widget in targets[pin_location]}
+        for i in range(len(controls) - 1, -1, -1):
+            if id(controls[i]) not in target_ids:
+                del controls[i]
+
+    # Then insert or reorder. Widgets already in the right spot are skipped
+    for pin_location in changed:
+        controls = pins[pin_location]
+        for i, widget in enumerate(targets[pin_location]):
+            if i < len(controls) and controls[i] is widget:
+                continue
+
+            for j in range(i + 1, len(controls)):
+                if controls[j] is widget:
+                    del controls[j]
+                    break
+
+            controls.insert(i, widget)
+
+    return changed
+
+
+# Run this file directly to benchmark our layout engine against clearing and rebuilding every pin:  python -m handlers.pin_layout
+def benchmark(widget_counts: tuple = (5, 50, 200), repeats: int = 200) -> list:
+    ''' Times moving one widget between pins with both approaches. Returns (widget count, rebuild ms, incremental ms, pins touched) '''
+
+    class Fake_Widget:
+        def __init__(self, pin_location: str, index: int):
+            self.data = {'pin_location': pin_location, 'index': index}
+            self.visible = True
+
+    results = []
+    for widget_count in widget_counts:
+        widgets = [Fake_Widget(PIN_LOCATIONS[i % len(PIN_LOCATIONS)], i // len(PIN_LOCATIONS)) for i in range(widget_count)]
+        pins = {pin_location: [] for pin_location in PIN_LOCATIONS}
+        apply_layout(pins, plan_layout(widgets))
+
+        # Our old approach: clear all pins, re-add every widget, and find each index with list.index
+        def rebuild():
+            for controls in pins.values():
+                controls.clear()
+            for widget in sorted(widgets, key=lambda w: w.data.get('index', 0)):
+                if widget.visible:
+                    controls = pins[widget.data['pin_location']]
+                    controls.append(widget)
+                    widget.data['index'] = controls.index(widget)
+
+        # Move one widget back and forth between the left and right pins
+        def move(arrange) -> int:
+            touched = 0
+            for pin_location in ("right", "left"):
+                widgets[1].data['pin_location'] = pin_location
+                widgets[1].data['index'] = widget_count
+                touched += arrange() or 0
+            return touched
+
+        def incremental() -> int:
+            targets = plan_layout(widgets)
+            for controls in targets.values():
+                for i, widget in enumerate(controls):
+                    widget.data['index'] = i
+            return len(apply_layout(pins, targets))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            move(rebuild)
+        rebuild_time = (time.perf_counter() - start) / (repeats * 2) * 1000
+
+        start = time.perf_counter()
+        touched = 0
+        for _ in range(repeats):
+            touched = move(incremental)
+        incremental_time = (time.perf_counter() - start) / (repeats * 2) * 1000
+
+        # Rebuilding always resends all five pins. We only resend the ones that changed
+        results.append((widget_count, rebuild_time, incremental_time, touched / 2))
+        print(f"{widget_count:>4} widgets   rebuild {rebuild_time:7.3f} ms (5 pins sent)   incremental {incremental_time:7.3f} ms ({touched / 2:.0f} pins sent)")
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
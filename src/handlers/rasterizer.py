@@ -0,0 +1,127 @@
+'''
+Rasterizer for our canvas drawings, so we can turn paths and points into images without the client. Drawing is done with Pillow.
+Draws the same path dicts our canvas stores (moveto, lineto, arcto, arc), and our points, using their paint settings:
+color (with opacity), stroke width, stroke/fill style, and the clear blend mode our erase mode uses.
+Each path is drawn into its own mask first, so overlapping segments of a see-through stroke don't darken each other.
+We draw at double size and scale down, so our edges are anti-aliased. Used for our tile cache and for exporting canvases.
+'''
+
+import io
+from PIL import Image, ImageChops, ImageDraw
+from handlers.canvas_paths import parse_color, flatten_path
+
+
+# How many times bigger than our image we draw, before scaling down to smooth our edges
+SUPERSAMPLE = 2
+
+class Raster:
+
+    # Constructor. Our image is width x height pixels, showing our canvas from (origin_x, origin_y) at scale pixels per canvas unit
+    def __init__(self, width: int, height: int, origin_x: float = 0.0, origin_y: float = 0.0, scale: float = 1.0, background: tuple = None):
+
+        self.width: int = width
+        self.height: int = height
+        self.origin_x: float = origin_x
+        self.origin_y: float = origin_y
+        self.scale: float = scale
+
+        # Our RGBA image, at our supersampled size
+        self.image: Image.Image = Image.new("RGBA", (width * SUPERSAMPLE, height * SUPERSAMPLE), tuple(background) if background else (0, 0, 0, 0))
+
+    # Called to draw a whole drawing
+    def draw(self, paths: list, points: list):
+        ''' Draws our points, then our paths in order (same as our canvas loads them) '''
+
+        for point in points:
+            self.draw_point(point)
+
+        for path in paths:
+            self.draw_path(path)
+
+    def draw_path(self, path: dict):
+        ''' Draws one of our canvas path dicts '''
+
+        paint = path.get('paint', {}) or {}
+        style = str(paint.get('style', 'stroke') or 'stroke')
+        subpaths = flatten_path(path.get('elements', []))
+
+        # Move our geometry into pixel space
+        subpaths = [[self._to_pixel(x, y) for x, y in subpath] for subpath in subpaths]
+
+        mask = Image.new("L", self.image.size, 0)
+        draw = ImageDraw.Draw(mask)
+
+        if style.endswith('fill'):
+            for subpath in subpaths:
+                if len(subpath) > 2:
+                    draw.polygon(subpath, fill=255)
+
+        else:
+            stroke_width = max(1, round((paint.get('stroke_width', 1) or 1) * self.scale * SUPERSAMPLE))
+            for subpath in subpaths:
+                if len(subpath) > 1:
+                    draw.line(subpath, fill=255, width=stroke_width, joint="curve")
+
+                # Round off our ends (a single point is just a dot)
+                self._draw_dot(draw, subpath[0], stroke_width / 2)
+                self._draw_dot(draw, subpath[-1], stroke_width / 2)
+
+        self._composite(mask, paint)
+
+    def draw_point(self, point):
+        ''' Draws one of our [x, y, point_mode, paint] points as a dot '''
+
+        paint = point[3] if len(point) > 3 and point[3] else {}
+        radius = max(0.5, (paint.get('stroke_width', 1) or 1) * self.scale * SUPERSAMPLE / 2)
+
+        mask = Image.new("L", self.image.size, 0)
+        self._draw_dot(ImageDraw.Draw(mask), self._to_pixel(point[0], point[1]), radius)
+        self._composite(mask, paint)
+
+    # Called when we're done drawing
+    def to_image(self) -> Image.Image:
+        ''' Returns our drawing scaled down to our real size '''
+
+        if SUPERSAMPLE == 1:
+            return self.image
+
+        # Scale with premultiplied alpha, so see-through pixels don't bleed their color into our edges
+        return self.image.convert("RGBa").resize((self.width, self.height), Image.Resampling.BOX).convert("RGBA")
+
+    # Called when saving our raster as an image
+    def to_png(self) -> bytes:
+        ''' Encodes our drawing as a PNG file '''
+
+        output = io.BytesIO()
+        self.to_image().save(output, format="PNG")
+        return output.getvalue()
+
+    def _to_pixel(self, x: float, y: float) -> tuple:
+        return ((x - self.origin_x) * self.scale * SUPERSAMPLE, (y - self.origin_y) * self.scale * SUPERSAMPLE)
+
+    def _draw_dot(self, draw: ImageDraw.ImageDraw, center: tuple, radius: float):
+        draw.ellipse((center[0] - radius, center[1] - radius, center[0] + radius, center[1] + radius), fill=255)
+
+    def _composite(self, mask: Image.Image, paint: dict):
+        ''' Blends our paint color into our image wherever our mask covers '''
+
+        # Only work on the area we actually drew in
+        box = mask.getbbox()
+        if box is None:
+            return
+
+        mask = mask.crop(box)
+
+        # Clear blend mode (our eraser) removes what's under it
+        if str(paint.get('blend_mode', 'src_over') or 'src_over').split(".")[-1].lower() == 'clear':
+            region = self.image.crop(box)
+            region.putalpha(ImageChops.subtract(region.getchannel("A"), mask))
+            self.image.paste(region, box[:2])
+            return
+
+        red, green, blue, alpha = parse_color(paint.get('color', None))
+
+        # Normal (src_over) blending, with our paints opacity applied to our mask
+        layer = Image.new("RGBA", mask.size, (red, green, blue, 0))
+        layer.putalpha(mask.point(lambda value: value * alpha // 255))
+        self.image.alpha_composite(layer, dest=box[:2])
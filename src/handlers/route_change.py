@@ -1,17 +1,26 @@
 import flet as ft
 from models.views.story import Story
 from styles.snack_bar import Snack_Bar
+from handlers.save_scheduler import save_scheduler
 
 # Called whenever a new story is laoded
 async def route_change(e: ft.RouteChangeEvent) -> Story:
     ''' Handles changing our page view based on the new route '''
     from models.app import app
     from models.views.home import create_home_view
-    from models.views.loading import create_loading_view
+    from models.views.loading import create_loading_view, update_loading_view
 
     # Grabs our page from the event for easier reference
     page: ft.Page = e.page
 
+    # Write any pending saves before we switch views
+    save_scheduler.flush()
+
+    # Set aside whichever story we're leaving. It stays built, so coming back to it is instant
+    for story in app.stories.values():
+        if story.route != page.route:
+            story.suspend()
+
     # Clear our views and any existing controls
     page.views.clear()
 
@@ -39,18 +48,42 @@ async def route_change(e: ft.RouteChangeEvent) -> Story:
         case _:
             # Otherwise its a story route, so we need to find which one it is      
 
-            # Run through our stories and see which ones route matches our new route
-            for story in app.stories.values():
-                # If it matches, set our new story 
-                if story.route == page.route:
-                    new_story = story
-                    app.settings.data['active_story'] = story.route
-                    app.settings.story = story
-                    app.settings.save_dict()
+            # Grab the story that matches our new route. Only builds the full story the first time we route to it
+            new_story = app.get_story(page.route, page)
+            
+            # If it matches, set our new story 
+            if new_story is not None:
+                app.settings.data['active_story'] = new_story.route
+                app.settings.story = new_story
+                app.settings.save_dict()
+
+
+                # Show our loading view while our story loads for the first time
+                on_progress = None
+                if new_story.state == "unloaded":
+                    loading_view = create_loading_view(page, f"Loading {new_story.title}...")
+                    page.views.append(loading_view)
+                    page.update()
+                    on_progress = lambda message, value: update_loading_view(loading_view, message, value)
 
+                # Loads our story the first time, otherwise just resumes it. If its already loading, that route change will show it
+                try:
+                    is_ready = await new_story.startup(on_progress)
+                except Exception as ex:
+                    print(f"Error starting story {new_story.title}: {ex}")
+                    is_ready = None
+
+                if is_ready is False:
+                    return
+
+                # We routed somewhere else while our story loaded
+                if is_ready and page.route != new_story.route:
+                    new_story.suspend()
+                    return
 
-                    new_story.startup()
+                if is_ready:
                     app.settings.story = new_story  # Gives our settings widget the story reference it needs
+                    page.views.clear()
                     page.views.append(new_story)
                     page.update() 
                     return
@@ -58,7 +91,8 @@ async def route_change(e: ft.RouteChangeEvent) -> Story:
             
             
 
-            # If theres an error loading the story, go to home view
+            # If theres an error loading the story, go to home view (replacing our loading view if we showed it)
+            page.views.clear()
             page.views.append(create_home_view(page))
             page.update()
             page.show_dialog(Snack_Bar(f"Error loading story for route: {page.route}"))
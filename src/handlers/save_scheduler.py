@@ -0,0 +1,182 @@
+'''
+Write-behind persistence for our widgets and stories.
+Instead of writing the whole json file on every little change (every keystroke), objects mark themselves dirty here.
+Repeated saves to the same file inside our save window are merged into one write, which happens on a background thread.
+Data is copied when it's scheduled, on the thread that changed it, so our background writes never read data that is still changing.
+The copy is cheap, and the slow part (turning it into indented json text) happens on our write thread.
+Pending writes are force flushed on route changes and when the app exits.
+'''
+
+import os
+import json
+import atexit
+import threading
+from handlers import storage
+
+
+class Save_Scheduler:
+
+    # Constructor. Save delay is how long (in seconds) we collect changes before writing them
+    def __init__(self, save_delay: float = 1.0):
+
+        self.save_delay: float = save_delay
+
+        # Snapshots of data waiting to be written, keyed by the file path they save to. Only the latest snapshot for each file is kept.
+        # Each snapshot is our own copy of the data, so nothing else changes it before we write it
+        self.dirty: dict = {}
+
+        # File paths that keep a .bak copy of their last good version when written
+        self.backup_paths: set = set()
+
+        # Lock so our background flush and the UI thread don't step on each other
+        self.lock = threading.RLock()
+
+        # Seperate lock held while writing, so the UI thread can keep marking objects dirty during a write.
+        # Always taken before our normal lock
+        self.write_lock = threading.Lock()
+
+        # Timer that flushes our dirty objects once our save window closes
+        self.timer: threading.Timer = None
+
+        # While held (during a story batch), our timer doesn't write anything. Releasing our last hold writes everything at once
+        self.holds: int = 0
+
+        # Counts so we can see how much work we are saving
+        self.save_requests: int = 0
+        self.file_writes: int = 0
+
+    # Called by save_dict methods instead of writing directly
+    def schedule(self, file_path: str, object, backup: bool = False):
+        ''' Takes a snapshot of an objects data, and writes it to its file when our save window closes.
+        Objects just need a 'data' attribute thats a dict. If they have a file_data() method, we write what it returns instead '''
+
+        # Copy now, while nothing else is changing our data. Our write thread only ever sees this copy
+        try:
+            data = snapshot(object.file_data() if hasattr(object, 'file_data') else object.data)
+        except Exception as e:
+            print(f"Error saving to {file_path}: {e}")
+            return
+
+        with self.lock:
+            self.save_requests += 1
+            self.dirty[file_path] = data
+
+            if backup:
+                self.backup_paths.add(file_path)
+
+            # Start our save window if one isn't already open. Later saves just merge into it
+            if self.timer is None:
+                self.timer = threading.Timer(self.save_delay, self._timer_flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    # Called when our save window closes, on route changes, app exit, or before moving files around
+    def flush(self, file_path: str = None):
+        ''' Writes our pending objects to their files. If a file path is passed in, only that file is written '''
+
+        # Only one flush writes at a time, so forced flushes never race a background write of the same file
+        with self.write_lock:
+
+            with self.lock:
+
+                # Grab what we need to write
+                if file_path is None:
+                    pending = self.dirty
+                    self.dirty = {}
+
+                    # Our save window is closed now, so the next save opens a new one
+                    if self.timer is not None:
+                        self.timer.cancel()
+                        self.timer = None
+
+                else:
+                    pending = {file_path: self.dirty.pop(file_path)} if file_path in self.dirty else {}
+
+            # Write each file once, no matter how many times it was saved.
+            # The UI thread can keep marking objects dirty while we write
+            for path, data in pending.items():
+                self._write(path, data)
+
+    # Called when our save window closes
+    def _timer_flush(self):
+        ''' Flushes everything, unless we're held. Held writes wait for our last release '''
+
+        with self.lock:
+            if self.holds > 0:
+                self.timer = None
+                return
+
+        self.flush()
+
+    # Called when a story batch starts
+    def hold(self):
+        ''' Stops our save window from writing until released. Forced flushes still write '''
+
+        with self.lock:
+            self.holds += 1
+
+    # Called when a story batch ends
+    def release(self):
+        ''' Releases a hold. Releasing our last hold writes every dirty file once '''
+
+        with self.lock:
+            self.holds = max(0, self.holds - 1)
+            if self.holds > 0:
+                return
+
+        self.flush()
+
+    # Called when a file is deleted, so we don't write it back into existence
+    def cancel(self, file_path: str):
+        ''' Drops any pending write for a file. Waits for any write already in progress '''
+
+        with self.write_lock, self.lock:
+            self.dirty.pop(file_path, None)
+
+    # Called when a directory is deleted
+    def cancel_directory(self, directory_path: str):
+        ''' Drops any pending writes for files inside of a directory. Waits for any write already in progress '''
+
+        directory_path = os.path.join(directory_path, "")
+
+        with self.write_lock, self.lock:
+            for path in list(self.dirty.keys()):
+                if path.startswith(directory_path):
+                    self.dirty.pop(path, None)
+
+    def is_pending(self, file_path: str) -> bool:
+        ''' Returns if a file has a write waiting on it '''
+        return file_path in self.dirty
+
+    # Called when flushing
+    def _write(self, file_path: str, data: dict):
+        ''' Writes our snapshot of an objects data to its file '''
+
+        try:
+            # Atomically save the data to the file (creates file and directory if they dont exist)
+            storage.write_text(file_path, json.dumps(data, indent=4), backup=file_path in self.backup_paths)
+
+            self.file_writes += 1
+
+        # Handle errors
+        except Exception as e:
+            print(f"Error saving to {file_path}: {e}")
+
+
+def snapshot(value):
+    ''' Returns a copy of json style data (dicts, lists, and values), that shares nothing that can change with the original '''
+
+    if isinstance(value, dict):
+        return {key: snapshot(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [snapshot(item) for item in value]
+
+    return value
+
+
+# Sets our global save scheduler that all our save_dict methods use
+save_scheduler = Save_Scheduler()
+
+# Make sure nothing is lost when the app closes
+atexit.register(save_scheduler.flush)
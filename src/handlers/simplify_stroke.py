@@ -0,0 +1,55 @@
+'''
+Simplifies freehand strokes when we finish drawing them (pen up), using the Ramer-Douglas-Peucker algorithm.
+Drops points that are within our tolerance of the line between the points we keep,
+So long freehand strokes store (and redraw) a fraction of the elements while looking the same.
+'''
+
+
+# Called when finishing a freehand stroke on a canvas
+def simplify_points(points: list, tolerance: float) -> list:
+    ''' Returns the points we keep from a list of (x, y) points, so no dropped point is further than tolerance from the simplified line '''
+
+    # Nothing to simplify
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tolerance_squared = tolerance * tolerance
+
+    # Use our own stack instead of recursion, so very long strokes can't hit the recursion limit
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        start_x, start_y = points[start]
+        end_x, end_y = points[end]
+        dx, dy = end_x - start_x, end_y - start_y
+        length_squared = dx * dx + dy * dy
+
+        # Find the point furthest from the line between our start and end points
+        furthest_index, furthest_distance = start, -1.0
+        for index in range(start + 1, end):
+            px, py = points[index]
+
+            # Start and end are the same point, so just use the distance to it
+            if length_squared == 0:
+                distance = (px - start_x) ** 2 + (py - start_y) ** 2
+
+            # Squared perpendicular distance to the line
+            else:
+                cross = dx * (start_y - py) - dy * (start_x - px)
+                distance = cross * cross / length_squared
+
+            if distance > furthest_distance:
+                furthest_index, furthest_distance = index, distance
+
+        # Keep that point and check both halves, otherwise everything in between can go
+        if furthest_distance > tolerance_squared:
+            keep[furthest_index] = True
+            stack.append((start, furthest_index))
+            stack.append((furthest_index, end))
+
+    return [point for point, kept in zip(points, keep) if kept]
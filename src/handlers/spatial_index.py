@@ -0,0 +1,175 @@
+'''
+Spatial index over the bounding boxes of our canvas paths, so we can ask which paths touch a point or area
+Without scanning every element of every path. Used for selecting strokes, erasing whole strokes, and only rendering what we can see.
+Bounding boxes are bucketed into a uniform grid of cells, and queries only check the cells they overlap.
+'''
+
+
+class Spatial_Index:
+
+    # Constructor. Cell size is the width/height of our grid cells in canvas coordinates
+    def __init__(self, cell_size: float = 256.0):
+
+        self.cell_size: float = cell_size
+
+        # Bounding box of each item, keyed by its id. (min_x, min_y, max_x, max_y)
+        self.boxes: dict = {}
+
+        # Ids of the items that overlap each grid cell, keyed by the cells (column, row)
+        self.cells: dict = {}
+
+    # Called when a path is added to our canvas
+    def insert(self, item_id, box: tuple):
+        ''' Adds an item with its bounding box to our index '''
+
+        # Replace the item if its already in here
+        if item_id in self.boxes:
+            self.remove(item_id)
+
+        self.boxes[item_id] = box
+        for cell in self._cells_for(box):
+            self.cells.setdefault(cell, set()).add(item_id)
+
+    # Called when a path is removed from our canvas
+    def remove(self, item_id):
+        ''' Removes an item from our index '''
+
+        box = self.boxes.pop(item_id, None)
+        if box is None:
+            return
+
+        for cell in self._cells_for(box):
+            items = self.cells.get(cell, None)
+            if items is not None:
+                items.discard(item_id)
+                if not items:
+                    del self.cells[cell]
+
+    def clear(self):
+        ''' Removes everything from our index '''
+        self.boxes.clear()
+        self.cells.clear()
+
+    # Called when finding what paths are in an area (our viewport)
+    def query_rect(self, rect: tuple) -> set:
+        ''' Returns the ids of all items whose bounding box overlaps a (min_x, min_y, max_x, max_y) rect '''
+
+        min_x, min_y, max_x, max_y = rect
+        found = set()
+
+        for cell in self._cells_for(rect):
+            for item_id in self.cells.get(cell, ()):
+                if item_id in found:
+                    continue
+
+                box = self.boxes[item_id]
+                if box[0] <= max_x and box[2] >= min_x and box[1] <= max_y and box[3] >= min_y:
+                    found.add(item_id)
+
+        return found
+
+    # Called when finding what paths are under our mouse
+    def query_point(self, x: float, y: float, radius: float = 0.0) -> set:
+        ''' Returns the ids of all items whose bounding box is within radius of a point '''
+        return self.query_rect((x - radius, y - radius, x + radius, y + radius))
+
+    # Called when exporting our canvas
+    def bounds(self) -> tuple:
+        ''' Returns the bounding box around everything in our index, or None if its empty '''
+
+        if not self.boxes:
+            return None
+
+        boxes = self.boxes.values()
+        return (
+            min(box[0] for box in boxes),
+            min(box[1] for box in boxes),
+            max(box[2] for box in boxes),
+            max(box[3] for box in boxes),
+        )
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def _cells_for(self, box: tuple):
+        ''' Yields every grid cell a bounding box overlaps '''
+
+        min_column, min_row = int(box[0] // self.cell_size), int(box[1] // self.cell_size)
+        max_column, max_row = int(box[2] // self.cell_size), int(box[3] // self.cell_size)
+
+        for column in range(min_column, max_column + 1):
+            for row in range(min_row, max_row + 1):
+                yield (column, row)
+
+
+# Called when adding paths to our index
+def path_bounds(path: dict) -> tuple:
+    ''' Returns the (min_x, min_y, max_x, max_y) bounding box of a canvas path dict, padded by its stroke width. None if it has no elements '''
+
+    xs, ys = [], []
+
+    for element in path.get('elements', []):
+        x, y = element.get('x', None), element.get('y', None)
+        if x is None or y is None:
+            continue
+
+        xs.append(x)
+        ys.append(y)
+
+        # Arcs are drawn in a box starting at x, y
+        if element.get('type') == 'arc':
+            xs.append(x + element.get('width', 0))
+            ys.append(y + element.get('height', 0))
+
+        # Arcto can bulge out up to its radius
+        elif element.get('type') == 'arcto':
+            radius = element.get('radius', 0)
+            xs.extend((x - radius, x + radius))
+            ys.extend((y - radius, y + radius))
+
+    if not xs:
+        return None
+
+    padding = (path.get('paint', {}).get('stroke_width', 1) or 1) / 2
+
+    return (min(xs) - padding, min(ys) - padding, max(xs) + padding, max(ys) + padding)
+
+
+# Called when checking if we actually touched a path, not just its bounding box
+def path_distance(path: dict, x: float, y: float) -> float:
+    ''' Returns the distance from a point to the closest segment of a path '''
+
+    closest = float('inf')
+    previous = None
+
+    for element in path.get('elements', []):
+        if 'x' not in element or 'y' not in element:
+            continue
+
+        current = (element['x'], element['y'])
+
+        # Distance to the segment between our previous point and this one
+        if previous is not None and element.get('type') != 'moveto':
+            closest = min(closest, _segment_distance(previous, current, x, y))
+        else:
+            closest = min(closest, ((current[0] - x) ** 2 + (current[1] - y) ** 2) ** 0.5)
+
+        previous = current
+
+    return closest
+
+
+def _segment_distance(start: tuple, end: tuple, x: float, y: float) -> float:
+    ''' Returns the distance from a point to a line segment '''
+
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length_squared = dx * dx + dy * dy
+
+    # Clamp how far along the segment the closest point is
+    if length_squared == 0:
+        t = 0.0
+    else:
+        t = max(0.0, min(1.0, ((x - start[0]) * dx + (y - start[1]) * dy) / length_squared))
+
+    closest_x, closest_y = start[0] + t * dx, start[1] + t * dy
+    return ((closest_x - x) ** 2 + (closest_y - y) ** 2) ** 0.5
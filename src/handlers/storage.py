@@ -0,0 +1,159 @@
+'''
+Crash safe file writes for all our json data.
+Data is written to a temp file next to the real one, flushed to disk (fsync), and then swapped in with an atomic rename.
+If the app crashes or is killed mid-write, the old file is left untouched instead of being truncated.
+Important files can also keep a .bak copy of their last good version, which read_json falls back to.
+Also tracks how many bytes we write and how long writes take, so we can size the save scheduler window.
+'''
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+
+# Our write metrics. Updated by every write
+metrics: dict = {
+    'writes': 0,                # Number of successful writes
+    'failed_writes': 0,         # Number of writes that errored
+    'bytes_written': 0,         # Total bytes written
+    'total_write_time': 0.0,    # Total seconds spent writing
+    'max_write_time': 0.0,      # Slowest write in seconds
+    'last_write_time': 0.0,     # Most recent write in seconds
+}
+
+# Writes can come from the UI thread and the save scheduler thread at the same time
+_metrics_lock = threading.Lock()
+
+# Our process umask, read once at import (reading it means setting it, which isn't thread safe).
+# Temp files are created private (0600), so new files get the mode a normal open() would have given them
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def get_file_mode(file_path: str) -> int:
+    ''' Returns the permission bits our file should keep: its current ones if it exists, otherwise the default for new files '''
+
+    try:
+        return os.stat(file_path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_umask
+
+
+# Called by anything that writes text data to disk
+def write_text(file_path: str, text: str, backup: bool = False) -> int:
+    ''' Atomically writes text to a file, optionally keeping a .bak of the old version. Returns the number of bytes written '''
+    return write_bytes(file_path, text.encode("utf-8"), backup=backup)
+
+
+# Called by anything that writes binary data to disk (canvas strokes)
+def write_bytes(file_path: str, data: bytes, backup: bool = False) -> int:
+    ''' Atomically writes bytes to a file, optionally keeping a .bak of the old version. Returns the number of bytes written '''
+
+    start_time = time.perf_counter()
+    directory_path = os.path.dirname(file_path) or "."
+    temp_path = None
+
+    try:
+
+        # Create the directory if it doesn't exist. Catches errors from users deleting folders
+        os.makedirs(directory_path, exist_ok=True)
+
+        # Write to a temp file in the same directory, so our rename stays on the same drive (and is atomic)
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=directory_path,
+            prefix=f".{os.path.basename(file_path)}.",
+            suffix=".tmp"
+        )
+        with os.fdopen(file_descriptor, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Keep the permissions of the file we're replacing, instead of our temp file's private ones
+        os.chmod(temp_path, get_file_mode(file_path))
+
+        # Keep a copy of our last good version if asked
+        if backup and os.path.exists(file_path):
+            shutil.copyfile(file_path, file_path + ".bak")
+
+        # Swap our new file in. Readers see either the whole old file or the whole new one
+        os.replace(temp_path, file_path)
+        temp_path = None
+
+        # Make sure the rename itself is on disk. Windows doesn't let us open directories
+        if os.name != "nt":
+            directory_descriptor = os.open(directory_path, os.O_RDONLY)
+            try:
+                os.fsync(directory_descriptor)
+            finally:
+                os.close(directory_descriptor)
+
+        _record_write(len(data), time.perf_counter() - start_time)
+        return len(data)
+
+    # Record the failure and pass the error up so our callers can print it like normal
+    except Exception:
+        with _metrics_lock:
+            metrics['failed_writes'] += 1
+        raise
+
+    # Clean up our temp file if we didn't make it to the rename
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+# Called by our save_dict methods
+def write_json(file_path: str, data: dict, backup: bool = False) -> int:
+    ''' Atomically writes a dict to a json file. Returns the number of bytes written '''
+    return write_text(file_path, json.dumps(data, indent=4), backup=backup)
+
+
+# Called when reading files that might have a backup
+def read_json(file_path: str) -> dict:
+    ''' Reads a json file. If its missing or corrupt, falls back to its .bak copy if we have one '''
+
+    try:
+        with open(file_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+
+    # Try our backup before giving up
+    except (json.JSONDecodeError, FileNotFoundError):
+        backup_path = file_path + ".bak"
+        if not os.path.exists(backup_path):
+            raise
+
+        print(f"Could not read {file_path}, loading backup instead")
+        with open(backup_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+
+
+# Called after every successful write
+def _record_write(byte_count: int, write_time: float):
+    ''' Adds a write to our metrics '''
+
+    with _metrics_lock:
+        metrics['writes'] += 1
+        metrics['bytes_written'] += byte_count
+        metrics['total_write_time'] += write_time
+        metrics['last_write_time'] = write_time
+        metrics['max_write_time'] = max(metrics['max_write_time'], write_time)
+
+
+def get_metrics() -> dict:
+    ''' Returns a copy of our write metrics, with the average bytes and latency per write added '''
+
+    with _metrics_lock:
+        current_metrics = dict(metrics)
+
+    writes = current_metrics['writes']
+    current_metrics['average_bytes'] = current_metrics['bytes_written'] / writes if writes else 0
+    current_metrics['average_write_time'] = current_metrics['total_write_time'] / writes if writes else 0.0
+
+    return current_metrics
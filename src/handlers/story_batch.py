@@ -0,0 +1,103 @@
+'''
+Batches for our stories, so compound operations (creating template folders, renaming folders full of widgets, bulk creating)
+Don't save, refresh our rail, and update our page for every single item.
+Used as 'with story.batch():'. Inside a batch our save scheduler holds its writes, rail changes and workspace reloads are collected,
+And page updates are skipped. When the outermost batch ends we write each dirty file once, refresh our rail once,
+Reload our workspace once if it changed, and update our page once. Batches can be nested, only the outermost one applies.
+'''
+
+from handlers.save_scheduler import save_scheduler
+
+
+class Story_Batch:
+
+    # Constructor
+    def __init__(self, story):
+
+        self.story = story
+
+        # How many batches deep we are. Only the outermost batch applies our changes
+        self.depth: int = 0
+
+        # Rail changes collected during our batch, as (action, args) like our story's update_rail takes
+        self.rail_changes: list = []
+
+        # If our workspace needs reloading when we're done
+        self.workspace_changed: bool = False
+
+        # If we're applying our changes right now. Our rails skip their own page updates while we are, since we update our page once after
+        self.applying: bool = False
+
+        # Counts so we can see how much work our batches save
+        self.stats: dict = {'batches': 0, 'rail_refreshes': 0, 'workspace_reloads': 0, 'page_updates': 0}
+
+    @property
+    def active(self) -> bool:
+        return self.depth > 0
+
+    @property
+    def holds_page_updates(self) -> bool:
+        ''' Returns if our page will be updated for us when our batch ends, so nothing else needs to '''
+        return self.depth > 0 or self.applying
+
+    def __enter__(self):
+        if self.depth == 0:
+            save_scheduler.hold()
+
+        self.depth += 1
+        return self.story
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+        if self.depth > 0:
+            return False
+
+        # Apply our changes even if something went wrong, so our UI and files match what did happen
+        try:
+            self.apply()
+        finally:
+            save_scheduler.release()
+
+        return False
+
+    # Called by our story's update_rail while we're active
+    def add_rail_change(self, action: str, *args):
+        ''' Collects a rail change to apply when our batch ends '''
+        self.rail_changes.append((action, args))
+
+    # Called when our outermost batch ends
+    def apply(self):
+        ''' Refreshes our rail once, reloads our workspace once if needed, and updates our page once '''
+
+        rail_changes, self.rail_changes = self.rail_changes, []
+        workspace_changed, self.workspace_changed = self.workspace_changed, False
+
+        self.stats['batches'] += 1
+
+        self.applying = True
+        try:
+            # One change can still just update its own node. More than that reloads our rail once
+            if len(rail_changes) == 1:
+                action, args = rail_changes[0]
+                self.story.update_rail(action, *args)
+                self.stats['rail_refreshes'] += 1
+
+            elif rail_changes:
+                try:
+                    self.story.active_rail.content.reload_rail()
+                    self.stats['rail_refreshes'] += 1
+                except Exception as e:
+                    print(f"Error reloading rail after batch: {e}")
+
+            if workspace_changed and self.story.workspace is not None:
+                self.story.workspace.reload_workspace()
+                self.stats['workspace_reloads'] += 1
+
+        finally:
+            self.applying = False
+
+        try:
+            self.story.p.update()
+            self.stats['page_updates'] += 1
+        except Exception as e:
+            print(f"Error updating page after batch: {e}")
@@ -0,0 +1,126 @@
+'''
+Our story's workspace layout: which pin each widget is in, its order in that pin, if its visible, and if its the active tab.
+All of it lives in one small layout file in our story folder, so switching tabs or dragging widgets between pins
+Is one small write, instead of rewriting the json file of every widget involved. Widget files only change when their content does.
+Widgets from before we had a layout file just keep using the layout values in their own data until they are first moved,
+After that their own file leaves those values out.
+Widgets are keyed by their key relative to our story folder, so our layout still works if our story folder moves.
+'''
+
+import json
+from handlers import storage
+from handlers.save_scheduler import save_scheduler
+
+
+# Name of our layout file inside our story folder
+LAYOUT_FILE_NAME = "workspace_layout.json"
+
+# The keys in a widgets data that are stored in our layout file instead of its own file
+LAYOUT_KEYS = ('pin_location', 'index', 'visible', 'is_active_tab')
+
+
+class Story_Layout:
+
+    # Constructor. Nothing is read until we first need it
+    def __init__(self, file_path: str, paths):
+
+        # Where our layout file is stored
+        self.file_path: str = file_path
+
+        # Our story's path resolver, so we can key widgets relative to our story folder
+        self.paths = paths
+
+        # Our layout data. The save scheduler writes this as is. Widget layouts are keyed by widget key
+        self.data: dict = {'widgets': {}}
+
+        # If we've read our layout file yet
+        self.loaded: bool = False
+
+    # Called the first time we need our layout
+    def load(self):
+        ''' Reads our layout file. Missing or broken files just leave us with an empty layout '''
+
+        if self.loaded:
+            return
+
+        self.loaded = True
+
+        try:
+            data = storage.read_json(self.file_path)
+            if isinstance(data, dict) and isinstance(data.get('widgets', None), dict):
+                self.data = data
+
+                # Layout files from before were keyed by full paths
+                self.data['widgets'] = {self.paths.relative(key): entry for key, entry in data['widgets'].items()}
+
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error loading layout file {self.file_path}, using widget data instead: {e}")
+
+    # Called when a widget is built
+    def apply(self, widget):
+        ''' Copies our saved layout for a widget into its data, if we have one '''
+
+        self.load()
+
+        key = widget.data.get('key', None)
+        if key is None:
+            return
+
+        entry = self.data['widgets'].get(self.paths.relative(key), None)
+        if entry is None:
+            return
+
+        for key in LAYOUT_KEYS:
+            if key in entry:
+                widget.data[key] = entry[key]
+
+    # Called whenever a widgets pin location, order, visibility, or active tab changes
+    def update(self, widget) -> bool:
+        ''' Saves a widgets layout. Only marks our file dirty if something changed. Returns if anything changed '''
+
+        self.load()
+
+        key = widget.data.get('key', None)
+        if key is None:
+            return False
+
+        key = self.paths.relative(key)
+        entry = {layout_key: widget.data.get(layout_key, None) for layout_key in LAYOUT_KEYS}
+        if self.data['widgets'].get(key, None) == entry:
+            return False
+
+        self.data['widgets'][key] = entry
+        self.save()
+        return True
+
+    def has(self, key: str) -> bool:
+        ''' Returns if we have a saved layout for a widget key '''
+
+        self.load()
+        return self.paths.relative(key) in self.data['widgets']
+
+    # Called when a widget is renamed or moved
+    def rename(self, old_key: str, new_key: str):
+        ''' Moves a widgets layout to its new key '''
+
+        self.load()
+
+        entry = self.data['widgets'].pop(self.paths.relative(old_key), None)
+        if entry is not None:
+            self.data['widgets'][self.paths.relative(new_key)] = entry
+            self.save()
+
+    # Called when a widget is deleted
+    def remove(self, key: str):
+        ''' Drops a widgets layout '''
+
+        self.load()
+
+        if self.data['widgets'].pop(self.paths.relative(key), None) is not None:
+            self.save()
+
+    def save(self):
+        ''' Lets the save scheduler write our layout file. Repeated changes are merged into one write '''
+        save_scheduler.schedule(self.file_path, self)
@@ -0,0 +1,61 @@
+'''
+Helpers for loading our stories progressively.
+We split our parsed widget files into the widgets that were open in our workspace last session (built first, so our workspace can paint),
+And everything else, which is built afterwards in small chunks so our page stays responsive while it fills in.
+Doesn't import flet, so it works on plain dicts.
+'''
+
+import os
+
+
+# How many widget files we build before giving control back to our event loop
+WIDGET_CHUNK_SIZE = 25
+
+# The widget file categories our story loads (see widget_loader.WIDGET_FOLDERS), in the order our story builds them
+LOAD_CATEGORIES = ("content", "characters", "timelines", "maps")
+
+
+# Called when splitting our widget files
+def was_open(widget_data: dict, layout_entry: dict) -> bool:
+    ''' Returns if a widget was visible in our workspace last session. Our layout file entry (if any) wins over the widgets own data '''
+
+    if not isinstance(widget_data, dict):
+        return False
+
+    if isinstance(layout_entry, dict) and 'visible' in layout_entry:
+        return layout_entry['visible'] == True
+
+    # Widgets default to visible when they don't say otherwise
+    return widget_data.get('visible', True) == True
+
+
+# Called after our widget files are read
+def split_open_widget_files(widget_files: dict, layout_widgets: dict, paths) -> tuple:
+    ''' Splits our widget files (category -> list of (dirpath, filename, data, error)) into (open, rest), both in the same shape.
+    Our layout is keyed relative to our story folder, so paths is our story's path resolver.
+    Broken files go in rest, so their errors are still printed when we get to them '''
+
+    open_files = {category: [] for category in LOAD_CATEGORIES}
+    rest_files = {category: [] for category in LOAD_CATEGORIES}
+
+    for category in LOAD_CATEGORIES:
+        for widget_file in widget_files.get(category, []):
+            dirpath, filename, data, error = widget_file
+
+            # Widgets are keyed by where their file is, the same way our widgets work out their own key
+            layout_entry = None
+            if error is None and isinstance(data, dict):
+                title = data.get('title', filename.replace(".json", ""))
+                layout_entry = layout_widgets.get(paths.relative(os.path.join(dirpath, title)), None)
+
+            if error is None and was_open(data, layout_entry):
+                open_files[category].append(widget_file)
+            else:
+                rest_files[category].append(widget_file)
+
+    return open_files, rest_files
+
+
+def count_files(widget_files: dict) -> int:
+    ''' Returns how many widget files are left to build '''
+    return sum(len(files) for files in widget_files.values())
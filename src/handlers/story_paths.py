@@ -0,0 +1,73 @@
+'''
+Paths we save in our story files are relative to our story's folder, and always use '/' between folders.
+That way moving our data folder (or a whole story) doesn't leave stale paths in our files. Widget files don't store their paths at all,
+Since their folder is wherever their file is, so renaming a folder never has to rewrite the widgets inside of it.
+Our resolver caches both directions, so repeated lookups (like building our rails) don't re-normalize the same paths.
+'''
+
+import os
+
+
+# The seperator in every path we save
+SEPARATOR = "/"
+
+
+def widget_key(directory_path: str, title: str) -> str:
+    ''' Returns the key for a widget in a folder. Keys are just the path to the widget without its .json '''
+    return os.path.join(directory_path, title)
+
+
+class Story_Paths:
+
+    # Constructor. Root path is our story's folder
+    def __init__(self, root_path: str):
+
+        self.root_path: str = os.path.normpath(root_path)
+
+        # Our resolved paths. Absolute path -> relative path, and relative path -> absolute path
+        self.relative_paths: dict = {}
+        self.absolute_paths: dict = {}
+
+    # Called when our story folder itself moves
+    def set_root(self, root_path: str):
+        ''' Changes our story folder, and drops our cached paths since they all changed '''
+
+        self.root_path = os.path.normpath(root_path)
+        self.relative_paths.clear()
+        self.absolute_paths.clear()
+
+    def relative(self, path: str) -> str:
+        ''' Returns a path relative to our story folder, with '/' between folders. Our story folder itself is "".
+        Paths outside our story folder (or already relative) are just normalized '''
+
+        relative_path = self.relative_paths.get(path, None)
+        if relative_path is not None:
+            return relative_path
+
+        normalized = os.path.normpath(path)
+        if os.path.isabs(normalized):
+            try:
+                common = os.path.commonpath([os.path.normcase(self.root_path), os.path.normcase(normalized)])
+                if common == os.path.normcase(self.root_path):
+                    normalized = os.path.relpath(normalized, self.root_path)
+            except ValueError:
+                pass    # Different drives on windows
+
+        relative_path = "" if normalized == "." else normalized.replace(os.sep, SEPARATOR)
+        self.relative_paths[path] = relative_path
+        return relative_path
+
+    def absolute(self, relative_path: str) -> str:
+        ''' Returns the full path of a path relative to our story folder '''
+
+        path = self.absolute_paths.get(relative_path, None)
+        if path is not None:
+            return path
+
+        if os.path.isabs(relative_path):
+            path = os.path.normpath(relative_path)
+        else:
+            path = os.path.normpath(os.path.join(self.root_path, *relative_path.split(SEPARATOR)))
+
+        self.absolute_paths[relative_path] = path
+        return path
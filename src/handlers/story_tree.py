@@ -0,0 +1,193 @@
+'''
+In memory model of our story's folders and the widgets inside them, so our rails can build their tree views without touching the disk.
+Built once when our story loads (one walk of our folders, no files opened), then kept in sync by our story
+Whenever widgets or folders are created, moved, renamed, or deleted.
+Folders are keyed by their normalized path, so different spellings of the same path find the same folder.
+'''
+
+import os
+
+
+def canon_path(path: str) -> str:
+    ''' Returns a normalized path we can use as a key '''
+    return os.path.normcase(os.path.normpath(path))
+
+
+class Tree_Folder:
+
+    # Constructor
+    def __init__(self, path: str):
+
+        self.path: str = os.path.normpath(path)     # Real path to this folder
+        self.name: str = os.path.basename(self.path)
+
+        # Our sub folders, keyed by their canon path
+        self.folders: dict = {}
+
+        # Widgets stored directly in this folder
+        self.widgets: list = []
+
+    # Called when building tree views
+    def get_folders(self) -> list:
+        ''' Returns our sub folders sorted by name '''
+        return sorted(self.folders.values(), key=lambda folder: folder.name.lower())
+
+    # Called when building tree views
+    def get_widgets(self) -> list:
+        ''' Returns our widgets sorted by title '''
+        return sorted(self.widgets, key=lambda widget: str(widget.title).lower())
+
+
+class Story_Tree:
+
+    # Constructor. Root path is our story's folder, nothing outside of it is tracked
+    def __init__(self, root_path: str):
+
+        self.root_path: str = root_path
+
+        # Every folder in our tree, keyed by its canon path
+        self.folders: dict = {}
+
+        # Canon path of the folder each widget is in, keyed by the widgets id (widgets aren't always hashable)
+        self.widget_folders: dict = {}
+
+    # Called when our story is loaded
+    def build(self, widgets: list):
+        ''' Builds our tree from our story folders and our loaded widgets '''
+
+        self.folders.clear()
+        self.widget_folders.clear()
+
+        # Walk our folders once. We only need their names, so no files are opened
+        self.add_folder(self.root_path)
+        for dirpath, dirnames, filenames in os.walk(self.root_path):
+            for dirname in dirnames:
+                self.add_folder(os.path.join(dirpath, dirname))
+
+        for widget in widgets:
+            self.add_widget(widget)
+
+    # Called when a folder is created (and when building our tree)
+    def add_folder(self, path: str) -> Tree_Folder:
+        ''' Adds a folder to our tree, and any parent folders it needs. Returns the folder '''
+
+        key = canon_path(path)
+        folder = self.folders.get(key, None)
+        if folder is not None:
+            return folder
+
+        folder = Tree_Folder(path)
+        self.folders[key] = folder
+
+        # Link it to its parent, unless we're at the top of our story
+        parent_path = os.path.dirname(folder.path)
+        if key != canon_path(self.root_path) and parent_path != folder.path and canon_path(parent_path).startswith(canon_path(self.root_path)):
+            self.add_folder(parent_path).folders[key] = folder
+
+        return folder
+
+    # Called when a folder is deleted
+    def remove_folder(self, path: str):
+        ''' Removes a folder, everything under it, and any widgets inside it from our tree '''
+
+        key = canon_path(path)
+        folder = self.folders.get(key, None)
+        if folder is None:
+            return
+
+        # Unlink from our parent
+        parent = self.folders.get(canon_path(os.path.dirname(folder.path)), None)
+        if parent is not None:
+            parent.folders.pop(key, None)
+
+        for folder_key in self._subtree_keys(key):
+            for widget in self.folders.pop(folder_key).widgets:
+                self.widget_folders.pop(id(widget), None)
+
+    # Called when a folder is renamed
+    def rename_folder(self, old_path: str, new_path: str):
+        ''' Moves a folder and everything under it to its new path in our tree '''
+
+        old_key = canon_path(old_path)
+        folder = self.folders.get(old_key, None)
+        if folder is None:
+            self.add_folder(new_path)
+            return
+
+        # Unlink from our old parent
+        old_parent = self.folders.get(canon_path(os.path.dirname(folder.path)), None)
+        if old_parent is not None:
+            old_parent.folders.pop(old_key, None)
+
+        # Re-key every folder under us, and the widgets in them
+        moved = [self.folders.pop(folder_key) for folder_key in self._subtree_keys(old_key)]
+        old_prefix = folder.path
+        new_prefix = os.path.normpath(new_path)
+
+        for moved_folder in moved:
+            moved_folder.path = new_prefix + moved_folder.path[len(old_prefix):]
+            moved_folder.name = os.path.basename(moved_folder.path)
+            moved_folder.folders = {}
+
+        for moved_folder in moved:
+            new_key = canon_path(moved_folder.path)
+            self.folders[new_key] = moved_folder
+            for widget in moved_folder.widgets:
+                self.widget_folders[id(widget)] = new_key
+
+        # Relink everything to their (new) parents
+        for moved_folder in moved:
+            parent_path = os.path.dirname(moved_folder.path)
+            if canon_path(moved_folder.path) != canon_path(self.root_path):
+                self.add_folder(parent_path).folders[canon_path(moved_folder.path)] = moved_folder
+
+    # Called when a widget is created or loaded
+    def add_widget(self, widget):
+        ''' Adds a widget to the folder its stored in '''
+
+        directory_path = getattr(widget, 'directory_path', None)
+        if not directory_path:
+            return
+
+        # Don't add the same widget twice
+        self.remove_widget(widget)
+
+        folder = self.add_folder(directory_path)
+        folder.widgets.append(widget)
+        self.widget_folders[id(widget)] = canon_path(directory_path)
+
+    # Called when a widget is deleted
+    def remove_widget(self, widget):
+        ''' Removes a widget from our tree '''
+
+        folder_key = self.widget_folders.pop(id(widget), None)
+        folder = self.folders.get(folder_key, None)
+
+        if folder is not None:
+            folder.widgets = [item for item in folder.widgets if item is not widget]
+
+    # Called when a widget is moved to a new folder
+    def move_widget(self, widget):
+        ''' Moves a widget to the folder at its (new) directory path '''
+        self.add_widget(widget)
+
+    # Called by our tree views
+    def get_folder(self, path: str) -> Tree_Folder:
+        ''' Returns the folder at a path, or None if its not in our tree '''
+        return self.folders.get(canon_path(path), None)
+
+    def _subtree_keys(self, key: str) -> list:
+        ''' Returns the keys of a folder and every folder under it '''
+
+        keys = []
+        stack = [key]
+        while stack:
+            folder_key = stack.pop()
+            folder = self.folders.get(folder_key, None)
+            if folder is None:
+                continue
+
+            keys.append(folder_key)
+            stack.extend(folder.folders.keys())
+
+        return keys
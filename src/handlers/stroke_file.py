@@ -0,0 +1,499 @@
+'''
+Compact binary storage for our canvas drawings, stored in sidecar files next to the canvas widgets json file.
+Instead of saving every path element as a json dict, each path is stored as one record of element types and packed float32 coordinates.
+Paint settings are stored once in their own records, and paths just point to them by id, since most strokes share the same paint.
+
+Our drawing is split into a snapshot file, and an append-only journal file:
+    - New strokes are appended to the journal one at a time, so saving a stroke never rewrites the whole drawing.
+    - Once the journal grows past our threshold, a background thread folds it into the snapshot (compaction).
+    - Loading reads the snapshot, then replays the journal on top of it.
+    - If the app crashes mid-append, the torn record at the end of the journal is ignored and cut off on the next append.
+
+Compaction first renames the journal to a .compacting file, so new strokes go to a fresh journal while we work.
+Every journal starts with a random id, and the snapshot records the id of the last journal folded into it,
+So if we crash after writing the snapshot but before removing the .compacting file, we know not to load it twice.
+A journal torn before its id finished writing can't have any strokes after it, so it's started over instead of appended to.
+
+File layout (snapshot and journal):
+    header: MAGIC + version
+    records: kind (1 byte), payload length, crc32 of payload, payload
+'''
+
+import os
+import sys
+import json
+import zlib
+import struct
+import threading
+from array import array
+from handlers import storage
+
+
+MAGIC = b"SBST"
+VERSION = 1
+
+# Header and record framing
+HEADER = struct.Struct("<4sH")
+RECORD_HEADER = struct.Struct("<BII")
+
+# Our record kinds
+PAINT_RECORD = 1
+PATH_RECORD = 2
+POINT_RECORD = 3
+JOURNAL_ID_RECORD = 4   # In a journal, its own id. In a snapshot, the id of the last journal folded into it
+
+# Path element types, and the coordinates each one stores (in order)
+ELEMENT_TYPES = {
+    'moveto': (1, ('x', 'y')),
+    'lineto': (2, ('x', 'y')),
+    'arcto': (3, ('x', 'y', 'radius', 'rotation', 'large_arc')),
+    'arc': (4, ('x', 'y', 'width', 'height', 'start_angle', 'sweep_angle')),
+}
+
+# Reverse lookup of our element types by their code
+ELEMENT_CODES = {code: (element_type, fields) for element_type, (code, fields) in ELEMENT_TYPES.items()}
+
+
+class Stroke_File:
+
+    # Constructor. Takes the path to our snapshot file, and how big our journal can get (in bytes) before we compact it
+    def __init__(self, file_path: str, compact_threshold: int = 256 * 1024):
+
+        self.file_path: str = file_path
+        self.compact_threshold: int = compact_threshold
+
+        # Paint settings already written to our current journal, keyed by their json so we can reuse their ids
+        self.paints: dict = {}
+
+        # Size of our journal up to its last complete record. Anything after this is a torn write
+        self.valid_size: int = 0
+
+        # Random id written at the start of our current journal
+        self.journal_id: bytes = None
+
+        # If we've read our files yet, so we know our paint ids before appending
+        self.loaded: bool = False
+
+        # Appends come from the UI thread while compaction runs in the background
+        self.lock = threading.RLock()
+        self.compact_thread: threading.Thread = None
+
+        # Number of compactions we've done, for checking how often they run
+        self.compactions: int = 0
+
+    @property
+    def journal_path(self) -> str:
+        return self.file_path + ".journal"
+
+    @property
+    def compacting_path(self) -> str:
+        return self.file_path + ".compacting"
+
+    # Called when loading our canvas
+    def read(self) -> tuple[list, list]:
+        ''' Reads our snapshot and replays our journal on top of it. Returns (paths, points) in the same dict format the canvas uses '''
+
+        with self.lock:
+
+            # Start with our snapshot
+            paths, points, folded_id, _, _ = self._read_file(self.file_path)
+
+            # A journal that was mid compaction (we closed or crashed before it finished)
+            if os.path.exists(self.compacting_path):
+                compacting_paths, compacting_points, compacting_id, _, _ = self._read_file(self.compacting_path)
+
+                # Our snapshot doesn't have it yet, so load it. Journals without an id never have strokes
+                if compacting_id is not None and compacting_id != folded_id:
+                    paths.extend(compacting_paths)
+                    points.extend(compacting_points)
+
+                # Our snapshot already has it, we just didn't get to delete it
+                else:
+                    os.remove(self.compacting_path)
+
+            # Replay our journal tail, and remember where it ends so we can keep appending
+            journal_paths, journal_points, self.journal_id, self.paints, self.valid_size = self._read_file(self.journal_path)
+            paths.extend(journal_paths)
+            points.extend(journal_points)
+
+            self.loaded = True
+
+        # Finish any compaction that didn't finish, or start one if our journal is already too big
+        if os.path.exists(self.compacting_path) or self.valid_size >= self.compact_threshold:
+            self.compact()
+
+        return paths, points
+
+    # Called when we finish a stroke (pen up) or add points
+    def append(self, paths: list = None, points: list = None) -> int:
+        ''' Appends paths and points to the end of our journal. Returns the number of bytes written '''
+
+        with self.lock:
+
+            # Make sure we know our existing paint ids and where our last complete record ends
+            if not self.loaded:
+                self.read()
+
+            records = bytearray()
+
+            # Only the header (and our new journal id) if we're a brand new journal.
+            # A journal without an id was torn right after its header, so it has no strokes and we start it over
+            if self.valid_size == 0 or self.journal_id is None:
+                self.valid_size = 0
+                self.paints = {}
+                self.journal_id = os.urandom(8)
+                records += HEADER.pack(MAGIC, VERSION)
+                records += self._encode_record(JOURNAL_ID_RECORD, self.journal_id)
+
+            self._encode_strokes(paths or [], points or [], self.paints, records)
+
+            if len(records) == 0:
+                return 0
+
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+
+            # Open without truncating, and cut off any torn record left at the end from a crash before we add ours
+            mode = "r+b" if os.path.exists(self.journal_path) else "wb"
+            with open(self.journal_path, mode) as f:
+                f.truncate(self.valid_size)
+                f.seek(self.valid_size)
+                f.write(records)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.valid_size += len(records)
+
+        # Fold our journal into our snapshot once its big enough
+        if self.valid_size >= self.compact_threshold:
+            self.compact()
+
+        return len(records)
+
+    # Called when our journal gets too big
+    def compact(self, wait: bool = False):
+        ''' Folds our journal into our snapshot on a background thread. New strokes go to a fresh journal while it runs '''
+
+        with self.lock:
+
+            # Only one compaction at a time
+            if self.compact_thread is not None and self.compact_thread.is_alive():
+                if wait:
+                    self.compact_thread.join()
+                return
+
+            # Move our journal aside, unless we still have one left over from a compaction that didn't finish
+            if not os.path.exists(self.compacting_path):
+                if self.valid_size == 0 or self.journal_id is None or not os.path.exists(self.journal_path):
+                    return
+
+                # Cut off any torn record so it doesn't get folded in
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(self.valid_size)
+
+                os.replace(self.journal_path, self.compacting_path)
+
+                # Our next append starts a fresh journal
+                self.paints = {}
+                self.valid_size = 0
+                self.journal_id = None
+
+            self.compact_thread = threading.Thread(target=self._fold_compacting, daemon=True)
+            self.compact_thread.start()
+            compact_thread = self.compact_thread
+
+        if wait:
+            compact_thread.join()
+
+    # Called on our compaction thread
+    def _fold_compacting(self):
+        ''' Writes a new snapshot with our .compacting journal folded in, then removes the .compacting journal '''
+
+        try:
+            paths, points, folded_id, _, _ = self._read_file(self.file_path)
+            compacting_paths, compacting_points, compacting_id, _, _ = self._read_file(self.compacting_path)
+
+            # Only fold it in if our snapshot doesn't already have it
+            if compacting_id is not None and compacting_id != folded_id:
+                paths.extend(compacting_paths)
+                points.extend(compacting_points)
+                folded_id = compacting_id
+
+            data = self._encode_file(paths, points, folded_id)
+
+            # Swap in our new snapshot and drop the journal we folded, without a read happening in between
+            with self.lock:
+                storage.write_bytes(self.file_path, data)
+                if os.path.exists(self.compacting_path):
+                    os.remove(self.compacting_path)
+
+                self.compactions += 1
+
+        # Our .compacting journal is left in place, so nothing is lost and we try again next time
+        except Exception as e:
+            print(f"Error compacting strokes file {self.file_path}: {e}")
+
+    # Called when converting old json drawings, or when we need to rewrite the whole drawing
+    def write_all(self, paths: list, points: list) -> int:
+        ''' Atomically replaces our drawing with the given paths and points. Returns the number of bytes written '''
+
+        self.wait_for_compaction()
+
+        with self.lock:
+            data = self._encode_file(paths, points, None)
+            storage.write_bytes(self.file_path, data)
+
+            # Our snapshot has everything now
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+            self.paints = {}
+            self.valid_size = 0
+            self.journal_id = None
+            self.loaded = True
+
+            return len(data)
+
+    # Called when our canvas is renamed or moved
+    def move(self, new_file_path: str):
+        ''' Moves our snapshot and journal files to a new path '''
+
+        self.wait_for_compaction()
+
+        with self.lock:
+            if new_file_path != self.file_path:
+                os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
+
+                for old_path, new_path in (
+                    (self.file_path, new_file_path),
+                    (self.journal_path, new_file_path + ".journal"),
+                    (self.compacting_path, new_file_path + ".compacting"),
+                ):
+                    if os.path.exists(old_path):
+                        os.replace(old_path, new_path)
+
+            self.file_path = new_file_path
+
+    # Called when our canvas is deleted
+    def delete(self):
+        ''' Deletes our snapshot and journal files '''
+
+        self.wait_for_compaction()
+
+        with self.lock:
+            for path in (self.file_path, self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+            self.paints = {}
+            self.valid_size = 0
+            self.journal_id = None
+
+    def wait_for_compaction(self):
+        ''' Waits for any running compaction to finish '''
+
+        compact_thread = self.compact_thread
+        if compact_thread is not None and compact_thread.is_alive():
+            compact_thread.join()
+
+    # Called when reading our snapshot or journals
+    def _read_file(self, file_path: str) -> tuple[list, list, bytes, dict, int]:
+        ''' Reads one of our files. Returns (paths, points, journal id, paints, valid size) '''
+
+        paths, points = [], []
+        paint_table, paints = {}, {}
+        journal_id = None
+
+        # No file yet means nothing drawn in it yet
+        if not os.path.exists(file_path):
+            return paths, points, journal_id, paints, 0
+
+        with open(file_path, "rb") as f:
+            data = f.read()
+
+        # Make sure this is actually one of our files. If its just a torn header, we start it over
+        if len(data) < HEADER.size or HEADER.unpack_from(data, 0)[0] != MAGIC:
+            print(f"Error reading strokes from {file_path}: not a stroke file")
+            return paths, points, journal_id, paints, 0
+
+        offset = HEADER.size
+        valid_size = offset
+        view = memoryview(data)
+
+        # Read each record until we run out, or hit a record that didn't finish writing
+        while offset + RECORD_HEADER.size <= len(data):
+            kind, length, crc = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            end = start + length
+
+            # Torn or corrupt record, so we stop here and keep everything before it
+            if end > len(data) or zlib.crc32(view[start:end]) != crc:
+                break
+
+            payload = view[start:end]
+
+            try:
+                if kind == PAINT_RECORD:
+                    paint_id = struct.unpack_from("<I", payload, 0)[0]
+                    paint_json = bytes(payload[4:]).decode("utf-8")
+                    paint_table[paint_id] = json.loads(paint_json)
+                    paints[paint_json] = paint_id
+
+                elif kind == PATH_RECORD:
+                    paths.append(self._decode_path(payload, paint_table))
+
+                elif kind == POINT_RECORD:
+                    points.append(self._decode_point(payload, paint_table))
+
+                elif kind == JOURNAL_ID_RECORD:
+                    journal_id = bytes(payload)
+
+            # Skip any record we can't make sense of, but keep reading the rest
+            except Exception as e:
+                print(f"Error reading stroke record from {file_path}: {e}")
+
+            offset = end
+            valid_size = offset
+
+        if valid_size < len(data):
+            print(f"Ignored a torn record at the end of {file_path} ({len(data) - valid_size} bytes)")
+
+        return paths, points, journal_id, paints, valid_size
+
+    # Called when writing a whole snapshot
+    def _encode_file(self, paths: list, points: list, folded_id: bytes) -> bytes:
+        ''' Encodes a full snapshot file '''
+
+        records = bytearray(HEADER.pack(MAGIC, VERSION))
+
+        if folded_id is not None:
+            records += self._encode_record(JOURNAL_ID_RECORD, folded_id)
+
+        self._encode_strokes(paths, points, {}, records)
+
+        return bytes(records)
+
+    # Called when encoding paths and points
+    def _encode_strokes(self, paths: list, points: list, paints: dict, records: bytearray):
+        ''' Adds path and point records (and any new paint records they need) to our records '''
+
+        for path in paths:
+            paint_id = self._paint_id(path.get('paint', {}), paints, records)
+            records += self._encode_record(PATH_RECORD, self._encode_path(path, paint_id))
+
+        for point in points:
+            paint_id = self._paint_id(point[3] if len(point) > 3 else {}, paints, records)
+            records += self._encode_record(POINT_RECORD, self._encode_point(point, paint_id))
+
+    def _paint_id(self, paint: dict, paints: dict, records: bytearray) -> int:
+        ''' Returns the id for a paint, adding a paint record to our records if its a new one '''
+
+        paint_json = json.dumps(paint, sort_keys=True, default=str)
+
+        # Reuse the paint if we've already written it
+        if paint_json in paints:
+            return paints[paint_json]
+
+        paint_id = len(paints)
+        paints[paint_json] = paint_id
+        records += self._encode_record(PAINT_RECORD, struct.pack("<I", paint_id) + paint_json.encode("utf-8"))
+
+        return paint_id
+
+    def _encode_record(self, kind: int, payload: bytes) -> bytes:
+        ''' Frames a payload with its kind, length, and checksum '''
+        return RECORD_HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload
+
+    # Called when encoding a path
+    def _encode_path(self, path: dict, paint_id: int) -> bytes:
+        ''' Packs a paths elements into element codes and a float32 coordinate buffer '''
+
+        codes = bytearray()
+        coordinates = array("f")
+
+        for element in path.get('elements', []):
+            element_type = element.get('type', None)
+
+            # Skip element types we don't know how to store
+            if element_type not in ELEMENT_TYPES:
+                print("Unknown path element type while saving: ", element)
+                continue
+
+            code, fields = ELEMENT_TYPES[element_type]
+            codes.append(code)
+            coordinates.extend(float(element.get(field, 0) or 0) for field in fields)
+
+        return (
+            struct.pack("<II", paint_id, len(codes)) + bytes(codes) +
+            struct.pack("<I", len(coordinates)) + _to_little_endian(coordinates)
+        )
+
+    # Called when decoding a path
+    def _decode_path(self, payload: memoryview, paint_table: dict) -> dict:
+        ''' Unpacks a path record back into our path dict format '''
+
+        paint_id, code_count = struct.unpack_from("<II", payload, 0)
+        codes = bytes(payload[8:8 + code_count])
+
+        offset = 8 + code_count
+        coordinate_count = struct.unpack_from("<I", payload, offset)[0]
+        offset += 4
+        coordinates = _from_little_endian(payload[offset:offset + coordinate_count * 4])
+
+        elements = []
+        index = 0
+        for code in codes:
+            element_type, fields = ELEMENT_CODES[code]
+            element = {'type': element_type}
+            for field in fields:
+                element[field] = coordinates[index]
+                index += 1
+
+            # Large arc is a flag, not a coordinate
+            if 'large_arc' in element:
+                element['large_arc'] = bool(element['large_arc'])
+
+            elements.append(element)
+
+        return {'elements': elements, 'paint': dict(paint_table.get(paint_id, {}))}
+
+    # Called when encoding a point
+    def _encode_point(self, point, paint_id: int) -> bytes:
+        ''' Packs a (x, y, point_mode, paint) point '''
+
+        point_mode = point[2] if len(point) > 2 else "points"
+        point_mode = str(getattr(point_mode, 'value', point_mode)).encode("utf-8")
+
+        return struct.pack("<IB", paint_id, len(point_mode)) + point_mode + struct.pack("<ff", point[0], point[1])
+
+    # Called when decoding a point
+    def _decode_point(self, payload: memoryview, paint_table: dict) -> list:
+        ''' Unpacks a point record back into our [x, y, point_mode, paint] format '''
+
+        paint_id, mode_length = struct.unpack_from("<IB", payload, 0)
+        point_mode = bytes(payload[5:5 + mode_length]).decode("utf-8")
+        x, y = struct.unpack_from("<ff", payload, 5 + mode_length)
+
+        return [x, y, point_mode, dict(paint_table.get(paint_id, {}))]
+
+
+def _to_little_endian(values: array) -> bytes:
+    ''' Returns the bytes of a float array in little endian order, no matter our platform '''
+
+    if sys.byteorder == "big":
+        values = array("f", values)
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def _from_little_endian(data) -> array:
+    ''' Returns a float array from little endian bytes, no matter our platform '''
+
+    values = array("f")
+    values.frombytes(bytes(data))
+
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    return values
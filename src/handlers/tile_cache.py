@@ -0,0 +1,255 @@
+'''
+Cache of rendered image tiles for large drawings. Instead of the client drawing thousands of vector shapes on every pan and zoom,
+We flatten our committed strokes into PNG tiles (see rasterizer) and show those as images, with only our live strokes left as shapes.
+
+Tiles are square, rendered per zoom level (level 0 is 1 pixel per canvas unit, each level up doubles that).
+When new strokes land (or are erased), only the tiles they touch are invalidated. Each invalidation bumps that tiles version,
+So the client never shows an old cached image for a tile we've redrawn.
+Rendered tiles are kept in a memory LRU and a disk LRU, each with their own limit.
+'''
+
+import os
+import math
+import threading
+from collections import OrderedDict
+
+
+class Tile_Cache:
+
+    # Constructor. Takes the directory our tile files go in, and a signature of the drawing they were rendered from
+    def __init__(
+        self,
+        cache_directory: str,
+        signature: str = "",
+        tile_size: int = 256,
+        memory_limit: int = 128,        # Most tiles we keep in memory
+        disk_limit: int = 1024,         # Most tile files we keep on disk
+        max_level: int = 3,             # Most we zoom in our tiles (2^3 = 8 pixels per canvas unit)
+    ):
+
+        self.cache_directory: str = cache_directory
+        self.tile_size: int = tile_size
+        self.memory_limit: int = memory_limit
+        self.disk_limit: int = disk_limit
+        self.max_level: int = max_level
+
+        # Rendered PNG bytes, keyed by (level, column, row, version). Most recently used last
+        self.memory: OrderedDict = OrderedDict()
+
+        # Tile files on disk, keyed the same way. Most recently used last
+        self.disk: OrderedDict = OrderedDict()
+
+        # Current version of each tile, keyed by (level, column, row). Tiles we've never invalidated are version 0
+        self.versions: dict = {}
+
+        # Tiles we know are empty, so we don't render or show them
+        self.empty: set = set()
+
+        # Rendering happens on background threads while the UI thread invalidates
+        self.lock = threading.RLock()
+
+        # Counts for checking how well our cache is doing
+        self.stats: dict = {'memory_hits': 0, 'disk_hits': 0, 'renders': 0, 'invalidations': 0}
+
+        self._load_directory(signature)
+
+    # Called when we create our cache
+    def _load_directory(self, signature: str):
+        ''' Picks up tiles left on disk from last time, if they were rendered from the same drawing. Otherwise clears them '''
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+        signature_path = os.path.join(self.cache_directory, "signature.txt")
+
+        try:
+            with open(signature_path, "r", encoding='utf-8') as f:
+                old_signature = f.read()
+        except OSError:
+            old_signature = None
+
+        # Our drawing changed since these were rendered, so none of them can be trusted
+        if old_signature != signature:
+            self.clear()
+            with open(signature_path, "w", encoding='utf-8') as f:
+                f.write(signature)
+            return
+
+        # Otherwise add our version 0 tiles to our disk LRU, oldest first
+        tile_files = []
+        for file_name in os.listdir(self.cache_directory):
+            if not file_name.endswith(".png"):
+                continue
+
+            try:
+                level, column, row, version = (int(part) for part in file_name[:-4].split("_"))
+            except ValueError:
+                continue
+
+            file_path = os.path.join(self.cache_directory, file_name)
+            if version != 0:
+                os.remove(file_path)
+                continue
+
+            tile_files.append((os.path.getmtime(file_path), (level, column, row, 0), file_path))
+
+        for _, key, file_path in sorted(tile_files):
+            self.disk[key] = file_path
+
+        self._evict()
+
+    # Called when our drawing is changed outside of our invalidations (like a full reload)
+    def clear(self):
+        ''' Removes every tile from memory and disk '''
+
+        with self.lock:
+            self.memory.clear()
+            self.disk.clear()
+            self.versions.clear()
+            self.empty.clear()
+
+            for file_name in os.listdir(self.cache_directory):
+                if file_name.endswith(".png"):
+                    try:
+                        os.remove(os.path.join(self.cache_directory, file_name))
+                    except OSError:
+                        pass
+
+    # Called when changing our drawing signature (after we save strokes)
+    def set_signature(self, signature: str):
+        ''' Saves the signature of the drawing our tiles now match '''
+
+        try:
+            with open(os.path.join(self.cache_directory, "signature.txt"), "w", encoding='utf-8') as f:
+                f.write(signature)
+        except OSError as e:
+            print(f"Error saving tile cache signature: {e}")
+
+    def get_level(self, zoom: float) -> int:
+        ''' Returns the tile level to use at a zoom, rounding up so tiles are never blurry '''
+        return max(0, min(self.max_level, math.ceil(math.log2(max(zoom, 1.0)) - 1e-9)))
+
+    def get_scale(self, level: int) -> float:
+        ''' Returns how many pixels per canvas unit a tile level has '''
+        return float(2 ** level)
+
+    def tile_rect(self, level: int, column: int, row: int) -> tuple:
+        ''' Returns the area of our canvas a tile covers, as (min_x, min_y, max_x, max_y) '''
+
+        span = self.tile_size / self.get_scale(level)
+        return (column * span, row * span, (column + 1) * span, (row + 1) * span)
+
+    def tiles_for_rect(self, level: int, rect: tuple) -> list:
+        ''' Returns the (column, row) of every tile at a level that overlaps an area of our canvas '''
+
+        span = self.tile_size / self.get_scale(level)
+        min_column, min_row = int(math.floor(rect[0] / span)), int(math.floor(rect[1] / span))
+        max_column, max_row = int(math.ceil(rect[2] / span)) - 1, int(math.ceil(rect[3] / span)) - 1
+
+        return [(column, row) for row in range(min_row, max_row + 1) for column in range(min_column, max_column + 1)]
+
+    # Called when new strokes land or strokes are erased
+    def invalidate_rect(self, rect: tuple):
+        ''' Invalidates every tile, at every level, that overlaps an area of our canvas '''
+
+        with self.lock:
+            self.stats['invalidations'] += 1
+
+            for level in range(self.max_level + 1):
+                for column, row in self.tiles_for_rect(level, rect):
+                    tile = (level, column, row)
+                    old_key = tile + (self.versions.get(tile, 0),)
+                    self.versions[tile] = self.versions.get(tile, 0) + 1
+                    self.empty.discard(old_key)
+
+                    # Drop our old renders of this tile
+                    self.memory.pop(old_key, None)
+                    file_path = self.disk.pop(old_key, None)
+                    if file_path is not None:
+                        try:
+                            os.remove(file_path)
+                        except OSError:
+                            pass
+
+    def is_empty(self, level: int, column: int, row: int) -> bool:
+        ''' Returns if we already know a tile has nothing drawn in it '''
+        with self.lock:
+            return (level, column, row, self.versions.get((level, column, row), 0)) in self.empty
+
+    # Called on our render thread for every tile we need to show
+    def get_tile(self, level: int, column: int, row: int, paths: list, points: list) -> str:
+        ''' Returns the file path of a tiles image, rendering it if needed. Paths and points are just the ones that touch this tile. None if its empty '''
+
+        with self.lock:
+            key = (level, column, row, self.versions.get((level, column, row), 0))
+
+            if key in self.empty:
+                return None
+
+            # Already on disk
+            file_path = self.disk.get(key, None)
+            if file_path is not None and os.path.exists(file_path):
+                self.disk.move_to_end(key)
+                self.stats['disk_hits'] += 1
+                return file_path
+
+            png = self.memory.get(key, None)
+            if png is not None:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+
+        # Nothing drawn here, so no image needed
+        if png is None and not paths and not points:
+            with self.lock:
+                self.empty.add(key)
+            return None
+
+        # Render outside our lock so invalidations don't wait on us
+        if png is None:
+            png = self.render_tile(level, column, row, paths, points)
+
+        with self.lock:
+
+            # We were invalidated while rendering, so this render is already old
+            if self.versions.get((level, column, row), 0) != key[3]:
+                return None
+
+            file_path = os.path.join(self.cache_directory, f"{level}_{column}_{row}_{key[3]}.png")
+            try:
+                with open(file_path, "wb") as f:
+                    f.write(png)
+            except OSError as e:
+                print(f"Error saving tile {file_path}: {e}")
+                return None
+
+            self.memory[key] = png
+            self.disk[key] = file_path
+            self._evict()
+
+        return file_path
+
+    def render_tile(self, level: int, column: int, row: int, paths: list, points: list) -> bytes:
+        ''' Renders a tile to PNG bytes '''
+
+        # Pillow is only loaded once we actually have tiles to draw
+        from handlers.rasterizer import Raster
+
+        min_x, min_y, _, _ = self.tile_rect(level, column, row)
+        raster = Raster(self.tile_size, self.tile_size, origin_x=min_x, origin_y=min_y, scale=self.get_scale(level))
+        raster.draw(paths, points)
+
+        with self.lock:
+            self.stats['renders'] += 1
+
+        return raster.to_png()
+
+    def _evict(self):
+        ''' Drops our least recently used tiles once we're over our limits '''
+
+        while len(self.memory) > self.memory_limit:
+            self.memory.popitem(last=False)
+
+        while len(self.disk) > self.disk_limit:
+            _, file_path = self.disk.popitem(last=False)
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
@@ -1,17 +1,24 @@
 ''' 
 Loads all data in a directory and adds it to expansion tiles or to rail (column) for uniform look 
+Folders and widgets come from our story's in memory tree (see story_tree), so building a rail never reads the disk
+Folders only build what's inside them while they're expanded, and long folders show their files a page at a time,
+So the number of controls we send stays about the same no matter how big the story gets
 When called recursively, only the parent expansion tile argument is provided
 When called initially when there is no parent dropdown, a column is provided instead
 '''
 
 import flet as ft
 import os
-import json
 from models.views.story import Story
+from handlers.story_tree import canon_path
 from styles.tree_view.tree_view_directory import Tree_View_Directory
 from styles.tree_view.tree_view_file import Tree_View_File
 
 
+# Most files we show in one folder before a 'show more' button
+FILE_PAGE_SIZE = 200
+
+
 def load_directory_data(
     page: ft.Page,                                        # Page reference for overlays if needed    
     story: Story,                                         # Story reference for any story related data
@@ -20,73 +27,40 @@ def load_directory_data(
     dir_dropdown: Tree_View_Directory = None,             # Optional parent expansion tile for when recursively called
     column: ft.Column = None,                             # Optional parent column to add elements too when not starting inside a tile
     additional_directory_menu_options: list[ft.Control] = None,      # Additional menu options passed in from parent rail to be used for directories
-    additional_file_menu_options: list[ft.Control] = None   
+    additional_file_menu_options: list[ft.Control] = None,
+    folders_meta: dict = None,                            # Normalized folder metadata. Built once on our first call and passed down
     # Only dir_dropdown OR column should be provided, but one is required
 ) -> ft.Control:
     
-    def _canon_path(p: str) -> str:
-        return os.path.normcase(os.path.normpath(p))
-    
-
     try: 
 
-        # Gives us a list of all files and folders in our current directory
-        entrys = os.listdir(directory)
+        # Our folders and widgets come from our story's tree, so we never touch the disk here
+        folder = story.story_tree.get_folder(directory)
 
-        # Keep track of directories vs files so we can add them in the order we want
-        directories = []
-        files = []  
+        # Top most call, so our rail starts tracking a fresh tree for its node level updates
+        if dir_dropdown is None and hasattr(rail, "reset_tree"):
+            rail.reset_tree(column, additional_directory_menu_options, additional_file_menu_options)
 
-        # Goes through them all
-        for entry in entrys:
+        if folder is None:
+            return dir_dropdown if dir_dropdown is not None else column
 
-            # Sets the new path
-            full_path =  os.path.join(directory, entry)
-
-            # Add directories to their own list
-            if os.path.isdir(full_path):
-                directories.append(entry)
-
-            # Add files to their own list
-            elif os.path.isfile(full_path):
-                files.append(entry)
+        # Build a normalized map of folder metadata once for our whole tree
+        if folders_meta is None:
+            folders_meta = get_folders_meta(story)
 
         # Go through our directories first
-        for directory_name in directories:
-
-            # Set the path and give us the capitalized name
-            full_path = os.path.join(directory, directory_name)
-            capital_dir_path = directory_name.capitalize()
-            
-            # Build a normalized map of folder metadata once per call in order to get the call
-            folders_meta = { _canon_path(k): v for k, v in story.data.get('folders', {}).items() }
-
-            # Set our data to pass in for the folder
-            color = folders_meta.get(_canon_path(full_path), {}).get('color', "primary")
-            is_expanded = folders_meta.get(_canon_path(full_path), {}).get('is_expanded', False)
-
-            # Create the expansion tile here
-            new_expansion_tile = Tree_View_Directory(
-                full_path=full_path,
-                title=capital_dir_path,
-                story=story,
-                page=page,
-                color=color,
-                rail=rail,
-                is_expanded=is_expanded,
-                additional_menu_options=additional_directory_menu_options,
-                father=dir_dropdown if dir_dropdown is not None else None,
-            )
+        for sub_folder in folder.get_folders():
 
-            # Recursively go through this directory as well to load its data, and any sub directories
-            load_directory_data(
-                page=page,                                                # Page reference
-                story=story,                                              # Story reference
-                directory=full_path,                                      # Our new directory to load
-                dir_dropdown=new_expansion_tile,                          # Our new parent expansion tile
+            # Create the expansion tile, and everything inside it
+            new_expansion_tile = build_directory_tile(
+                page=page,
+                story=story,
+                directory=sub_folder.path,
                 rail=rail,
-                additional_directory_menu_options=additional_directory_menu_options,           # Any additional menu options to pass down
-                additional_file_menu_options=additional_file_menu_options
+                father=dir_dropdown,
+                additional_directory_menu_options=additional_directory_menu_options,
+                additional_file_menu_options=additional_file_menu_options,
+                folders_meta=folders_meta,
             )
 
             # Add our expansion tile for the directory to its parent, or the column if top most directory
@@ -95,39 +69,33 @@ def load_directory_data(
             else:
                 column.controls.append(new_expansion_tile)
 
-        # Now go through our files
-        for file_name in files:
-
-            try:
-                # Load the file data to see if it's valid
-                with open(os.path.join(directory, file_name), 'r', encoding='utf-8') as f:
-                    file_data = json.load(f)
-
-                key = file_data.get('key', None)
+        # Now go through our widgets, up to our page size
+        widgets = folder.get_widgets()
+        owner = dir_dropdown if dir_dropdown is not None else rail
+        file_limit = getattr(owner, "file_limit", None) or FILE_PAGE_SIZE
 
-                for widget in story.widgets:
-                    if widget.data.get('key', None) == key:
-                        widget = widget
-                        break
-
-            except Exception as e:
-                print(f"Error loading file {file_name} in directory {directory}: {e}")
-                continue
-            
+        for widget in widgets[:file_limit]:
 
             # Create the file item
-            item = Tree_View_File(
-                widget,
-                father=dir_dropdown if dir_dropdown is not None else None,
-                additional_menu_options=additional_file_menu_options
-            )        
+            item = build_file_item(widget, rail, father=dir_dropdown, additional_file_menu_options=additional_file_menu_options)
 
             # Add them to parent expansion tile if one exists, otherwise just add it to the column
             if dir_dropdown is not None:
                 dir_dropdown.content.content.controls.append(item)
             else: 
                 column.controls.append(item)
-            pass
+
+        # Button to show the rest, a page at a time
+        if len(widgets) > file_limit:
+            more_button = ft.TextButton(
+                f"Show more ({len(widgets) - file_limit})",
+                on_click=lambda e: owner.show_more_files(),
+            )
+
+            if dir_dropdown is not None:
+                dir_dropdown.content.content.controls.append(more_button)
+            else:
+                column.controls.append(more_button)
 
         # Return the parent expansion tile or column depending on what was provided
         return dir_dropdown if dir_dropdown is not None else column
@@ -135,4 +103,178 @@ def load_directory_data(
     # Handle errors
     except Exception as e:
         print(f"Error loading directory data from {directory}: {e}")
-        return None
\ No newline at end of file
+        return None                 
+
+
+# Called once per tree view build, and when adding single folders
+def get_folders_meta(story: Story) -> dict:
+    ''' Returns our story's folder metadata (color, is_expanded), keyed by path relative to our story folder '''
+    return story.data.get('folders', {})
+
+
+# Called when building our tree view, or when a single folder is added to it
+def build_directory_tile(
+    page: ft.Page,
+    story: Story,
+    directory: str,                                       # Full path of the folder this tile shows
+    rail: ft.Control,
+    father: Tree_View_Directory = None,                   # Parent tile, or None if at the top of our rail
+    additional_directory_menu_options: list[ft.Control] = None,
+    additional_file_menu_options: list[ft.Control] = None,
+    folders_meta: dict = None,
+) -> Tree_View_Directory:
+    ''' Builds the expansion tile for one folder, loads everything inside of it, and registers it with our rail '''
+
+    if folders_meta is None:
+        folders_meta = get_folders_meta(story)
+
+    # Set our data to pass in for the folder
+    folder_data = folders_meta.get(story.paths.relative(directory), {})
+    color = folder_data.get('color', "primary")
+    is_expanded = folder_data.get('is_expanded', False)
+
+    # Create the expansion tile here
+    new_expansion_tile = Tree_View_Directory(
+        full_path=directory,
+        title=os.path.basename(os.path.normpath(directory)).capitalize(),
+        story=story,
+        page=page,
+        color=color,
+        rail=rail,
+        is_expanded=is_expanded,
+        additional_menu_options=additional_directory_menu_options,
+        additional_file_menu_options=additional_file_menu_options,
+        father=father,
+    )
+
+    # Register it so our rail can find and update just this tile later
+    if hasattr(rail, "directory_tiles"):
+        rail.directory_tiles[canon_path(directory)] = new_expansion_tile
+
+    # Only build what's inside if we're expanded. Collapsed folders build their children when opened
+    if is_expanded:
+        new_expansion_tile.children_loaded = True
+        load_directory_data(
+            page=page,                                                # Page reference
+            story=story,                                              # Story reference
+            directory=directory,                                      # Our new directory to load
+            dir_dropdown=new_expansion_tile,                          # Our new parent expansion tile
+            rail=rail,
+            additional_directory_menu_options=additional_directory_menu_options,           # Any additional menu options to pass down
+            additional_file_menu_options=additional_file_menu_options,
+            folders_meta=folders_meta,
+        )
+
+    return new_expansion_tile
+
+
+# Called when building our tree view, or when a single widget is added to it
+def build_file_item(widget, rail: ft.Control, father: Tree_View_Directory = None, additional_file_menu_options: list[ft.Control] = None) -> Tree_View_File:
+    ''' Builds the tree view item for one widget, and registers it with our rail '''
+
+    item = Tree_View_File(
+        widget,
+        father=father,
+        additional_menu_options=additional_file_menu_options
+    )
+
+    # Register it so our rail can find and update just this item later
+    if hasattr(rail, "file_items"):
+        rail.file_items[id(widget)] = item
+
+    return item
+
+
+# Run this file directly to benchmark single node rail updates against rebuilding the whole rail:  python -m handlers.tree_view
+def benchmark(folder_counts: tuple = (10, 100, 500), widgets_per_folder: tuple = (5, 20), repeats: int = 20) -> list:
+    ''' Times adding and removing one widget with both approaches as our tree grows.
+    Returns (folder count, widget count, rebuild ms, node ms, updates sent per node change) '''
+    import time
+    import tempfile
+    from ui.rails.rail import Rail
+    from handlers.story_tree import Story_Tree
+    from handlers.story_paths import Story_Paths, widget_key
+
+    class Fake_Story:
+        def __init__(self, root_path: str):
+            self.paths = Story_Paths(root_path)
+            self.story_tree = Story_Tree(root_path)
+            self.data = {'folders': {}}
+
+        def get_folder_data(self, full_path: str) -> dict:
+            return self.data['folders'].get(self.paths.relative(full_path), {})
+
+    class Fake_Widget:
+        def __init__(self, story, directory_path: str, title: str):
+            self.story = story
+            self.p = None
+            self.title = title
+            self.directory_path = directory_path
+            self.data = {'tag': "note", 'color': "primary", 'key': widget_key(directory_path, title)}
+
+    # Our controls aren't on a page, so we count the updates our node changes would send instead of sending them
+    updates = [0]
+    original_update = ft.Control.update
+
+    def count_update(self):
+        updates[0] += 1
+
+    ft.Control.update = count_update
+    results = []
+
+    try:
+        root_path = os.path.join(tempfile.gettempdir(), "benchmark_story")
+        for folder_count in folder_counts:
+            for widget_count in widgets_per_folder:
+
+                # Every folder is expanded, so a rebuild builds every node, the same as a story with all its folders open
+                story = Fake_Story(root_path)
+                story.story_tree.add_folder(root_path)
+                widgets = []
+                for i in range(folder_count):
+                    folder_path = os.path.join(root_path, f"folder {i}")
+                    story.story_tree.add_folder(folder_path)
+                    story.data['folders'][story.paths.relative(folder_path)] = {'color': "primary", 'is_expanded': True}
+                    for j in range(widget_count):
+                        widgets.append(Fake_Widget(story, folder_path, f"widget {j}"))
+
+                for widget in widgets:
+                    story.story_tree.add_widget(widget)
+
+                rail = Rail(page=None, story=story, directory_path=root_path)
+                new_widget = Fake_Widget(story, os.path.join(root_path, f"folder {folder_count // 2}"), "new widget")
+
+                # Our old approach: add the widget to our tree, then rebuild every folder and file in our rail
+                def rebuild():
+                    for _ in range(2):
+                        load_directory_data(page=None, story=story, directory=root_path, rail=rail, column=ft.ListView())
+
+                # Node level: just the new widgets item is built, and only its folder is updated
+                def node():
+                    rail.insert_widget(new_widget)
+                    rail.remove_widget(new_widget)
+
+                rebuild()
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    rebuild()
+                rebuild_time = (time.perf_counter() - start) / (repeats * 2) * 1000
+
+                updates[0] = 0
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    node()
+                node_time = (time.perf_counter() - start) / (repeats * 2) * 1000
+                sent = updates[0] / (repeats * 2)
+
+                results.append((folder_count, len(widgets), rebuild_time, node_time, sent))
+                print(f"{folder_count:>4} folders {len(widgets):>6} widgets   rebuild {rebuild_time:8.3f} ms ({folder_count + len(widgets)} nodes)   node {node_time:7.3f} ms ({sent:.0f} update sent)")
+
+    finally:
+        ft.Control.update = original_update
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,74 +1,199 @@
+'''
+Verifies our objects (Widgets, Mini Widgets, Stories, Settings) have all the data fields they need.
+Each required data template is compiled once per class into a flat list of fields, so we don't work out what every value is on every object.
+Filling reports if anything changed, and we only save when it did, so loading an object never rewrites its file for nothing.
+Data that has passed every schema its class verifies is stamped with one hash for that class, so next time we skip straight past it.
+Files are versioned by their 'schema_version' (see migrations), the stamp only says which required fields were already filled in.
+'''
 
-# Called when an object (Widget or Mini Widget) is loaded or created. 
-def verify_data(object, required_data: dict) -> bool:
-    ''' 
-    Verifys an object's data has all required fields passed in. 
-    Objects MUST have a save_dict() method, and a data attribute thats a dict.
-    '''
+import zlib
+
+
+# Keys that always take the value passed in, even if our data already has one
+FORCED_KEYS = ('tag', 'pin_location', 'directory_path')
+
+# Key in our data that holds the hash of the schemas it has passed
+SCHEMA_HASH_KEY = 'schema_hash'
+
+# Key older data used for a list of every schema version it had passed
+OLD_SCHEMA_VERSIONS_KEY = 'schema_versions'
+
+# What kind of field each required value is
+TYPE_FIELD, DICT_FIELD, VALUE_FIELD = 0, 1, 2
+
+
+class Compiled_Schema:
+
+    # Constructor. Works out what kind of field each required value is, once
+    def __init__(self, required_data: dict):
+
+        # (key, kind, sub schema) for each field we fill in if its missing
+        self.fields: list = []
+
+        # Keys we always overwrite with the value passed in
+        self.forced: list = []
 
-    # Internal recursive function to handle nested dicts, typing, and values all in one
-    def _verify_data(current_data: dict, required_data: dict):
-        ''' Internal recursive function to verify nested dicts '''
-        
-        # Run through each key in the required data we passed in
+        # (key, sub schema) for nested dicts that have forced keys somewhere in them
+        self.forced_children: list = []
+
+        shape = []
         for key, value in required_data.items():
 
-            # If its a certain type and the data doesn't match, make it default value of that type (int=0, str="", etc.)
             if isinstance(value, type):
+                self.fields.append((key, TYPE_FIELD, None))
+                shape.append((key, TYPE_FIELD, value.__name__))
 
-                # Make sure the key doesn't already exist so we don't override it
-                if key not in current_data:
-                    current_data[key] = value()
-
-                # OLD
-                #if key not in current_data or not isinstance(current_data[key], value):
-                   #current_data[key] = value()
-            
-            # If its a dict, make sure our key our key is a dict too, then recurse through this function
             elif isinstance(value, dict):
+                sub_schema = Compiled_Schema(value)
+                self.fields.append((key, DICT_FIELD, sub_schema))
+                shape.append((key, DICT_FIELD, sub_schema.version))
+
+                if sub_schema.forced or sub_schema.forced_children:
+                    self.forced_children.append((key, sub_schema))
+
+            elif key in FORCED_KEYS:
+                self.forced.append(key)
+                shape.append((key, VALUE_FIELD, "forced"))
 
-                # Make sure the key doesn't already exist so we don't override it
-                if key not in current_data or not isinstance(current_data[key], dict):
-                    current_data[key] = {}
-                    
-                # Recurse through this function to verify the nested dict
-                _verify_data(current_data[key], value)
-            
-            # Otherwise, we just set the value
             else:
+                self.fields.append((key, VALUE_FIELD, None))
+                shape.append((key, VALUE_FIELD, None))
+
+        # Our version only depends on our keys and what kind they are, not their values (which can differ per object, like titles).
+        # Data that passed us already has every key, so a different default value doesn't need it verified again
+        self.version: str = format(zlib.crc32(repr(shape).encode('utf-8')), '08x')
+
+    def fill(self, data: dict, required_data: dict) -> bool:
+        ''' Adds any missing fields to our data and applies our forced keys. Returns if anything changed '''
+
+        changed = False
+
+        for key, kind, sub_schema in self.fields:
+
+            # Missing types get that types default value (int=0, str="", etc.)
+            if kind == TYPE_FIELD:
+                if key not in data:
+                    data[key] = required_data[key]()
+                    changed = True
+
+            # Make sure our key is a dict too, then fill it in
+            elif kind == DICT_FIELD:
+                current = data.get(key, None)
+                if not isinstance(current, dict):
+                    current = data[key] = {}
+                    changed = True
+
+                if sub_schema.fill(current, required_data[key]):
+                    changed = True
+
+            # Otherwise, we just set the value if its missing
+            elif key not in data:
+                data[key] = required_data[key]
+                changed = True
+
+        if self.apply_forced(data, required_data, children=False):
+            changed = True
 
-                # Make sure the key doesn't already exist so we don't override it
-                if key not in current_data:
-                    current_data[key] = value
-                
-                # Special case for overwriting defaults 'tag' key to always set the value
-                elif key == 'tag':
-                    current_data[key] = value
+        return changed
 
-                # Special case for overwriting 'pin_location' key to always set the value
-                elif key == 'pin_location':
-                    current_data[key] = value
+    def apply_forced(self, data: dict, required_data: dict, children: bool = True) -> bool:
+        ''' Sets our forced keys (like 'directory_path', in case the user moved files outside of the app). Returns if anything changed '''
 
-                # Special case for overwriting 'directory_path' key to always set the value (in case user moves files outside of app)
-                elif key == 'directory_path':
-                    current_data[key] = value
-        
+        changed = False
 
-    # Main block to run our internal function above
+        for key in self.forced:
+            value = required_data[key]
+            if key not in data or data[key] != value:
+                data[key] = value
+                changed = True
+
+        if children:
+            for key, sub_schema in self.forced_children:
+                current = data.get(key, None)
+                if isinstance(current, dict) and sub_schema.apply_forced(current, required_data[key]):
+                    changed = True
+
+        return changed
+
+
+# Our compiled schemas, keyed by (class, required keys). Built the first time each class verifies its data
+compiled_schemas: dict = {}
+
+# The keys of the schemas each class verifies, in the order it verifies them (widgets verify once as a Widget, then as their own class)
+class_schemas: dict = {}
+
+# One hash per class of every schema it verifies, keyed by class
+class_hashes: dict = {}
+
+
+def get_schema(object, required_data: dict) -> Compiled_Schema:
+    ''' Returns the compiled schema for this required data, compiling it the first time '''
+
+    schema_key = (type(object), tuple(required_data))
+    schema = compiled_schemas.get(schema_key, None)
+    if schema is None:
+        schema = compiled_schemas[schema_key] = Compiled_Schema(required_data)
+
+        # Our class verifies a new schema, so its hash covers that one too
+        schema_keys = class_schemas.setdefault(type(object), [])
+        schema_keys.append(schema_key)
+        versions = "|".join(compiled_schemas[key].version for key in schema_keys)
+        class_hashes[type(object)] = format(zlib.crc32(versions.encode('utf-8')), '08x')
+
+    return schema
+
+
+# Called when an object (Widget or Mini Widget) is loaded or created.
+def verify_data(object, required_data: dict) -> bool:
+    '''
+    Verifys an object's data has all required fields passed in.
+    Objects MUST have a save_dict() method, and a data attribute thats a dict.
+    Only saves if something changed.
+    '''
+
+    # Main block to run our compiled schema
     try:
 
+        changed = False
+
         # Sets our data to an empty dict if None or not a dict, so we can add to it
         if object.data is None or not isinstance(object.data, dict):
             object.data = {}
+            changed = True
+
+        # Our class's hash isn't complete until every schema it verifies is compiled, which happens while building its first object
+        is_new_schema = (type(object), tuple(required_data)) not in compiled_schemas
+        schema = get_schema(object, required_data)
+        class_hash = class_hashes[type(object)]
 
-        # Run our objects data through the recursive function, and the required data
-        _verify_data(object.data, required_data)
+        # Drop the list of versions older data was stamped with
+        if object.data.pop(OLD_SCHEMA_VERSIONS_KEY, None) is not None:
+            changed = True
+
+        # Already passed every schema our class verifies, so it has every field. Only our forced keys could be different
+        if object.data.get(SCHEMA_HASH_KEY, None) == class_hash:
+            if schema.apply_forced(object.data, required_data):
+                changed = True
+
+        else:
+            if schema.fill(object.data, required_data):
+                changed = True
+
+            # Our data has only passed every schema once the last one our class verifies has filled it in
+            if class_schemas[type(object)][-1] == (type(object), tuple(required_data)):
+                object.data[SCHEMA_HASH_KEY] = class_hash
+
+                # So the first object of each class only saves if filling changed something, not for a stamp that's still changing
+                if not is_new_schema:
+                    changed = True
+
+        # Save our updated data back to the file, only if we changed it
+        if changed:
+            object.save_dict()
 
-        # Save our updated data back to the file
-        object.save_dict()      
         return True
-    
+
     # Catch errors
     except Exception as e:
-        print(f"Error verifying data for object {object.title}: {e}")
+        print(f"Error verifying data for object {getattr(object, 'title', object)}: {e}")
         return False
@@ -0,0 +1,210 @@
+'''
+Loads the widget files of a story before we build any widgets.
+We walk our story folders once to find every widget file, then read and parse them all at the same time in a thread pool
+(or a process pool, since json parsing holds the GIL), and hand back the ready dicts for our widget constructors.
+Doesn't import flet, so it can run in worker processes.
+'''
+
+import os
+import json
+import time
+import concurrent.futures
+
+
+# Which story folders hold which widgets. (category, data key of the folder, sub folder)
+WIDGET_FOLDERS = (
+    ("content", 'content_directory_path', ""),
+    ("characters", 'characters_directory_path', ""),
+    ("timelines", 'timelines_directory_path', ""),
+    ("maps", 'world_building_directory_path', "maps"),
+)
+
+# Files that live next to our widgets but aren't widgets themselves
+SKIPPED_SUFFIXES = ("_text.json", "_display.json")
+
+
+# Called when loading our story
+def find_widget_files(story_data: dict, categories: list = None) -> dict:
+    ''' Walks our story folders once. Returns a dict of category -> list of (dirpath, filename) for every widget file found '''
+
+    widget_files = {}
+
+    for category, directory_key, sub_folder in WIDGET_FOLDERS:
+        if categories is not None and category not in categories:
+            continue
+
+        widget_files[category] = []
+
+        directory_path = story_data.get(directory_key, None)
+        if not directory_path:
+            continue
+
+        if sub_folder:
+            directory_path = os.path.join(directory_path, sub_folder)
+
+        for dirpath, dirnames, filenames in os.walk(directory_path):
+
+            # Sort so our widgets load in the same order every time
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".json") and not filename.endswith(SKIPPED_SUFFIXES):
+                    widget_files[category].append((dirpath, filename))
+
+    return widget_files
+
+
+# Runs in our pool, so it has to be a top level function
+def read_widget_file(file_path: str) -> tuple:
+    ''' Reads and parses one widget file. Returns (data, error). Never raises, so one bad file can't stop our whole load '''
+
+    try:
+        with open(file_path, "r", encoding='utf-8') as f:
+            return json.load(f), None
+
+    except (json.JSONDecodeError, OSError, UnicodeDecodeError) as e:
+        return None, e
+
+
+# Called when loading our story
+def read_widget_files(file_paths: list, workers: int = 0, use_processes: bool = False) -> dict:
+    ''' Reads and parses all our files at once. Returns a dict of file_path -> (data, error) '''
+
+    if not file_paths:
+        return {}
+
+    # Zero means pick for us
+    if not workers or workers < 1:
+        workers = min(32, (os.cpu_count() or 1) + 4) if not use_processes else (os.cpu_count() or 1)
+
+    # Not worth starting a pool for one worker or a handful of files
+    if workers == 1 or len(file_paths) < 8:
+        return {file_path: read_widget_file(file_path) for file_path in file_paths}
+
+    if use_processes:
+        executor_class = concurrent.futures.ProcessPoolExecutor
+    else:
+        executor_class = concurrent.futures.ThreadPoolExecutor
+
+    # Send our files in chunks so process pools aren't pickling one tiny task at a time
+    chunk_size = max(1, len(file_paths) // (workers * 4))
+
+    try:
+        with executor_class(max_workers=workers) as executor:
+            results = executor.map(read_widget_file, file_paths, chunksize=chunk_size)
+            return dict(zip(file_paths, results))
+
+    # If our pool can't start (no process support, etc.), just read them here
+    except (OSError, RuntimeError, concurrent.futures.BrokenExecutor) as e:
+        print(f"Error starting widget loader pool, loading serially: {e}")
+        return {file_path: read_widget_file(file_path) for file_path in file_paths}
+
+
+# Called at the start of our story startup
+def load_story_files(story_data: dict, workers: int = 0, use_processes: bool = False, categories: list = None, cache=None) -> dict:
+    ''' Finds and reads every widget file in our story (or just some categories). Returns a dict of category -> list of (dirpath, filename, data, error)
+    If given a parse cache, unchanged files come from it and are never opened '''
+
+    widget_files = find_widget_files(story_data, categories)
+
+    file_paths = [
+        os.path.join(dirpath, filename)
+        for files in widget_files.values()
+        for dirpath, filename in files
+    ]
+
+    # Check our cache first, and only read the files it doesn't have (or that changed)
+    results = {}
+    stats = {}
+    if cache is not None:
+        for file_path in file_paths:
+            try:
+                stats[file_path] = os.stat(file_path)
+            except OSError:
+                continue
+
+            data = cache.get(file_path, stats[file_path])
+            if data is not None:
+                results[file_path] = (data, None)
+
+    missed_paths = [file_path for file_path in file_paths if file_path not in results]
+    read_results = read_widget_files(missed_paths, workers, use_processes)
+    results.update(read_results)
+
+    # Cache what we just parsed for next time
+    if cache is not None:
+        for file_path, (data, error) in read_results.items():
+            if error is None and file_path in stats:
+                cache.put(file_path, data, stats[file_path])
+
+    loaded = {}
+    for category, files in widget_files.items():
+        loaded[category] = []
+        for dirpath, filename in files:
+            data, error = results[os.path.join(dirpath, filename)]
+            loaded[category].append((dirpath, filename, data, error))
+
+    return loaded
+
+
+# Run this file directly to benchmark how our loader scales:  python -m handlers.widget_loader <story folder> [repeats]
+def benchmark(story_directory: str, repeats: int = 3) -> list:
+    ''' Times loading a story's widget files with different worker counts, with threads and processes, and from a warm parse cache.
+    Returns (mode, workers, seconds) '''
+
+    # Point our widget folders at the story folder layout we create
+    story_data = {
+        'content_directory_path': os.path.join(story_directory, "content"),
+        'characters_directory_path': os.path.join(story_directory, "characters"),
+        'timelines_directory_path': os.path.join(story_directory, "timelines"),
+        'world_building_directory_path': os.path.join(story_directory, "world_building"),
+    }
+
+    file_count = sum(len(files) for files in find_widget_files(story_data).values())
+    print(f"Loading {file_count} widget files from {story_directory}")
+
+    results = []
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpu_count})
+
+    for use_processes in (False, True):
+        for workers in worker_counts:
+
+            # Best of our repeats, so one slow run from the OS doesn't skew us
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                load_story_files(story_data, workers, use_processes)
+                best = min(best, time.perf_counter() - start)
+
+            mode = "processes" if use_processes else "threads"
+            results.append((mode, workers, best))
+            print(f"{mode:>9} x {workers:<3} {best * 1000:8.1f} ms")
+
+
+    # Warm our cache once, then time loading from it
+    from handlers.parse_cache import Parse_Cache
+    import tempfile
+    with tempfile.TemporaryDirectory() as cache_directory:
+        cache = Parse_Cache(os.path.join(cache_directory, "benchmark.pickle"))
+        load_story_files(story_data, cache=cache)
+        cache.save()
+
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            load_story_files(story_data, cache=Parse_Cache(cache.cache_path))
+            best = min(best, time.perf_counter() - start)
+
+        results.append(("cache", 1, best))
+        print(f"{'cache':>9} x {1:<3} {best * 1000:8.1f} ms")
+
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m handlers.widget_loader <story folder> [repeats]")
+    else:
+        benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)
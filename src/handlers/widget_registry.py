@@ -0,0 +1,199 @@
+'''
+Central registry of every widget in our story, with indexes so we can find widgets by key, tag, directory,
+title, or pin location with a dict lookup instead of scanning all our widgets.
+Widgets are re-indexed whenever they save (see widget.save_dict), so renames, moves, and pin changes keep our indexes right.
+'''
+
+import os
+from handlers.story_tree import canon_path
+
+
+class Widget_Registry:
+
+    # Constructor
+    def __init__(self):
+
+        # Every widget we hold, keyed by its id (widgets aren't always hashable), with the index values we filed it under
+        # id -> (widget, key, tag, directory, title, pin_location)
+        self.entries: dict = {}
+
+        # Our indexes. Every one but by_key holds dicts of id -> widget, so removing is quick and insertion order is kept
+        self.by_key: dict = {}              # Normalized key -> widget
+        self.by_tag: dict = {}              # Tag -> widgets
+        self.by_directory: dict = {}        # Normalized directory path -> widgets
+        self.by_title: dict = {}            # Lowercase title -> widgets
+        self.by_pin: dict = {}              # Pin location -> widgets
+
+        # Normalized directory path -> the directories right under it that hold widgets (or have ones under them that do),
+        # So recursive directory lookups only walk the folders under them
+        self.subdirectories: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, widget) -> bool:
+        return id(widget) in self.entries
+
+    # Called when our story loads its widgets
+    def rebuild(self, widgets: list):
+        ''' Clears our registry and adds all our widgets '''
+
+        self.clear()
+        for widget in widgets:
+            self.add(widget)
+
+    def clear(self):
+        ''' Removes every widget '''
+
+        self.entries.clear()
+        self.by_key.clear()
+        self.by_tag.clear()
+        self.by_directory.clear()
+        self.by_title.clear()
+        self.by_pin.clear()
+        self.subdirectories.clear()
+
+    # Called when a widget is created or loaded
+    def add(self, widget):
+        ''' Adds a widget to our registry, or re-indexes it if its already in here '''
+
+        if id(widget) in self.entries:
+            self.remove(widget)
+
+        data = widget.data or {}
+        values = (
+            canon_path(data.get('key', "") or ""),
+            data.get('tag', None),
+            canon_path(getattr(widget, 'directory_path', "") or ""),
+            str(getattr(widget, 'title', "") or "").lower(),
+            data.get('pin_location', None),
+        )
+        key, tag, directory, title, pin_location = values
+
+        self.entries[id(widget)] = (widget,) + values
+
+        if directory not in self.by_directory:
+            self._link_directory(directory)
+
+        self.by_key[key] = widget
+        self.by_tag.setdefault(tag, {})[id(widget)] = widget
+        self.by_directory.setdefault(directory, {})[id(widget)] = widget
+        self.by_title.setdefault(title, {})[id(widget)] = widget
+        self.by_pin.setdefault(pin_location, {})[id(widget)] = widget
+
+    # Called when a widget is deleted
+    def remove(self, widget):
+        ''' Removes a widget from our registry '''
+
+        entry = self.entries.pop(id(widget), None)
+        if entry is None:
+            return
+
+        _, key, tag, directory, title, pin_location = entry
+
+        if self.by_key.get(key, None) is widget:
+            del self.by_key[key]
+
+        for index, value in ((self.by_tag, tag), (self.by_directory, directory), (self.by_title, title), (self.by_pin, pin_location)):
+            widgets = index.get(value, None)
+            if widgets is not None:
+                widgets.pop(id(widget), None)
+                if not widgets:
+                    del index[value]
+
+        if directory not in self.by_directory:
+            self._unlink_directory(directory)
+
+    # Called whenever a widget saves, since its key, title, directory, or pin may have changed
+    def update(self, widget):
+        ''' Re-indexes a widget if its in our registry. Does nothing for widgets we don't hold (still being built) '''
+
+        entry = self.entries.get(id(widget), None)
+        if entry is None:
+            return
+
+        data = widget.data or {}
+
+        # Skip the work if nothing we index changed
+        if (
+            entry[1] == canon_path(data.get('key', "") or "")
+            and entry[2] == data.get('tag', None)
+            and entry[3] == canon_path(getattr(widget, 'directory_path', "") or "")
+            and entry[4] == str(getattr(widget, 'title', "") or "").lower()
+            and entry[5] == data.get('pin_location', None)
+        ):
+            return
+
+        self.add(widget)
+
+    def get(self, key: str, tag: str = None):
+        ''' Returns the widget with a key (compared normalized), or None. If given a tag, the widget must have it too '''
+
+        widget = self.by_key.get(canon_path(key), None)
+        if widget is not None and tag is not None and widget.data.get('tag', None) != tag:
+            return None
+
+        return widget
+
+    def with_tag(self, tag: str) -> list:
+        ''' Returns all widgets with a tag '''
+        return list(self.by_tag.get(tag, {}).values())
+
+    def with_title(self, title: str, tag: str = None) -> list:
+        ''' Returns all widgets with a title (case insensitive), optionally only ones with a tag '''
+
+        widgets = self.by_title.get(str(title).lower(), {}).values()
+        if tag is None:
+            return list(widgets)
+
+        return [widget for widget in widgets if widget.data.get('tag', None) == tag]
+
+    def in_directory(self, directory_path: str, recursive: bool = False) -> list:
+        ''' Returns all widgets in a directory, or in it and everything under it if recursive '''
+
+        directory = canon_path(directory_path)
+        if not recursive:
+            return list(self.by_directory.get(directory, {}).values())
+
+        widgets = []
+        stack = [directory]
+        while stack:
+            path = stack.pop()
+            widgets.extend(self.by_directory.get(path, {}).values())
+            stack.extend(self.subdirectories.get(path, ()))
+
+        return widgets
+
+    def in_pin(self, pin_location: str) -> list:
+        ''' Returns all widgets in a pin location '''
+        return list(self.by_pin.get(pin_location, {}).values())
+
+    # Called when a directory gets its first widget
+    def _link_directory(self, directory: str):
+        ''' Links a directory to its parent, and its parent to its own parent, until we reach one that's already linked '''
+
+        child, parent = directory, os.path.dirname(directory)
+        while parent != child:
+            children = self.subdirectories.setdefault(parent, set())
+            if child in children:
+                return
+
+            children.add(child)
+            child, parent = parent, os.path.dirname(parent)
+
+    # Called when a directory loses its last widget
+    def _unlink_directory(self, directory: str):
+        ''' Unlinks a directory from its parent if nothing is left in or under it, then does the same for its parent '''
+
+        child, parent = directory, os.path.dirname(directory)
+        while parent != child and child not in self.by_directory and child not in self.subdirectories:
+            children = self.subdirectories.get(parent, None)
+            if children is None:
+                return
+
+            children.discard(child)
+            if children:
+                return
+
+            del self.subdirectories[parent]
+            child, parent = parent, os.path.dirname(parent)
@@ -3,9 +3,9 @@ Our model for our app. Contains settings and stories, as well as methods to load
 '''
 
 from models.views.story import Story
+from models.story_catalog import Story_Catalog
 import flet as ft
 import os
-import json
 from models.widget import Widget
 import asyncio
 
@@ -17,9 +17,11 @@ class App:
         # Declares settings and workspace rail here, but we create/load them later in main
         self.settings: Widget = ft.Container()
         
-        # Dict of all our stories.
-        self.stories = {}
-        #self.stories: dict[str, Story] = {}
+        # Dict of all our stories that have been built (opened) this session
+        self.stories: dict[str, Story] = {}
+
+        # Lightweight catalog of every story we have, which we use to list and route to stories without building them
+        self.story_catalog: Story_Catalog = Story_Catalog()
 
 
     # Called on app startup in main
@@ -28,6 +30,7 @@ class App:
         from models.views.settings import Settings
         from models.app import app
         from constants import data_paths
+        from handlers import storage
 
         # Should just look for our settings file to load our data from. Settings should do all other logic
         os.makedirs(data_paths.app_data_path, exist_ok=True)
@@ -36,14 +39,12 @@ class App:
         settings_file_path = os.path.join(data_paths.app_data_path, "settings.json")
 
         # Create settings.json with empty dict if it doesn't exist
-        if not os.path.exists(settings_file_path):
-            with open(settings_file_path, "w", encoding='utf-8') as f:
-                json.dump({}, f)
+        if not os.path.exists(settings_file_path) and not os.path.exists(settings_file_path + ".bak"):
+            storage.write_json(settings_file_path, {})
         
         try:
-            # Read the JSON file
-            with open(settings_file_path, "r", encoding='utf-8') as f:
-                settings_data = json.load(f)
+            # Read the JSON file. Falls back to our backup if a crash left it corrupt
+            settings_data = storage.read_json(settings_file_path)
 
         # If no file exists, create one with default settings
         except(FileNotFoundError):
@@ -85,77 +86,93 @@ class App:
 
     # Called on app startup in main
     async def load_previous_story(self, page: ft.Page):
-        ''' Loads our saved stories from the json files in story folders within the stories directory. If none exist, do nothing '''
+        ''' Loads our story catalog (not the full stories), and routes to our previous story if we had one. If none exist, gives us the home view '''
         
         from constants import data_paths
-        from models.app import app
         
         # Create the stories directory if it doesnt exist already
         os.makedirs(data_paths.stories_directory_path, exist_ok=True)
-            
-        # Iterate through all items in the stories directory
-        for story_folder in os.listdir(data_paths.stories_directory_path):
 
-            story_directory = os.path.join(data_paths.stories_directory_path, story_folder)
-                
-            # Look for JSON files within this story folder (ignore subdirectories)
-            try:
-                
-                # Check every item (folder and file) in this story folder
-                for item in os.listdir(story_directory):
-
-                    # Check for the story json data file. If it is, we'll load our story around this file data
-                    if item.endswith(".json"):
-
-                        # Set the file path to this json file so we can open it
-                        file_path = os.path.join(story_directory, item)
-
-                        # Read the JSON file
-                        with open(file_path, "r", encoding='utf-8') as f:
-                            # Set our data to be passed into our objects
-                            story_data = json.load(f)
-
-                        # Our story title is the same as the folder
-                        story_title = story_data.get("title", file_path.replace(".json", ""))
-                            
-                        app.stories[story_title] = Story(story_title, page, data=story_data)
-
-                        break
-                    # Else, continue through the next story folder
-                    else:
-                        continue
-                        
-            except Exception as e:
-                print(f"Error loading story {story_title}: {e}. May not be a directory")
-            
+        # Read our lightweight story catalog. Stories are only fully built when we route to them
+        self.story_catalog.load()
 
-        # Initialize and load all our stories data and UI elements
-        for story in app.stories.values():
-            
-            # Sets our active story to the page route. The route change function will load the stories data and UI
-            if story.route == app.settings.data.get('active_story', None):
-                app.settings.story = story  # Gives our settings widget the story reference it needs
-                await page.push_route(story.route)
-                return
-                
+        # Sets our active story to the page route. The route change function will build the story and load its data and UI
+        entry = self.story_catalog.get_entry(self.settings.data.get('active_story', None))
+        if entry is not None:
+            await page.push_route(entry['route'])
+            return
             
         # Give us home view if no stories were active
         #print("Page route is: ", page.route)
         await page.push_route("/home")
         
 
+    # Called by route change when we route to a story
+    def get_story(self, route: str, page: ft.Page) -> Story:
+        ''' Returns the story for our route, building it from its file the first time we route to it. Returns None if no story matches '''
+
+        # Check if we already built this story
+        for story in self.stories.values():
+            if story.route == route:
+                return story
+
+        # Otherwise check our catalog for it
+        entry = self.story_catalog.get_entry(route)
+        if entry is None:
+            return None
+        
+        # Read the full story data now that we actually need it
+        story_data = self.story_catalog.read_story_data(route)
+        if story_data is None:
+            return None
+
+        story = Story(entry['title'], page, data=story_data)
+        self.stories[entry['title']] = story
+
+        return story
+
     
-    
+    # Called when a story is deleted from our menu bar
+    async def delete_story(self, story: Story, page: ft.Page):
+        ''' Deletes a story's folder and parse cache, drops it from our catalog, and sends us back home '''
+
+        from handlers.save_scheduler import save_scheduler
+        import shutil
+
+        directory_path = os.path.dirname(story.get_file_path())
+
+        try:
+            # Drop any pending saves inside our story so they don't recreate it
+            save_scheduler.cancel_directory(directory_path)
+            shutil.rmtree(directory_path)
+
+        # Handle errors
+        except Exception as e:
+            print(f"Error deleting story {story.title}: {e}")
+            return
+
+        story.parse_cache.delete()
+        self.stories.pop(story.title, None)
+        self.story_catalog.remove_story(story.route)
+
+        # Don't try to reopen it next launch
+        if self.settings.data.get('active_story', None) == story.route:
+            self.settings.data['active_story'] = "/"
+            self.settings.story = None
+            self.settings.save_dict()
+
+        await page.push_route("/home")
+
     # Called when app creates a new story. Accepts our title, page reference, a template, and a type
     async def create_new_story(self, title: str, page: ft.Page, template: str):
         ''' Creates the new story object and has it run its 'startup' method. Changes route so our view displays the new story '''
 
         # TODO: Add a type to accept for novel/comic
         
+        # Create a new story object and add it to our stories dict and catalog
         story = Story(title.title(), page, data=None, template=template)
-        
-        # Create a new story object and add it to our stories dict
-        self.stories[title.title()] = Story(title.title(), page, data=None, template=template)
+        self.stories[title.title()] = story
+        self.story_catalog.update_story(story)
 
         # Opens this new story as the active one on screen
         await page.push_route(story.route)
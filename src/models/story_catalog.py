@@ -0,0 +1,224 @@
+'''
+Lightweight catalog of all the stories in our stories directory.
+Stores just enough about each story (title, route, last modified, file mtime) to list them and route to them,
+So on startup we read one small file instead of parsing every story JSON and building every Story object.
+Full Story objects are only built when we actually route to them (see app.get_story).
+Paths are stored relative to our stories directory, so our catalog still works if our data folder moves.
+Each entry remembers its story file's mtime, so story files changed outside the app are re-read on startup.
+'''
+
+import os
+import json
+from constants import data_paths
+from handlers import storage
+from handlers.story_layout import LAYOUT_FILE_NAME
+
+
+class Story_Catalog:
+
+    # Constructor
+    def __init__(self):
+
+        # Where our catalog is stored
+        self.file_path: str = data_paths.story_catalog_path
+
+        # Our catalog entries, keyed by story route. Each entry is a small dict:
+        # {'title', 'route', 'folder', 'file_path', 'last_modified', 'mtime'}. Folder and file path are relative to our stories directory
+        self.entries: dict = {}
+
+    # Called on app startup before we route to our previous story
+    def load(self) -> dict:
+        ''' Reads our catalog in one call, then reconciles it against the story folders that actually exist '''
+
+        # Read our catalog file if we have one
+        try:
+            with open(self.file_path, "r", encoding='utf-8') as f:
+                catalog_data = json.load(f)
+
+            self.entries = catalog_data.get('stories', {}) if isinstance(catalog_data, dict) else {}
+
+        # No catalog yet (first launch after update) or its corrupt, so we rebuild it below
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as e:
+            print(f"Error loading story catalog {self.file_path}: {e}")
+            self.entries = {}
+
+        # Make sure our catalog still matches our stories directory, and save it if anything changed
+        if self.reconcile():
+            self.save()
+
+        return self.entries
+
+    # Called when loading our catalog
+    def reconcile(self) -> bool:
+        ''' Adds entries for story folders missing from the catalog, drops entries whose folder is gone,
+        And re-reads entries whose story file changed since we cataloged it. Returns if anything changed '''
+
+        changed = False
+
+        # Make sure our stories directory exists
+        os.makedirs(data_paths.stories_directory_path, exist_ok=True)
+
+        # Only lists our folder names, we don't open any story files that are already cataloged
+        story_folders = set(os.listdir(data_paths.stories_directory_path))
+
+        for route, entry in list(self.entries.items()):
+
+            # Drop any stories that were deleted outside of the app
+            if entry.get('folder', None) not in story_folders:
+                self.entries.pop(route, None)
+                changed = True
+                continue
+
+            # Catalogs from before stored full paths
+            if os.path.isabs(entry.get('file_path', "")):
+                entry['file_path'] = os.path.join(entry['folder'], os.path.basename(entry['file_path']))
+                changed = True
+
+            # Story file changed since we cataloged it (or is gone), so read it again in case its title or route changed
+            try:
+                mtime = os.path.getmtime(self.get_file_path(entry))
+            except OSError:
+                mtime = None
+
+            if mtime != entry.get('mtime', None):
+                self.entries.pop(route, None)
+                new_entry = self._scan_story_folder(entry['folder'])
+                if new_entry is not None:
+                    self.entries[new_entry['route']] = new_entry
+                changed = True
+
+        # Catalog any new story folders (or every folder if we had no catalog)
+        cataloged_folders = {entry.get('folder', None) for entry in self.entries.values()}
+        for story_folder in story_folders:
+            if story_folder in cataloged_folders:
+                continue
+
+            entry = self._scan_story_folder(story_folder)
+            if entry is not None:
+                self.entries[entry['route']] = entry
+                changed = True
+
+        return changed
+
+    # Called when we find a story folder we don't have cataloged yet
+    def _scan_story_folder(self, story_folder: str) -> dict:
+        ''' Finds the story json file in a story folder and builds its catalog entry '''
+
+        story_directory = os.path.join(data_paths.stories_directory_path, story_folder)
+
+        try:
+            # Check every item in this story folder for the story json data file (ignore subdirectories)
+            for item in os.listdir(story_directory):
+                if item.endswith(".json") and item != LAYOUT_FILE_NAME:
+
+                    file_path = os.path.join(story_directory, item)
+
+                    # Read the JSON file
+                    with open(file_path, "r", encoding='utf-8') as f:
+                        story_data = json.load(f)
+
+                    # Our story title is the same as the folder
+                    title = story_data.get("title", item.replace(".json", ""))
+
+                    return self._build_entry(
+                        title=title,
+                        route=story_data.get('route', f"/{title}"),
+                        folder=story_folder,
+                        file_path=file_path,
+                        last_modified=story_data.get('last_modified', ""),
+                    )
+
+        except Exception as e:
+            print(f"Error cataloging story folder {story_folder}: {e}. May not be a directory")
+
+        return None
+
+    # Called whenever we create or update an entry
+    def _build_entry(self, title: str, route: str, folder: str, file_path: str, last_modified: str) -> dict:
+        ''' Returns a catalog entry dict for a story '''
+
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            mtime = 0.0
+
+        return {
+            'title': title,
+            'route': route,
+            'folder': folder,
+            'file_path': os.path.join(folder, os.path.basename(file_path)),
+            'last_modified': last_modified,
+            'mtime': mtime,
+        }
+
+    def get_file_path(self, entry: dict) -> str:
+        ''' Returns the full path to a cataloged story's json file '''
+        return os.path.join(data_paths.stories_directory_path, entry['file_path'])
+
+    # Called whenever our catalog changes
+    def save(self):
+        ''' Saves our catalog to its JSON file '''
+
+        try:
+            storage.write_json(self.file_path, {'stories': self.entries})
+
+        # Handle errors
+        except Exception as e:
+            print(f"Error saving story catalog to {self.file_path}: {e}")
+
+    # Called when a story is created or loaded, so our catalog matches its real data
+    def update_story(self, story):
+        ''' Updates (or adds) the catalog entry for a live story object and saves the catalog '''
+
+        file_path = story.get_file_path()
+
+        entry = self._build_entry(
+            title=story.title,
+            route=story.route,
+            folder=os.path.basename(os.path.dirname(file_path)),
+            file_path=file_path,
+            last_modified=story.data.get('last_modified', ""),
+        )
+
+        # Only write our catalog if something actually changed
+        if self.entries.get(story.route, None) != entry:
+            self.entries[story.route] = entry
+            self.save()
+
+    # Called when a story is deleted
+    def remove_story(self, route: str):
+        ''' Removes a story from our catalog '''
+
+        if self.entries.pop(route, None) is not None:
+            self.save()
+
+    def get_entry(self, route: str) -> dict:
+        ''' Returns the catalog entry for a route, or None if we don't have that story '''
+        return self.entries.get(route, None)
+
+    def get_entry_by_title(self, title: str) -> dict:
+        ''' Returns the catalog entry for a story title, or None if we don't have that story '''
+
+        for entry in self.entries.values():
+            if entry.get('title', None) == title:
+                return entry
+
+        return None
+
+    # Called when we route to a story that hasn't been built yet
+    def read_story_data(self, route: str) -> dict:
+        ''' Reads the full story data for a cataloged story. Returns None if it can't be read '''
+
+        entry = self.entries.get(route, None)
+        if entry is None:
+            return None
+
+        try:
+            return storage.read_json(self.get_file_path(entry))
+
+        # Handle errors
+        except Exception as e:
+            print(f"Error loading story {entry.get('title', route)}: {e}")
+            return None
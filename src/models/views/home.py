@@ -40,8 +40,8 @@ def create_home_view(page: ft.Page) -> ft.View:
 
             
 
-            for story in app.stories.values():
-                if story.title == title:
+            for entry in app.story_catalog.entries.values():
+                if entry['title'] == title:
                     is_unique = False
                     break
 
@@ -1,14 +1,31 @@
 import flet as ft
 
 
-def create_loading_view(page: ft.Page) -> ft.View:
-    ''' Creates a loading view to be shown while the app is initializing '''
+def create_loading_view(page: ft.Page, message: str = "Loading...") -> ft.View:
+    ''' Creates a loading view to be shown while the app is initializing, or while a story loads '''
+
+    # Kept in our views data so update_loading_view can change them
+    status = ft.Text("", size=14)
+    progress_bar = ft.ProgressBar(width=300, value=None)
+
     return ft.View(
         controls=[
-            ft.Text("Loading...", size=24),
-            ft.ProgressRing()
+            ft.Text(message, size=24),
+            ft.ProgressRing(),
+            progress_bar,
+            status,
         ],
         route="/loading",
         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         vertical_alignment=ft.MainAxisAlignment.CENTER,
-    )
\ No newline at end of file
+        data={'status': status, 'progress_bar': progress_bar},
+    )
+
+
+# Called as our story loads
+def update_loading_view(view: ft.View, message: str, value: float = None):
+    ''' Shows what we're loading and how far along we are (0 to 1, or None if we don't know) '''
+
+    view.data['status'].value = message
+    view.data['progress_bar'].value = value
+    view.update()
@@ -7,9 +7,9 @@ import flet as ft
 from models.views.story import Story
 from models.widget import Widget
 from handlers.verify_data import verify_data
+from handlers import storage
 from styles.colors import colors
 import os
-import json
 from styles.colors import dark_gradient
 from ui.menu_bar import create_menu_bar
 from ui.workspaces_rail import Workspaces_Rail
@@ -56,6 +56,10 @@ class Settings(ft.View):
                 'page_is_maximized': True,   # If the window is maximized or not
                 'page_width': int,     # Last known page width
                 'page_height': int,    # Last known page height
+                'widget_loader_workers': 0,     # How many workers read our widget files when loading a story. 0 picks for us
+                'widget_loader_use_processes': False,   # If our widget loader uses processes instead of threads
+                'hidden_widget_ui_limit': 10,       # How many hidden widgets keep their built UI, so reopening them is instant
+                'hidden_widget_ui_seconds': 300,    # Hidden widgets drop their built UI after this many seconds
                 'workspaces_rail_order': [      # Order of the workspace rail
                     "content",
                     "characters",
@@ -77,9 +81,8 @@ class Settings(ft.View):
 
         try:
             
-            # Save the data to the file (creates file if doesnt exist)
-            with open(self.file_path, "w", encoding='utf-8') as f:   
-                json.dump(self.data, f, indent=4)
+            # Atomically save the data to the file (creates file if doesnt exist)
+            storage.write_json(self.file_path, self.data, backup=True)
         
         # Handle errors
         except Exception as e:
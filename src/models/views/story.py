@@ -7,10 +7,20 @@ Stories contain metadata, ui elements, and all the widgets, as well as methods t
 
 import flet as ft
 import os
+import time
+import asyncio
 import shutil
-import json
+from threading import Thread
 from constants import data_paths
 from handlers.verify_data import verify_data
+from handlers.migrations import migrate_data, SCHEMA_VERSION, STORY_PATH_KEYS
+from handlers.story_paths import Story_Paths, widget_key
+from handlers.save_scheduler import save_scheduler
+from handlers.parse_cache import Parse_Cache
+from handlers.story_tree import Story_Tree
+from handlers.widget_registry import Widget_Registry
+from handlers.story_layout import Story_Layout, LAYOUT_FILE_NAME
+from handlers.story_batch import Story_Batch
 from styles.snack_bar import Snack_Bar
 from handlers.safe_string_checker import return_safe_name
 
@@ -40,21 +50,17 @@ class Story(ft.View):
         self.template = template        # Template for our story (sci-fi, fantasy, etc.)
         self.type = type                # Type of story, novel or comic. Affects how templates for creating new content will work
 
+        # Brings data from older versions of our app up to date. Current files are just one version check
+        migrated = migrate_data(self.data)
+
         # Verifies this object has the required data fields, and creates them if not
         verify_data(
             self,           # Pass in our own data so the function can see the actual data we loaded
             {
                 'title': self.title,
                 'route': self.route,
-                'directory_path': os.path.join(data_paths.stories_directory_path, self.route),
                 'tag': "story",
                 'selected_rail': "content",
-                'content_directory_path': os.path.join(data_paths.stories_directory_path, self.route, "content"),
-                'characters_directory_path': os.path.join(data_paths.stories_directory_path, self.route, "characters"),
-                'timelines_directory_path': os.path.join(data_paths.stories_directory_path, self.route, "timelines"),
-                'world_building_directory_path': os.path.join(data_paths.stories_directory_path, self.route, "world_building"),
-                'maps_directory_path': os.path.join(data_paths.stories_directory_path, self.route, "world_building", "maps"),
-                'planning_directory_path': os.path.join(data_paths.stories_directory_path, self.route, "planning"),
                 'top_pin_height': 200,
                 'left_pin_width': 230,
                 'main_pin_height': int,
@@ -72,13 +78,14 @@ class Story(ft.View):
                 
                 # Dict of all our categories INSIDE of basic story structure (content, characters, timelines)
                 'folders': {
-                    'path': {                   # Path to the category folder (used as the key, since all will be unique)
+                    'path': {                   # Path to the category folder, relative to our story folder (used as the key, since all will be unique)
                         'name': str,            # Name of category just in case
                         'color': str,           # Color of that folder
                         'is_expanded': True     # Whether this folder is expanded in the tree view
                     }
                 },            
                 'is_new_story': True,      # Whether this story is newly created or loaded from storage
+                'schema_version': SCHEMA_VERSION,   # How many of our data migrations this story has had
 
                 # Paint settings for our canvas drawings to use as default that they will then change
                 'paint_settings': {
@@ -101,14 +108,27 @@ class Story(ft.View):
                 # Other canvas related settings that are not technically paint
                 'canvas_settings':{
                     'erase_mode': False,               # Whether we're in erase mode or not
+                    'erase_objects': False,            # Whether erase mode removes whole strokes instead of painting over them
+                    'select_mode': False,              # Whether tapping and dragging on canvases selects whole strokes instead of drawing
                     'stroke_dash_pattern': [10, 15],
+                    'simplify_strokes': True,          # Whether freehand strokes are simplified when we finish drawing them
+                    'simplify_tolerance': 1.0,         # How far (in screen pixels) simplified strokes can stray from what we drew
+                    'max_updates_per_second': 60,      # Most times per second we send a stroke we're drawing to the client
+                    'tile_cache_threshold': 500,       # Number of paths before a canvas shows its drawing as cached image tiles. 0 turns tiles off
+                    'debug_stats': False,              # Whether canvases print what each stroke sent and how much simplifying saved
                 }
             },
         )
 
-        
-        
-        
+        # Our folder paths all come from where our story is, so they're set here and never saved to our file
+        self.set_directory_paths()
+
+        # Save our migrated data, in case verifying didn't need to
+        if migrated:
+            self.save_dict()
+
+        # Groups many changes into one write per file, one rail refresh, and one page update. Used as 'with story.batch():'
+        self.story_batch = Story_Batch(self)
 
         # Stories have required structures as well, so we verify they exist or we will error out
         # We also use this function to create most detailed structures from templates if newly created story
@@ -132,47 +152,322 @@ class Story(ft.View):
         # Store all our widgets above in a master list for easier rendering in the UI
         self.widgets: list = []    
 
+        # Our widgets dicts above, by the tag of the widgets they hold
+        self.tag_dicts: dict = {
+            'chapter': self.chapters,
+            'note': self.notes,
+            'canvas': self.canvases,
+            'character': self.characters,
+            'timeline': self.timelines,
+            'map': self.maps,
+        }
+
+        # Index of all our widgets, so we can find them by key, tag, folder, title, or pin without looping through them all
+        self.registry = Widget_Registry()
+
+        # Resolves paths relative to our story folder, which is how every path we save is stored
+        self.paths = Story_Paths(self.data['directory_path'])
+
+        # Where our widgets sit in our workspace (pin, order, visible, active tab), saved in one small file instead of every widget file
+        self.layout = Story_Layout(os.path.join(self.data['directory_path'], LAYOUT_FILE_NAME), self.paths)
+
         # Variables to store our mouse position for opening menus
         self.mouse_x: int = 0
         self.mouse_y: int = 0
 
+        # Parsed widget files, by category, read in parallel at the start of startup. None when not preloaded
+        self.preloaded_widget_files: dict = None
+
+        # Our folders and the widgets in them, so our rails never have to read the disk. Built when our widgets load
+        self.story_tree = Story_Tree(self.data['directory_path'])
+
+        # Cache of our parsed widget files from last launch, so unchanged files aren't reparsed
+        self.parse_cache = Parse_Cache(os.path.join(data_paths.parse_cache_path, f"{self.route.strip('/')}.pickle"))
+
         # State that we are not initialized yet, which will be changed at the end of startup method
         self.is_initialized = False
+
+        # Where we are in our lifecycle: unloaded -> loading -> ready, and ready <-> suspended while other views are shown
+        self.state: str = "unloaded"
+
+        # Widget files we've read but not built yet, as {'open': {...}, 'rest': {...}}. Files are only dropped once built,
+        # So a load that failed part way resumes where it stopped. None until our files are read
+        self.pending_widget_files: dict = None
+
+        # Our task that builds the rest of our widgets after our workspace first paints
+        self.fill_task = None
+
+        # If widgets were filled in while we were suspended, so our rail needs refreshing when we resume
+        self.needs_refresh: bool = False
+
+        # How long our last load took, in seconds
+        self.load_stats: dict = {'first_interactive': None, 'loaded': None}
+
         # Called outside of constructor to avoid circular import issues, or it would be called here
         #self.startup() # Called when opening our active story to load all its data and build its view
         
         
-    # Called from main when our program starts up. Needs a page reference, thats why not called here
-    def startup(self):
+    # Called whenever we route to our story. Needs a page reference, thats why not called in our constructor
+    async def startup(self, on_progress=None) -> bool:
+        ''' Loads our story the first time we're routed to, only building the widgets that were open last session before our view paints.
+        The rest fill in afterwards. After that, just resumes our already built view.
+        on_progress(message, value) is called as we go. Returns if our view is ready to show '''
+        from handlers.story_loader import split_open_widget_files, count_files
+
+        # Already loaded, so there's nothing to rebuild. Just come back to our existing view
+        if self.state in ("ready", "suspended"):
+            self.resume()
+            return True
+
+        # Already loading (a route change while we load), so don't start again
+        if self.state == "loading":
+            return False
+
+        self.state = "loading"
+
+        # Time our startup, so we can see how big stories load
+        start_time = time.perf_counter()
+
+        def report(message: str, value: float):
+            if on_progress is not None:
+                try:
+                    on_progress(message, value)
+                except Exception as e:
+                    print(f"Error showing load progress: {e}")
+
+        try:
+            if self.pending_widget_files is None:
 
-        # This also loads our canvas board images here, since they can be opened in either workspace
-        self.load_content()
+                # Finding and parsing our widget files is all disk work, so do it off our event loop
+                report("Reading story files...", 0.0)
+                await asyncio.to_thread(self.preload_widget_files)
 
-        # Loads our characters from file storage into our characters list
-        self.load_characters()
+                # Save what we parsed for next launch, without holding up our startup
+                Thread(target=self.parse_cache.save, daemon=True).start()
 
-        # Loads our timeline from file storage, which holds our timelines
-        self.load_timelines()
+                # Widgets that were open last session get built first, so our workspace can paint with them
+                self.layout.load()
+                open_files, rest_files = split_open_widget_files(self.preloaded_widget_files or {}, self.layout.data['widgets'], self.paths)
+                self.preloaded_widget_files = None
+                self.pending_widget_files = {'open': open_files, 'rest': rest_files}
 
-        # Load our world building objects from file storage
-        self.load_world_building()
+            total = count_files(self.pending_widget_files['open'])
 
-        # Loads our maps from file storage
-        self.load_maps()
+            def report_built(built: int):
+                report(f"Building open widgets ({built} of {total})...", 0.2 + 0.7 * built / max(total, 1))
 
-        # Everything we loaded above is a widget, but this just adds them all to self.widgets
-        self.load_widgets()
+            report_built(0)
+            await self.build_widget_files(self.pending_widget_files['open'], report_built, create_defaults=False)
 
-        # Builds our view (menubar, rails, workspace) and adds it to the page
-        self.build_view()
+            # Our world building is one small file we always have, so its built with our open widgets
+            if self.world_building is None:
+                self.load_world_building()
+
+            # Everything we loaded above is a widget, but this just adds them all to self.widgets
+            self.load_widgets()
+
+            # Builds our view (menubar, rails, workspace) and adds it to the page
+            report("Building workspace...", 0.9)
+            self.build_view()
+
+        except Exception as e:
+            print(f"Error loading story {self.title}: {e}")
+            self.state = "unloaded"
+            raise
 
         # After the story has been loaded, make sure this is no longer a new story
-        self.data['is_new_story'] = False 
-        self.save_dict()
+        if self.data.get('is_new_story', True):
+            self.data['is_new_story'] = False 
+            self.save_dict()
+
+        # Keep our story catalog in sync with our real story data
+        from models.app import app
+        app.story_catalog.update_story(self)
 
         # Declare the story loaded for loading purposes
         self.is_initialized = True
+        self.state = "ready"
+
+        self.load_stats['first_interactive'] = time.perf_counter() - start_time
+        print(f"{self.title} interactive in {self.load_stats['first_interactive']:.2f}s with {len(self.widgets)} open widgets")
+
+        # Build everything else once our route change has shown our view
+        self.start_fill(start_time)
+        return True
+
+    # Called by startup, and when resuming a story whose fill didn't finish
+    def start_fill(self, start_time: float = None):
+        ''' Starts building our remaining widgets in the background, if there are any and we aren't already '''
+
+        if self.pending_widget_files is None:
+            return
+
+        if self.fill_task is not None and not self.fill_task.done():
+            return
+
+        self.fill_task = asyncio.create_task(self.fill_widgets(start_time or time.perf_counter()))
+
+    # Called after our view first paints
+    async def fill_widgets(self, start_time: float):
+        ''' Builds the widgets that weren't open last session, a chunk at a time, refreshing our rail as each kind finishes '''
+        from handlers.story_loader import LOAD_CATEGORIES
+
+        try:
+            for category in LOAD_CATEGORIES:
+                await self.build_widget_files(self.pending_widget_files['rest'], categories=(category,), create_defaults=True)
+
+                # Add just what we built to our widgets, and show it on our rail.
+                # Checked after we built, since widgets created while we yielded are already in our widgets
+                known_widgets = {id(widget) for widget in self.widgets}
+                self.add_filled_widgets([widget for widget in self.collect_widgets() if id(widget) not in known_widgets])
+
+        except Exception as e:
+            print(f"Error filling in widgets for {self.title}: {e}")
+            return
+
+        self.pending_widget_files = None
+
+        self.load_stats['loaded'] = time.perf_counter() - start_time
+        built_widgets = sum(1 for widget in self.widgets if widget.is_built)
+        print(f"Loaded {self.title} in {self.load_stats['loaded']:.2f}s. Built {built_widgets} of {len(self.widgets)} widgets")
+
+    # Called as each kind of widget is filled in
+    def add_filled_widgets(self, widgets: list):
+        ''' Adds newly built widgets to our widgets, tree, and registry, and inserts them into our rail one at a time '''
+
+        # Skip anything already added (like widgets created while we were filling in)
+        widgets = [widget for widget in widgets if widget not in self.registry]
+        if not widgets:
+            return
+
+        for widget in widgets:
+            self.widgets.append(widget)
+            self.story_tree.add_widget(widget)
+            self.registry.add(widget)
+
+        # While suspended, our rail catches up once when we resume
+        if self.state != "ready":
+            self.needs_refresh = True
+            return
+
+        for widget in widgets:
+            self.update_rail('insert_widget', widget)
+
+        # Widgets we fill in were hidden last session. Only new defaults could need our workspace
+        if any(widget.visible for widget in widgets):
+            self.workspace.reload_workspace()
+
+        self.p.update()
+
+    # Called when widgets are filled in while we're suspended, once we resume
+    def refresh_filled_widgets(self):
+        ''' Shows our newly built widgets on our rail, and in our workspace if any are visible '''
+
+        self.needs_refresh = False
+        try:
+            self.active_rail.content.reload_rail()
+            self.workspace.reload_workspace()
+        except Exception as e:
+            print(f"Error refreshing filled in widgets: {e}")
+
+    # Called while loading our story
+    async def build_widget_files(self, widget_files: dict, on_built=None, categories: tuple = None, create_defaults: bool = True):
+        ''' Builds the widgets for our read widget files (category -> list of files), a chunk at a time so our event loop stays free.
+        Files are removed from widget_files as they're built '''
+        from handlers.story_loader import LOAD_CATEGORIES, WIDGET_CHUNK_SIZE
+
+        # Which of our load methods builds each category
+        loaders = {
+            "content": self.load_content,               # This also loads our canvas board images here, since they can be opened in either workspace
+            "characters": self.load_characters,         # Loads our characters from file storage into our characters list
+            "timelines": self.load_timelines,           # Loads our timeline from file storage, which holds our timelines
+            "maps": self.load_maps,                     # Loads our maps from file storage
+        }
+
+        built = 0
+        for category in categories or LOAD_CATEGORIES:
+            files = widget_files.get(category, [])
+
+            # Our loaders also create missing folders and default widgets, so they run even with no files when making defaults
+            if not files and not create_defaults:
+                continue
+
+            while True:
+                chunk = files[:WIDGET_CHUNK_SIZE]
+                is_last_chunk = len(chunk) == len(files)
+
+                # Our loaders read from our preload, so give them just this chunk
+                self.preloaded_widget_files = {loader_category: [] for loader_category in loaders}
+                self.preloaded_widget_files[category] = chunk
+
+                if category in ("timelines", "maps"):
+                    loaders[category](create_defaults=create_defaults and is_last_chunk)
+                else:
+                    loaders[category]()
+
+                self.preloaded_widget_files = None
+                del files[:len(chunk)]
+
+                built += len(chunk)
+                if on_built is not None:
+                    on_built(built)
+
+                # Let our page handle events and show our progress before the next chunk
+                await asyncio.sleep(0)
+
+                if not files:
+                    break
+
+    # Called when we route away from our story
+    def suspend(self):
+        ''' Sets our ready story aside while another view is shown. Everything stays built so we can come back instantly '''
+
+        if self.state != "ready":
+            return
+
+        # Close any open menus so they aren't still open when we come back
+        if self.p is not None:
+            self.p.overlay.clear()
+
+        self.state = "suspended"
+
+    # Called when we route back to our already loaded story
+    def resume(self):
+        ''' Re-attaches our existing view. Nothing is reloaded or rebuilt '''
+
+        self.state = "ready"
+        self.p.title = f"{self.title}"
+
+        # Show any widgets that were filled in while we were away
+        if self.needs_refresh:
+            self.refresh_filled_widgets()
+
+        # Pick back up if our widgets never finished filling in
+        self.start_fill()
+
+    # Called in our constructor
+    def set_directory_paths(self):
+        ''' Sets the paths to our story folder and the folders inside of it '''
+
+        directory_path = os.path.join(data_paths.stories_directory_path, self.route)
+
+        self.data['directory_path'] = directory_path
+        self.data['content_directory_path'] = os.path.join(directory_path, "content")
+        self.data['characters_directory_path'] = os.path.join(directory_path, "characters")
+        self.data['timelines_directory_path'] = os.path.join(directory_path, "timelines")
+        self.data['world_building_directory_path'] = os.path.join(directory_path, "world_building")
+        self.data['maps_directory_path'] = os.path.join(directory_path, "world_building", "maps")
+        self.data['planning_directory_path'] = os.path.join(directory_path, "planning")
+
+    # Called by the save scheduler when writing our file
+    def file_data(self) -> dict:
+        ''' Returns our data as its saved to our file. Our folder paths come from where our story is, so they're left out '''
+        return {key: value for key, value in self.data.items() if key not in STORY_PATH_KEYS}
 
+    # Called when saving our story, and by the story catalog
+    def get_file_path(self) -> str:
+        ''' Returns the path to our story's JSON file '''
+        return os.path.join(data_paths.stories_directory_path, self.route, f"{self.route}.json")
 
     # Called whenever there are changes in our data that need to be saved
     def save_dict(self):
@@ -181,18 +476,15 @@ class Story(ft.View):
         try:
             # Makes sure our directory path is always right. 
             self.data['directory_path'] = os.path.join(data_paths.stories_directory_path, self.route)
-            self.data['directory_path'] = os.path.join(data_paths.stories_directory_path, self.route)
                 
             # Our file path we store our data in
-            file_path = os.path.join(self.data['directory_path'], f"{self.route}.json")
-            file_path = os.path.join(self.data['directory_path'], f"{self.route}.json")
+            file_path = self.get_file_path()
 
             # Create the directory if it doesn't exist. Catches errors from users deleting folders
             os.makedirs(self.data['directory_path'], exist_ok=True)
             
-            # Save the data to the file (creates file if doesnt exist)
-            with open(file_path, "w", encoding='utf-8') as f:   
-                json.dump(self.data, f, indent=4)
+            # Let the save scheduler write our data (creates file if doesnt exist). Repeated saves are merged into one write
+            save_scheduler.schedule(file_path, self, backup=True)
         
         # Handle errors
         except Exception as e:
@@ -230,6 +522,11 @@ class Story(ft.View):
             print(f"Error changing canvas_data {key}:{value} for story {self.title}: {e}")
             
 
+    # Called around compound operations, like 'with story.batch():'
+    def batch(self) -> Story_Batch:
+        ''' Returns our batch. Saves, rail changes, and page updates inside it are applied once when it ends '''
+        return self.story_batch
+
     # Called when a new story is created and not loaded with any data
     def verify_story_structure(self, template: str=None):
         ''' Creates our story folder structure inside of our stories directory '''
@@ -263,51 +560,50 @@ class Story(ft.View):
             # Save our data
             self.save_dict()
 
+            # Batched so we save, refresh our rail, and update our page once for our whole template
             def _create_template_name():
 
-                self.create_folder(
-                    directory_path=self.data['content_directory_path'], 
-                    name="Notes"
-                )
-                    
-                # Using templates
-                if template is not None:
-                    pass
-
-                # Create our folder to store our maps data files and their canvases
-                maps_folders = [
-                    "maps",
-                    #"displays",
-                ]
-                for folder in maps_folders:
-                    folder_path = os.path.join(directory_path, "world_building", folder)
-                    os.makedirs(folder_path, exist_ok=True)
-
-                # Set our sub folders inside of notes
-                notes_folders = [
-                    "Themes",
-                    "Quotes",
-                    "Research",
-                ]
-
-                # Create the sub folders inside of notes
-                for folder in notes_folders:
-                    folder_path = os.path.join(directory_path, "content", "Notes")
-
-                    # Creates the sub folder using out path above
+                with self.batch():
+
                     self.create_folder(
-                        directory_path=folder_path, 
-                        name=folder
+                        directory_path=self.data['content_directory_path'], 
+                        name="Notes"
                     )
-                    
-                
-                # Create the path to the story's JSON file
-                directory_path = os.path.join(data_paths.stories_directory_path, self.title) 
-
-                # If multiplanetary, create the worlds folder
-                if self.data['settings']['multi_planetary']:
-                    worlds_folder_path = os.path.join(self.data['world_building_directory_path'], "maps")
-                    self.create_folder(worlds_folder_path, name="Worlds")
+                        
+                    # Using templates
+                    if template is not None:
+                        pass
+
+                    # Create our folder to store our maps data files and their canvases
+                    maps_folders = [
+                        "maps",
+                        #"displays",
+                    ]
+                    for folder in maps_folders:
+                        folder_path = os.path.join(directory_path, "world_building", folder)
+                        os.makedirs(folder_path, exist_ok=True)
+
+                    # Set our sub folders inside of notes
+                    notes_folders = [
+                        "Themes",
+                        "Quotes",
+                        "Research",
+                    ]
+
+                    # Create the sub folders inside of notes
+                    for folder in notes_folders:
+                        folder_path = os.path.join(directory_path, "content", "Notes")
+
+                        # Creates the sub folder using out path above
+                        self.create_folder(
+                            directory_path=folder_path, 
+                            name=folder
+                        )
+
+                    # If multiplanetary, create the worlds folder
+                    if self.data['settings']['multi_planetary']:
+                        worlds_folder_path = os.path.join(self.data['world_building_directory_path'], "maps")
+                        self.create_folder(worlds_folder_path, name="Worlds")
 
         # Handle errors
         except Exception as e:
@@ -330,10 +626,13 @@ class Story(ft.View):
             # Make the folder in our storage if it doesn't already exist
             os.makedirs(folder_path, exist_ok=True) 
             # Add this folder to our folders data so we can save stuff like colors
-            self.data['folders'].update({folder_path: {'name': name, 'color': "primary", 'is_expanded': True}})
+            self.data['folders'].update({self.paths.relative(folder_path): {'name': name, 'color': "primary", 'is_expanded': True}})
             self.save_dict()
 
-            self.active_rail.content.reload_rail()
+            # Add it to our tree so our rails can show it
+            self.story_tree.add_folder(folder_path)
+
+            self.update_rail('insert_folder', folder_path)
 
         # Handle errors
         except Exception as e:
@@ -344,15 +643,19 @@ class Story(ft.View):
         ''' Deletes a category from our story structure '''
 
         try:
+            # Drop any pending saves inside this folder so they don't recreate it
+            save_scheduler.cancel_directory(full_path)
+
             # Delete the folder from storage
             shutil.rmtree(full_path)
 
-            # Remove it from data
-            self.data['folders'].pop(full_path, None)
+            # Remove it (and any folders inside it) from data, and from our tree along with any widgets that were in it
+            self.rekey_folders(full_path, None)
+            self.story_tree.remove_folder(full_path)
 
             self.save_dict()
 
-            self.active_rail.content.reload_rail()
+            self.update_rail('remove_folder', full_path)
 
         # Handle errors
         except Exception as e:
@@ -365,8 +668,9 @@ class Story(ft.View):
 
         try:
             # Check if the folder exists in our data
-            if full_path in self.data['folders']:
-                self.data['folders'][full_path][key] = value
+            folder_key = self.paths.relative(full_path)
+            if folder_key in self.data['folders']:
+                self.data['folders'][folder_key][key] = value
                 self.save_dict()
                 #print("Changed folder data:", full_path, key, value)
             else:
@@ -379,24 +683,66 @@ class Story(ft.View):
     def rename_folder(self, old_path: str, new_path: str):
         ''' Renames the folder/category in our story structure '''
 
+        # Make sure any pending saves land in the old folder before we move it
+        save_scheduler.flush()
+
         # Does the actual renaming
         os.rename(old_path, new_path)
+        self.story_tree.rename_folder(old_path, new_path)
 
-        # Update the old key in our folders data
-        if old_path in self.data['folders']:
-            #print("Updating old path in story data")
-            self.data['folders'][new_path] = self.data['folders'].pop(old_path)
-            self.save_dict()
+        # Update the old keys in our folders data, for this folder and any inside of it
+        self.rekey_folders(old_path, new_path)
 
-        # Go through each widget and update its directory path if it was in the renamed folder
-        for widget in self.widgets:
-            if widget.directory_path.startswith(old_path):
-                # Update the directory path
-                relative_path = widget.directory_path[len(old_path):]
-                widget.directory_path = new_path + relative_path
-                widget.save_dict()  # Save the updated widget data
-                #print("Updated widget directory path to ", widget.title, " to ", widget.directory_path)
-        
+        # Go through each widget and update its directory path if it was in the renamed folder.
+        # Widget files don't store their paths, so none of them are rewritten
+        for widget in self.registry.in_directory(old_path, recursive=True):
+            relative_path = widget.directory_path[len(old_path):]
+            widget.set_directory(new_path + relative_path)
+
+    # Called when a folder is renamed or deleted
+    def rekey_folders(self, old_path: str, new_path: str = None):
+        ''' Moves the metadata of a folder and every folder inside of it to a new path, or drops it if new path is None '''
+
+        old_key = self.paths.relative(old_path)
+        new_key = self.paths.relative(new_path) if new_path is not None else None
+
+        folders = self.data['folders']
+        moved = [key for key in folders if key == old_key or key.startswith(old_key + "/")]
+        if not moved:
+            return
+
+        for key in moved:
+            folder_data = folders.pop(key)
+            if new_key is not None:
+                folders[new_key + key[len(old_key):]] = folder_data
+
+        self.save_dict()
+
+    # Called by our rails when building folder tiles
+    def get_folder_data(self, full_path: str) -> dict:
+        ''' Returns the metadata (color, is_expanded) we have saved for a folder, or an empty dict '''
+        return self.data['folders'].get(self.paths.relative(full_path), {})
+
+
+    # Called when a widget is hidden
+    def release_hidden_widgets(self):
+        ''' Drops the built controls of widgets that have been hidden too long, or of the oldest hidden ones
+        if too many hidden widgets are holding their controls. They rebuild when shown again '''
+        from models.app import app
+
+        limit = app.settings.data.get('hidden_widget_ui_limit', 10)
+        max_seconds = app.settings.data.get('hidden_widget_ui_seconds', 300)
+        now = time.monotonic()
+
+        # Hidden widgets still holding their controls, hidden longest first
+        hidden_widgets = sorted(
+            (widget for widget in self.widgets if widget.is_built and not widget.visible and widget.hidden_since is not None),
+            key=lambda widget: widget.hidden_since,
+        )
+
+        for i, widget in enumerate(hidden_widgets):
+            if len(hidden_widgets) - i > limit or now - widget.hidden_since > max_seconds:
+                widget.release_ui()
 
     # Called when deleting a widget from our story
     def delete_widget(self, widget) -> bool:
@@ -410,30 +756,19 @@ class Story(ft.View):
             tag = widget.data.get('tag', None)
             
             # Based on its tag, it deletes it from our appropriate dict
-            if tag == "chapter":
-                if widget.data['key'] in self.chapters.keys():
-                    del self.chapters[widget.data['key']]
-
-            elif tag == "note":
-                if widget.data['key'] in self.notes.keys():
-                    del self.notes[widget.data['key']]
-
-            elif tag == "character":
-                if widget.data['key'] in self.characters.keys():
-                    del self.characters[widget.data['key']]
-
-            elif tag == "timeline":
-                if widget.data['key'] in self.timelines.keys():
-                    del self.timelines[widget.data['key']]
-
-            elif tag == "map":
-                if widget.data['key'] in self.maps.keys():
-                    del self.maps[widget.data['key']]
+            tag_dict = self.tag_dicts.get(tag, None)
+            if tag_dict is not None:
+                tag_dict.pop(widget.data['key'], None)
 
             
             # Remove from our master widgets list so it won't be rendered anymore
             if widget in self.widgets:
                 self.widgets.remove(widget)
+
+            # Remove it from our rails tree
+            self.story_tree.remove_widget(widget)
+            self.registry.remove(widget)
+            self.layout.remove(widget.data['key'])
         
         # Call our internal functions above
         try:
@@ -447,7 +782,7 @@ class Story(ft.View):
                 if widget.visible:
                     self.workspace.reload_workspace()
 
-                self.active_rail.content.reload_rail()
+                self.update_rail('remove_widget', widget)
                 self.close_menu()
 
                 print(f"Successfully deleted widget: {widget.title}")
@@ -458,6 +793,33 @@ class Story(ft.View):
             return
 
 
+    # Called at the start of startup
+    def preload_widget_files(self):
+        ''' Finds all our widget files in one pass, and reads and parses them at the same time in a thread (or process) pool '''
+        from handlers.widget_loader import load_story_files
+        from models.app import app
+
+        try:
+            self.preloaded_widget_files = load_story_files(
+                self.data,
+                workers=app.settings.data.get('widget_loader_workers', 0),
+                use_processes=app.settings.data.get('widget_loader_use_processes', False),
+                cache=self.parse_cache,
+            )
+        except Exception as e:
+            print(f"Error preloading widget files for {self.title}: {e}")
+            self.preloaded_widget_files = None
+
+    # Called by our load methods
+    def get_widget_files(self, category: str) -> list:
+        ''' Returns (dirpath, filename, data, error) for each widget file in a category. Uses our preload if we have it, otherwise reads them now '''
+        from handlers.widget_loader import load_story_files
+
+        if self.preloaded_widget_files is not None and category in self.preloaded_widget_files:
+            return self.preloaded_widget_files.pop(category)
+
+        return load_story_files(self.data, categories=[category], cache=self.parse_cache).get(category, [])
+
     # Called on story startup to load all our content objects
     def load_content(self):
         ''' Loads our content from our content folder inside of our story folder '''
@@ -471,52 +833,43 @@ class Story(ft.View):
             os.makedirs(self.data['content_directory_path'])    
             return
 
-        # Loads all files inside the content directory and its sub folders
-        for dirpath, dirnames, filenames in os.walk(self.data['content_directory_path']):
-            for filename in filenames:
+        # Loads all files inside the content directory and its sub folders (_text.json files are skipped by our loader)
+        for dirpath, filename, content_data, error in self.get_widget_files("content"):
 
-                # PHASE OUT, CHAPS WILL BE LOADED FROM WIDGET DATA
-                if filename.endswith("_text.json"):
-                    continue
+            # Handle errors if the path is wrong or the file is broken
+            if error is not None:
+                print(f"Error loading content from {filename}: {error}")
+                continue
+
+            try:
+                # Extract the title from the data
+                content_title = content_data.get("title", filename.replace(".json", ""))
 
-                # All our objects are stored as JSON
-                if filename.endswith(".json"):
-                    file_path = os.path.join(dirpath, filename)   
+                # Check our tag to see what type of content it is, and load appropriately
+                if content_data.get("tag", "") == "chapter":
                     
-                    try:
+                    chapter = Chapter(content_title, self.p, dirpath, self, content_data)
+                    self.chapters[chapter.data['key']] = chapter
+                    #print("Chapter loaded")
 
-                        # Read the JSON file and set our data
-                        with open(file_path, "r", encoding='utf-8') as f:
-                            content_data = json.load(f)
-                        
-                        # Extract the title from the data
-                        content_key = content_data.get("key", None)
-                        content_title = content_data.get("title", filename.replace(".json", ""))
-
-                        # Check our tag to see what type of content it is, and load appropriately
-                        if content_data.get("tag", "") == "chapter":
-                            
-                            self.chapters[content_key] = Chapter(content_title, self.p, dirpath, self, content_data)
-                            #print("Chapter loaded")
-
-                        elif content_data.get("tag", "") == "image":
-                            print("image tag found, skipping for now")
-
-                        elif content_data.get("tag", "") == "canvas":
-                            self.canvases[content_key] = Canvas(content_title, self.p, dirpath, self, content_data)
-
-                        elif content_data.get("tag", "") == "note":
-                            self.notes[content_key] = Note(content_title, self.p, dirpath, self, content_data)
-                            
-                        # Error handling for invalid tags
-                        else:
-                            print("content tag not valid, skipping")
-                            return
-
-                            
-                    # Handle errors if the path is wrong
-                    except (json.JSONDecodeError, FileNotFoundError, KeyError) as e:
-                        print(f"Error loading content from {filename}: {e}")
+                elif content_data.get("tag", "") == "image":
+                    print("image tag found, skipping for now")
+
+                elif content_data.get("tag", "") == "canvas":
+                    canvas = Canvas(content_title, self.p, dirpath, self, content_data)
+                    self.canvases[canvas.data['key']] = canvas
+
+                elif content_data.get("tag", "") == "note":
+                    note = Note(content_title, self.p, dirpath, self, content_data)
+                    self.notes[note.data['key']] = note
+                    
+                # Error handling for invalid tags
+                else:
+                    print("content tag not valid, skipping")
+
+            # Handle errors in our data
+            except (AttributeError, KeyError) as e:
+                print(f"Error loading content from {filename}: {e}")
 
         # Load animations -- TBD in future if possible
 
@@ -532,30 +885,24 @@ class Story(ft.View):
             return
         
         # Iterate through all files in the characters folder
-        #for filename in os.listdir(data_paths.characters_path):
-        for dirpath, dirnames, filenames in os.walk(self.data['characters_directory_path']):
-            for filename in filenames:
-
-                # All our objects are stored as JSON
-                if filename.endswith(".json"):
-                    file_path = os.path.join(dirpath, filename)   
-                    #print("dirpath = ", dirpath)
+        for dirpath, filename, character_data, error in self.get_widget_files("characters"):
+
+            # Handle errors if the path is wrong or the file is broken
+            if error is not None:
+                print(f"Error loading character from {filename}: {error}")
+                continue
+
+            try:
+                # Extract the title from the data
+                character_title = character_data.get("title", filename.replace(".json", ""))    # TODO Add error handling
                     
-                    try:
-                        # Read the JSON file
-                        with open(file_path, "r", encoding='utf-8') as f:
-                            character_data = json.load(f)
-                        
-                        # Extract the title from the data
-                        character_key = character_data.get("key", None)
-                        character_title = character_data.get("title", filename.replace(".json", ""))    # TODO Add error handling
-                            
-                        # Create our character object using our loaded data
-                        self.characters[character_key] = Character(character_title, self.p, dirpath, self, character_data)
-                        #self.widgets.append(self.characters[character_title])  # Add to our master list of widgets in our story
-                    # Handle errors if the path is wrong
-                    except (json.JSONDecodeError, FileNotFoundError, KeyError) as e:
-                        print(f"Error loading character from {filename}: {e}")
+                # Create our character object using our loaded data
+                character = Character(character_title, self.p, dirpath, self, character_data)
+                self.characters[character.data['key']] = character
+
+            # Handle errors in our data
+            except (AttributeError, KeyError) as e:
+                print(f"Error loading character from {filename}: {e}")
 
     def get_character_names(self) -> list:
         '''Return a sorted list of character names.
@@ -597,8 +944,9 @@ class Story(ft.View):
         
 
     # Called on story startup to create our plotline object.
-    def load_timelines(self):
-        ''' Creates our timeline object, which in turn loads all our plotlines from storage '''
+    def load_timelines(self, create_defaults: bool = True):
+        ''' Creates our timeline object, which in turn loads all our plotlines from storage.
+        Only creates our default timeline if create_defaults, since our open widgets are loaded before the rest '''
         from models.widgets.timeline import Timeline
  
         # Check if the plotline folder directory exists. Creates it if it doesn't. 
@@ -609,38 +957,33 @@ class Story(ft.View):
             return
         
         # Iterate through all files in the timelines folder
-        for dirpath, dirnames, filenames in os.walk(self.data['timelines_directory_path']):
-            for filename in filenames:
+        for dirpath, filename, timeline_data, error in self.get_widget_files("timelines"):
 
-                # All our objects are stored as JSON
-                if filename.endswith(".json"):
-                    file_path = os.path.join(dirpath, filename)   
-                    #print("dirpath = ", dirpath)
+            # Handle errors if the path is wrong or the file is broken
+            if error is not None:
+                print(f"Error loading timeline from {filename}: {error}")
+                continue
+
+            try:
+                # Extract the title from the data
+                timeline_title = timeline_data.get("title", filename.replace(".json", ""))    
                     
-                    try:
-                        # Read the JSON file
-                        with open(file_path, "r", encoding='utf-8') as f:
-                            timeline_data = json.load(f)
-                        
-                        # Extract the title from the data
-                        timeline_key = timeline_data.get("key", None)
-                        timeline_title = timeline_data.get("title", filename.replace(".json", ""))    
-                            
-                        # Create our timeline object using our loaded data
-                        self.timelines[timeline_key] = Timeline(timeline_title, self.p, dirpath, self, timeline_data)
-                        
-                    # Handle errors if the path is wrong
-                    except (json.JSONDecodeError, FileNotFoundError, KeyError) as e:
-                        print(f"Error loading timeline from {filename}: {e}")
+                # Create our timeline object using our loaded data
+                timeline = Timeline(timeline_title, self.p, dirpath, self, timeline_data)
+                self.timelines[timeline.data['key']] = timeline
+
+            # Handle errors in our data
+            except (AttributeError, KeyError) as e:
+                print(f"Error loading timeline from {filename}: {e}")
             
         
         # Create our plotline object with no data if story is new, or loaded data if it exists already
-        if len(self.timelines) == 0:
-            key = self.data['timelines_directory_path'] + "\\" + "Timeline 1"
+        if len(self.timelines) == 0 and create_defaults:
+            key = widget_key(self.data['timelines_directory_path'], "Timeline 1")
             self.timelines[key] = Timeline(
                 title="Timeline 1", 
                 page=self.p, 
-                directory_path=dirpath, 
+                directory_path=self.data['timelines_directory_path'], 
                 story=self, 
                 data=None
             )
@@ -663,8 +1006,7 @@ class Story(ft.View):
         
         # Attempt to open and read the plotline.json file. Sets our stored data if successful
         try:
-            with open(world_building_json_path, 'r', encoding='utf-8') as file:
-                world_building_data = json.load(file)
+            world_building_data = self.parse_cache.read_json(world_building_json_path)
             
         except Exception as e:
             print("Error loading world building data: ", e)
@@ -680,8 +1022,8 @@ class Story(ft.View):
         )
 
     # Called in constructor
-    def load_maps(self):
-        ''' Loads our world maps from our dict into our live object '''
+    def load_maps(self, create_defaults: bool = True):
+        ''' Loads our world maps from our dict into our live object. Only creates our default map if create_defaults '''
         from models.widgets.world_building.map import Map
         
         try: 
@@ -694,42 +1036,36 @@ class Story(ft.View):
                 os.makedirs(map_dir_path)    
                 return
             
-            # Iterate through all files in our maps folder
-            for dirpath, dirnames, filenames in os.walk(map_dir_path):
-                for filename in filenames:
-
-                    # Go through our files, and don't include the display files
-                    if filename.endswith(".json") and not filename.endswith("_display.json"):
-                        file_path = os.path.join(dirpath, filename)   
-                        #print("dirpath = ", dirpath)
+            # Iterate through all files in our maps folder (_display.json files are skipped by our loader)
+            for dirpath, filename, map_data, error in self.get_widget_files("maps"):
+
+                # Handle errors if the path is wrong or the file is broken
+                if error is not None:
+                    print(f"Error loading map from {filename}: {error}")
+                    continue
+
+                try:
+                    # Extract the title from the data
+                    map_title = map_data.get("title", filename.replace(".json", ""))    
                         
-                        try:
-                            # Read the JSON file
-                            with open(file_path, "r", encoding='utf-8') as f:
-                                map_data = json.load(f)
-                            
-                            # Extract the title from the data
-                            map_key = map_data.get("key", None)
-                            map_title = map_data.get("title", filename.replace(".json", ""))    
-                                
-                            # Create our Map widgets.
-                            # TODO: Add in loading fathers? or get that from data inside of map constructor??
-                            self.maps[map_key] = Map(
-                                title=map_title, 
-                                page=self.p, 
-                                directory_path=dirpath, 
-                                story=self, 
-                                data=map_data
-                            )
-                            
-                            
-                        # Handle errors if the path is wrong
-                        except (json.JSONDecodeError, FileNotFoundError, KeyError) as e:
-                            print(f"Error loading map from {filename}: {e}")
+                    # Create our Map widgets.
+                    # TODO: Add in loading fathers? or get that from data inside of map constructor??
+                    map = Map(
+                        title=map_title, 
+                        page=self.p, 
+                        directory_path=dirpath, 
+                        story=self, 
+                        data=map_data
+                    )
+                    self.maps[map.data['key']] = map
+
+                # Handle errors in our data
+                except (AttributeError, KeyError) as e:
+                    print(f"Error loading map from {filename}: {e}")
                 
             
             # If we have no maps, create a default one to get started
-            if len(self.maps) == 0:
+            if len(self.maps) == 0 and create_defaults:
                 #print("No world maps found, creating default world map")
                 self.create_map(title="World Map", father=None, category="world")
 
@@ -739,46 +1075,36 @@ class Story(ft.View):
         except Exception as e:
             print(f"Error loading maps: {e}")
 
+    # Called when loading our widgets, and to find widgets we just built
+    def collect_widgets(self) -> list:
+        ''' Returns all our live widgets (characters, chapters, notes, etc.) in one list, each once '''
+
+        widgets = []
+        seen = set()
+
+        # Characters, chapters, canvases, timelines, world building, maps, then notes
+        groups = [self.characters.values(), self.chapters.values(), self.canvases.values(), self.timelines.values()]
+        groups.append([self.world_building] if self.world_building is not None else [])
+        groups.extend([self.maps.values(), self.notes.values()])
+
+        for group in groups:
+            for widget in group:
+                if id(widget) not in seen:
+                    seen.add(id(widget))
+                    widgets.append(widget)
+
+        return widgets
+
     # Called in startup after we have loaded all our live objects
     def load_widgets(self):
         ''' Loads all our widgets (characters, chapters, notes, etc.) into our master list of widgets '''
 
-        # Clear our widgets list first to avoid duplicates
-        self.widgets.clear() 
-
-        # Add all our characters to the widgets list
-        for character in self.characters.values():
-            if character not in self.widgets:
-                self.widgets.append(character)
-
-        # Add all our chapters to the widgets list
-        for chapter in self.chapters.values():
-            if chapter not in self.widgets:
-                self.widgets.append(chapter)
-
-        for canvas in self.canvases.values():
-            if canvas not in self.widgets:
-                self.widgets.append(canvas)
-
-        # Add our plotline to the widgets list
-        for timeline in self.timelines.values():
-            if timeline not in self.widgets:
-                self.widgets.append(timeline)
-
-        # Add our world building to the widgets list
-        if self.world_building is not None:
-            if self.world_building not in self.widgets:
-                self.widgets.append(self.world_building)
-
-        # Add all our maps to the widgets list
-        for map in self.maps.values():
-            if map not in self.widgets:
-                self.widgets.append(map)
-
-        # Add all our notes to the widgets list
-        for note in self.notes.values():
-            if note not in self.widgets:
-                self.widgets.append(note)
+        # Replace our widgets list, so there are never duplicates
+        self.widgets[:] = self.collect_widgets()
+
+        # Build our folder tree for our rails from the widgets we just loaded
+        self.story_tree.build(self.widgets)
+        self.registry.rebuild(self.widgets)
         
 
 
@@ -792,14 +1118,16 @@ class Story(ft.View):
             directory_path = self.data['content_directory_path']
 
         # Set the key
-        key = directory_path + "\\" + title
+        key = widget_key(directory_path, title)
 
         # Save the new chapter and add it to the widget list
         self.chapters[key] = Chapter(title, self.p, directory_path, self)
         self.widgets.append(self.chapters[key])
+        self.story_tree.add_widget(self.chapters[key])
+        self.registry.add(self.chapters[key])
 
         # Apply the UI changes
-        self.active_rail.content.reload_rail()
+        self.update_rail('insert_widget', self.chapters[key])
         self.workspace.reload_workspace()
 
     # Called to create a note object
@@ -812,14 +1140,16 @@ class Story(ft.View):
             directory_path = self.data['content_directory_path']
            
         # Set the key
-        key = directory_path + "\\" + title
+        key = widget_key(directory_path, title)
 
         # Save our new note and add it to the widget list
         self.notes[key] = Note(title, self.p, directory_path, self)
         self.widgets.append(self.notes[key]) 
+        self.story_tree.add_widget(self.notes[key])
+        self.registry.add(self.notes[key])
 
         # Apply the UI changes
-        self.active_rail.content.reload_rail()
+        self.update_rail('insert_widget', self.notes[key])
         self.workspace.reload_workspace()
 
     # Called to create a canvas object
@@ -832,18 +1162,21 @@ class Story(ft.View):
             directory_path = self.data['content_directory_path']
            
         # Set the key
-        key = directory_path + "\\" + title
+        key = widget_key(directory_path, title)
 
         # Format our data if we have any
+        new_data = None
         if data is not None:
             new_data = {'canvas_meta': data}
 
         # Save our new note and add it to the widget list
         self.canvases[key] = Canvas(title, self.p, directory_path, self, new_data)
         self.widgets.append(self.canvases[key]) 
+        self.story_tree.add_widget(self.canvases[key])
+        self.registry.add(self.canvases[key])
 
         # Apply the UI changes
-        self.active_rail.content_rail.reload_rail()
+        self.update_rail('insert_widget', self.canvases[key])
         self.workspace.reload_workspace()
 
 
@@ -857,14 +1190,16 @@ class Story(ft.View):
             directory_path = self.data['characters_directory_path'] # There SHOULD always be a path passed in, but this will catch errors
 
         # Set the key
-        key = directory_path + "\\" + title
+        key = widget_key(directory_path, title)
         
         # Save our new character and add it to the widget list
         self.characters[key] = Character(title, self.p, directory_path, self)
         self.widgets.append(self.characters[key])  
+        self.story_tree.add_widget(self.characters[key])
+        self.registry.add(self.characters[key])
 
         # Apply the UI changes
-        self.active_rail.content.reload_rail()
+        self.update_rail('insert_widget', self.characters[key])
         self.workspace.reload_workspace()
 
     # Called to create a timeline object
@@ -875,14 +1210,16 @@ class Story(ft.View):
         dirpath = self.data['timelines_directory_path']
 
         # Set the key
-        key = dirpath + "\\" + title
+        key = widget_key(dirpath, title)
 
         # Save our new timeline and add it to the widget list
         self.timelines[key] = Timeline(title, self.p, dirpath, self)
         self.widgets.append(self.timelines[key])  
+        self.story_tree.add_widget(self.timelines[key])
+        self.registry.add(self.timelines[key])
 
         # Apply the UI changes
-        self.active_rail.content.reload_rail()
+        self.update_rail('insert_widget', self.timelines[key])
         self.workspace.reload_workspace()
 
     # Called to create a map object
@@ -901,7 +1238,7 @@ class Story(ft.View):
                 directory_path = os.path.join(self.data['world_building_directory_path'], "maps")
 
         # Set the key
-        key = directory_path + "\\" + title
+        key = widget_key(directory_path, title)
 
         # Create our new map object in our maps dict
         self.maps[key] = Map(
@@ -916,12 +1253,38 @@ class Story(ft.View):
 
         # Add to our master list of widgets in our story
         self.widgets.append(self.maps[key]) 
+        self.story_tree.add_widget(self.maps[key])
+        self.registry.add(self.maps[key])
 
         # Reload our UI's
-        self.active_rail.content.reload_rail()
+        self.update_rail('insert_widget', self.maps[key])
         self.workspace.reload_workspace()
 
 
+    # Called after changes to our widgets or folders, instead of rebuilding our whole rail
+    def update_rail(self, action: str, *args):
+        ''' Applies one change (like 'insert_widget') to just the affected nodes of our active rail. Reloads the whole rail if it can't '''
+
+        # Inside a batch, we collect our changes and apply them once when it ends
+        if self.story_batch.active:
+            self.story_batch.add_rail_change(action, *args)
+            return
+
+        try:
+            rail = self.active_rail.content
+        except Exception:
+            return
+
+        try:
+            handler = getattr(rail, action, None)
+            if handler is not None and handler(*args):
+                return
+
+        except Exception as e:
+            print(f"Error applying {action} to our rail, reloading it instead: {e}")
+
+        rail.reload_rail()
+
     # Called clicking outside the menu to close it
     def close_menu(self, e=None):
         ''' Closes our right click menu when clicking outside of it '''
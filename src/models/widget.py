@@ -8,13 +8,20 @@ Only Widgets create mini widgets
 import flet as ft
 from models.views.story import Story
 import os
-import json
+import time
 from handlers.verify_data import verify_data
+from handlers.migrations import migrate_data, SCHEMA_VERSION
+from handlers.story_paths import widget_key
+from handlers.story_layout import LAYOUT_KEYS
+from handlers.save_scheduler import save_scheduler
 from styles.snack_bar import Snack_Bar
 from styles.colors import dark_gradient
 from styles.colors import colors
 
 
+# Keys in our data that come from where our file is, so they're never saved to it
+DERIVED_KEYS = ('key', 'directory_path')
+
 
 class Widget(ft.Container):
     
@@ -45,13 +52,20 @@ class Widget(ft.Container):
         self.directory_path: str = directory_path        
         self.story: Story = story                
 
+        # Brings data from older versions of our app up to date. Current files are just one version check
+        migrated = migrate_data(self.data)
+
+        # Our story's layout file has the final say on where we sit in the workspace. Our file leaves those keys out
+        # once our layout file has them, so they are applied before verifying, or verifying would think they were missing
+        if isinstance(self.data, dict):
+            self.data['key'] = widget_key(self.directory_path, self.title)
+            self.story.layout.apply(self)
+
         # Verifies this object has the required data fields, and creates them if not
         verify_data(
             self,   # Pass in our own data so the function can see the actual data we loaded
             {
-                'key': f"{self.directory_path}\\{self.title}",  # Unique key for this widget based on directory path + title
                 'title': self.title,                            # Title of our widget  
-                'directory_path': self.directory_path,          # Directory path to the file this widget's data is stored in
                 'tag': str,                                     # Tag to identify what type of widget this is
                 'pin_location': "main" if data is None else data.get('pin_location', "main"),       # Pin location this widget is rendered in the workspace (main, left, right, top, or bottom)
                 'index': int,                                   # Index of this widget in its pin location
@@ -60,9 +74,21 @@ class Widget(ft.Container):
                 'color': "primary",                             # Color of the icon on the rail and next to title on rail
                 #'mini_widgets_location': "right",    OUTDATED           # Side of the widget the mini widgets show up on (left or right)
                 'custom_fields': dict,                          # Dictionary for any custom fields the widget wants to store
+                'schema_version': SCHEMA_VERSION,               # How many of our data migrations this widget has had
             },
         )
 
+        # Our folder is wherever our file is, so our directory path and key are set here and never saved to our file
+        self.data['directory_path'] = self.directory_path                   # Directory path to the file this widget's data is stored in
+        self.data['key'] = widget_key(self.directory_path, self.title)     # Unique key for this widget based on directory path + title
+
+        # Save our migrated data, in case verifying didn't need to
+        if migrated:
+            self.save_dict()
+
+        # If our layout file was lost, our file won't have our layout either, so fall back to the defaults
+        for key, default in (('pin_location', "main"), ('index', 0), ('visible', True), ('is_active_tab', True)):
+            self.data.setdefault(key, default)
 
         # Apply our visibility
         self.visible = self.data['visible'] 
@@ -70,6 +96,12 @@ class Widget(ft.Container):
         # Tracks variable to see if we should outline the widget where it is displayed
         self.focused = False
 
+        # If our UI controls are built yet. Hidden widgets wait until they are first shown to build them
+        self.is_built: bool = False
+
+        # When we were last hidden, so our story can drop the controls of widgets that stay hidden
+        self.hidden_since: float = None if self.visible else time.monotonic()
+
         # UI ELEMENTS - Tab
         self.tabs: ft.Tabs = None 
         self.tab_bar: ft.TabBar = None 
@@ -105,25 +137,60 @@ class Widget(ft.Container):
 
     # Called whenever there are changes in our data
     def save_dict(self):
-        ''' Saves our current data to the json file '''
+        ''' Marks our data to be saved to the json file. Repeated saves are merged into one write by the save scheduler '''
 
         try:
 
             # Set our file path
             file_path = os.path.join(self.directory_path, f"{self.title}.json")
 
-            # Create the directory if it doesn't exist. Catches errors from users deleting folders
-            os.makedirs(self.directory_path, exist_ok=True)
-            
-            # Save the data to the file (creates file if doesnt exist)
-            with open(file_path, "w", encoding='utf-8') as f:   
-                json.dump(self.data, f, indent=4)
+            # New files get written right away so they show up in our directories. Inside a batch, they're written when it ends
+            if not os.path.exists(file_path) and not self.story.story_batch.active:
+                save_scheduler.schedule(file_path, self)
+                save_scheduler.flush(file_path)
+
+            # Otherwise let the save scheduler batch our changes
+            else:
+                save_scheduler.schedule(file_path, self)
+
+            # Keep our story's registry up to date, since our key, title, folder, or pin may have changed
+            self.story.registry.update(self)
         
         # Handle errors
         except Exception as e:
             print(f"Error saving widget to {file_path}: {e}") 
             print("Data that failed to save: ", self.data)
 
+    # Called by the save scheduler when writing our file
+    def file_data(self) -> dict:
+        ''' Returns our data as its saved to our file. Our directory path and key come from where our file is, so they're left out.
+        Once our story's layout file has our layout, that is left out too, so there is only ever one copy of it '''
+
+        # New widgets save while verifying, before they have a key
+        left_out = DERIVED_KEYS
+        if 'key' in self.data and self.story.layout.has(self.data['key']):
+            left_out = DERIVED_KEYS + LAYOUT_KEYS
+
+        return {key: value for key, value in self.data.items() if key not in left_out}
+
+    # Called when our pin location, order, visibility, or active tab changes
+    def save_layout(self):
+        ''' Saves where we sit in the workspace to our story's layout file, without rewriting our own json file '''
+
+        try:
+            had_layout = self.story.layout.has(self.data['key'])
+
+            self.story.layout.update(self)
+            self.story.registry.update(self)
+
+            # Our first layout entry makes the copy of our layout in our own file stale, so drop it from our file
+            if not had_layout:
+                self.save_dict()
+
+        # Handle errors
+        except Exception as e:
+            print(f"Error saving layout of widget {self.title}: {e}")
+
     # Called for little data changes
     def change_data(self, **kwargs):
         ''' Changes a key/value pair in our data and saves the json file '''
@@ -160,6 +227,9 @@ class Widget(ft.Container):
         ''' Deletes our widget's json file from the directory '''
 
         try:
+            # Make sure a pending save doesn't write our file back after we delete it
+            save_scheduler.cancel(old_file_path)
+
             # Delete the file if it exists
             if os.path.exists(old_file_path):
                 os.remove(old_file_path)
@@ -206,17 +276,37 @@ class Widget(ft.Container):
         # If we passed the check earlier, delete the old file
         self.delete_file(old_file_path=os.path.join(self.directory_path, f"{self.title}.json"))
 
-        # Set our data to the new path where we need to
-        self.data['directory_path'] = new_directory
-        self.directory_path = self.data['directory_path']
-        self.data['key'] = f"{new_directory}\\{self.title}"
+        # Set our new path, and re-key us wherever we're stored
+        self.set_directory(new_directory)
+
+        # Move us in our story's folder tree
+        self.story.story_tree.move_widget(self)
 
         # Save our updated data
         self.save_dict()
 
-        # Reload the rail to apply changes
-        self.story.active_rail.content.reload_rail()        
+        # Move just our item on the rail
+        self.story.update_rail('move_widget', self)
+
+
+    # Called when we move, or when a folder we're in is renamed
+    def set_directory(self, directory_path: str):
+        ''' Updates our directory path and key, and re-keys us in our story's dict for our tag, layout, and registry.
+        Doesn't write our file, since our file never stores them '''
+
+        old_key = self.data['key']
+
+        self.directory_path = directory_path
+        self.data['directory_path'] = directory_path
+        self.data['key'] = widget_key(directory_path, self.title)
+
+        tag_dict = self.story.tag_dicts.get(self.data['tag'], None)
+        if tag_dict is not None:
+            tag_dict.pop(old_key, None)
+            tag_dict[self.data['key']] = self
 
+        self.story.layout.rename(old_key, self.data['key'])
+        self.story.registry.update(self)
 
     # Called when renaming a widget
     def rename(self, title: str):
@@ -227,42 +317,31 @@ class Widget(ft.Container):
 
         # Save our old file path for renaming later
         old_file_path = os.path.join(self.directory_path, f"{self.title}.json")   
-        old_key = f"{self.directory_path}\\{self.title}"  
+        old_key = widget_key(self.directory_path, self.title)
                                                  
         # Update our live title, and associated data
         self.title = title.capitalize()                              
         self.data['title'] = self.title     
-        self.data['key'] = f"{self.directory_path}\\{self.title}"  
+        self.data['key'] = widget_key(self.directory_path, self.title)
 
 
-        # Rename our json file so it doesnt just create a new one
+        # Rename our json file so it doesnt just create a new one. Make sure any pending save lands first
+        save_scheduler.flush(old_file_path)
         os.rename(old_file_path, self.data['key'] + ".json")  
 
-        # Save our data to this new file
+        # Save our data to this new file right away, since our rail reads it
         self.save_dict()                                
+        save_scheduler.flush(os.path.join(self.directory_path, f"{self.title}.json"))
 
         # Remove from our live dict wherever we are stored
         tag = self.data['tag']
 
         # Delete our old live saved object, and add the new one
-        if tag == "chapter":
-            self.story.chapters.pop(old_key, None)
-            self.story.chapters[self.data['key']] = self
-        elif tag == "image":
-            self.story.images.pop(old_key, None)
-            self.story.images[self.data['key']] = self
-        elif tag == "note":
-            self.story.notes.pop(old_key, None)
-            self.story.notes[self.data['key']] = self
-        elif tag == "character":
-            self.story.characters.pop(old_key, None)
-            self.story.characters[self.data['key']] = self
-        elif tag == "map":
-            self.story.maps.pop(old_key, None)
-            self.story.maps[self.data['key']] = self  
-        elif tag == "timeline":
-            self.story.timelines.pop(old_key, None)
-            self.story.timelines[self.data['key']] = self
+        tag_dict = self.story.tag_dicts.get(tag, None)
+        if tag_dict is not None:
+            tag_dict.pop(old_key, None)
+            tag_dict[self.data['key']] = self
+        self.story.layout.rename(old_key, self.data['key'])
 
 
         # Re-applies visibility to what it was before rename
@@ -271,20 +350,20 @@ class Widget(ft.Container):
         # Reload our widget ui and rail to reflect changes 
         self.reload_widget()           
         self.set_active_tab()              
-        self.story.active_rail.content.reload_rail()   
+        self.story.update_rail('rename_widget', self)
 
     # Called on many actions to make this the active tab if in the main pin
     def set_active_tab(self):
         ''' Sets this widgets tab as the active tab in the main pin'''
 
         self.data['is_active_tab'] = True
-        self.save_dict()
+        self.save_layout()
 
         # Deactivate all other widgets in main pin
-        for widget in self.story.widgets:
-            if widget != self and widget.data['pin_location'] == "main" and widget.visible:
+        for widget in self.story.registry.in_pin("main"):
+            if widget != self and widget.visible:
                 widget.data['is_active_tab'] = False
-                widget.save_dict()
+                widget.save_layout()
 
         # Reload the workspace to reflect changes
         self.story.workspace.reload_workspace()
@@ -330,26 +409,62 @@ class Widget(ft.Container):
         self.p.update()
 
 
+    # Called at the start of every reload_widget
+    def should_build(self) -> bool:
+        ''' Returns if we should build our UI now. Hidden widgets skip it, and build the first time they are shown '''
+
+        if not self.visible:
+            return False
+
+        self.is_built = True
+        return True
+
+    # Called by our story when we've been hidden a while and other widgets need the memory more
+    def release_ui(self):
+        ''' Drops our built controls so they can be freed. Our data stays loaded, and we rebuild next time we're shown '''
+
+        if self.visible or not self.is_built:
+            return
+
+        self.is_built = False
+
+        self.content = None
+        self.tabs = None
+        self.tab_bar = None
+        self.tab = None
+        self.tab_bar_view = None
+        self.body_container.content = None
+        self.master_stack.controls = []
+        self.mini_widgets_row.controls = []
+
     # Called when app clicks the hide icon in the tab
     def toggle_visibility(self, e=None, value: bool=None):
-        ''' Hides the widget from our workspace and updates the json to reflect the change '''
+        ''' Hides the widget from our workspace and updates our story layout to reflect the change '''
 
         # If we want to specify we're visible or not, we can pass it in
         if value is not None:
             self.data['visible'] = value
             self.visible = value
-            self.tab.visible = value
         
         else:
             # Change our visibility data, save it, then apply it
             self.data['visible'] = not self.data['visible']
             self.visible = self.data['visible']
-            self.tab.visible = self.data['visible']
 
-        
+        # Build our UI the first time we're shown (or if it was dropped while we were hidden)
+        if self.visible and not self.is_built:
+            self.reload_widget()
+
+        if self.tab is not None:
+            self.tab.visible = self.visible
+
+        # Track when we were hidden, so our story can drop our controls if we stay that way
+        self.hidden_since = None if self.visible else time.monotonic()
 
         # Save our changes and reload the UI
-        self.save_dict()
+        self.save_layout()
+        if not self.visible:
+            self.story.release_hidden_widgets()
         #self.reload_widget()
         self.p.update()
 
@@ -374,7 +489,7 @@ class Widget(ft.Container):
             self.change_data({'color': color})
             
             # Change our icon to match, apply the update
-            self.story.active_rail.content.reload_rail()
+            self.story.update_rail('recolor_widget', self)
             self.reload_widget()
             
 
@@ -486,6 +601,10 @@ class Widget(ft.Container):
     def reload_widget(self):
         ''' Children build their own content of the widget in their own reload_widget functions '''
 
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
+
         # TODO Have option in the mini_widget column to show on mini widgets on right vs left side of widget
 
         # Rebuild out tab to reflect any changes
@@ -573,4 +692,7 @@ class Widget(ft.Container):
         self.content = self.tabs
 
         #self.content = row
-        self.p.update()
\ No newline at end of file
+
+        # Our story updates the page once when its done loading (or when its batch ends), so we don't need to for every widget it builds
+        if self.story.is_initialized and not self.story.story_batch.active:
+            self.p.update()
\ No newline at end of file
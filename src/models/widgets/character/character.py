@@ -59,9 +59,7 @@ class Character(Widget):
                     'Build': str,    
                     'Distinguishing Features': str,  
                 },
-                'connections':{
-                    #TODO list of other characters and relationship types
-                },
+                'connections': list,        # Names of other characters this character is connected to. TODO relationship types
                 'family':  { #TODO "connections" dropdown+tree/detective view?
                     'Love Interest': str,    
                     'Father': str,   
@@ -203,6 +201,10 @@ class Character(Widget):
     # Called after any changes happen to the data that need to be reflected in the UI
     def reload_widget(self): #this is the edit view currently
         ''' Reloads/Rebuilds our widget based on current data '''
+
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
         
         # Rebuild out tab to reflect any changes
         self.reload_tab()
@@ -232,9 +234,6 @@ class Character(Widget):
         # Check if we're in edit mode or not. If yes, build the edit view like this
         if self.data.get('edit_mode', False):
 
-            # Ensure connections are normalized to a list for UI building
-            self._ensure_connections_list()
-
             #all of this needs to be the edit view
             body = ft.Container(
                 expand=True,                # Takes up maximum space allowed in its parent container
@@ -435,33 +434,11 @@ class Character(Widget):
         self.data['physical_description']['Race'] = value
         self.save_dict()
 
-    def _ensure_connections_list(self):
-        '''Normalize connections into a list stored at self.data['connections'].'''
-        try:
-            conn = self.data.get('connections')
-            if isinstance(conn, list):
-                return
-            if isinstance(conn, dict):
-                # Try extract reasonable string entries from dict
-                extracted = []
-                for k, v in conn.items():
-                    if isinstance(v, str) and v:
-                        extracted.append(v)
-                    elif isinstance(k, str) and k:
-                        extracted.append(k)
-                self.data['connections'] = extracted
-                return
-            # Any other type, replace with empty list
-            self.data['connections'] = []
-        except Exception:
-            self.data['connections'] = []
-
     def _on_add_connection(self, value: str):
         '''Add a selected character name to connections (if not present) and persist.'''
         try:
             if not value:
                 return
-            self._ensure_connections_list()
             if value in self.data['connections']:
                 return
             self.data['connections'].append(value)
@@ -474,7 +451,6 @@ class Character(Widget):
     def _on_remove_connection(self, name: str):
         '''Remove an existing connection and persist.'''
         try:
-            self._ensure_connections_list()
             if name in self.data['connections']:
                 self.data['connections'].remove(name)
                 self.save_dict()
@@ -41,6 +41,10 @@ class Character(Widget):
     def reload_widget(self):
         ''' Reloads/Rebuilds our widget based on current data '''
 
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
+
         # TODO: Show filters at top for our characters to show
         # PURPOSE: To show a family tree view of our characters and their connections to one another
 
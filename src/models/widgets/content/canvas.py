@@ -7,7 +7,7 @@ Maps are widgets that have their own drawing canvas, and info display. they can
 # ADD DUPLICATE OPTION AS WELL
 # Option for transparent background/no brackground
 # Option to upload image as background
-# Option to export canvas as image file (png, jpg, etc). Option to change how image fits on canvas (stretch, fit, fill, tile, center, etc)
+# Option to change how image fits on canvas (stretch, fit, fill, tile, center, etc)
 # Add ft.DecorationImage options to the canvas container for background images??
 # Add color_filter for both decoration image and container ?
 # Fill tool??
@@ -20,11 +20,20 @@ from models.widget import Widget
 from models.views.story import Story
 from handlers.verify_data import verify_data
 from styles.snack_bar import Snack_Bar
+from styles.menu_option_style import Menu_Option_Style
 from models.state import State
+from handlers.stroke_file import Stroke_File
+from handlers.simplify_stroke import simplify_points
+from handlers.spatial_index import Spatial_Index, path_bounds, path_distance
+from handlers.tile_cache import Tile_Cache
+from constants import data_paths
+import hashlib
+import shutil
 import flet.canvas as cv
+from bisect import bisect_left
 from threading import Thread
 import math
-#from PIL import Image, ImageDraw
+import time
 
 
 
@@ -62,11 +71,12 @@ class Canvas(Widget):
                     "bgimage_path": str,        # Path to background image for canvas
                 },     
 
-                # Store our drawing data to load/save
+                # Store our drawing data to load/save. Our actual paths and points live in our strokes file (see Stroke_File)
                 "canvas": {
-                    'paths': list,      # All our shapes, lines, dashed lines, curves, etc.
+                    'strokes_file': f"{self.title}.strokes",    # Name of our sidecar strokes file, stored next to our json file
+                    'path_count': int,      # Number of paths in our strokes file
+                    'point_count': int,     # Number of points in our strokes file
                     'shadow_paths': list,   # All paths but with shadows
-                    'points': list,     # All our points
                     'bgcolor': {        # Background color info
                         'color': None,
                         'blend_mode': "src_over",
@@ -75,13 +85,100 @@ class Canvas(Widget):
             },
         )
 
+        # Our loaded drawing data. Stored in our strokes file, not our json data
+        self.paths: list = []               # All our shapes, lines, dashed lines, curves, etc.
+        self.points: list = []              # All our points
+        self.path_shapes: list = []         # The canvas shape for each of our paths (same order as self.paths)
+        self.point_shapes: list = []        # The canvas shape for each of our points
+        self.bgcolor_shape: cv.Color = None # Our background color shape if we have one
+        self.canvas_loaded: bool = False    # If our drawing is loaded. Hidden canvases wait until they are first shown
+
+        # Index of our paths bounding boxes, keyed by their path id. Lets us find paths by point or area without scanning them all
+        self.spatial_index: Spatial_Index = Spatial_Index()
+
+        # Stable id of each of our paths (same order as self.paths, so always sorted). Ids never shift when paths are erased,
+        # So erasing only removes the erased paths from our spatial index instead of rebuilding it
+        self.path_ids: list = []
+        self._next_path_id: int = 0
+
+        # Where our viewport starts in canvas coordinates, tracked from panning our interactive viewer
+        self.viewport_offset: tuple = (0.0, 0.0)
+        self._visible_path_ids: list = None         # Ids of the paths currently on our canvas. None means all of them
+
+        # Object erasing (erasing whole strokes instead of painting over them)
+        self._is_erasing_objects: bool = False
+        self._erased_paths: bool = False
+
+        # Stroke selection. Selected paths get an outline drawn on top of our canvas, and can be deleted from our header
+        self.selected_path_ids: set = set()
+        self.selection_shapes: list = []            # Our outline shapes for our selected paths
+        self._is_selecting: bool = False
+        self.delete_selection_button: ft.IconButton = None
+
+        # Tiled raster cache for big drawings. Once we have enough paths, our committed strokes are shown as cached image tiles,
+        # And only strokes committed since our tiles were last rendered (plus our live stroke) stay on our canvas as shapes
+        self.tile_cache: Tile_Cache = None
+        self.use_tiles: bool = False
+        self.tile_layer: ft.Stack = None            # Our tile images, built with the rest of our UI
+        self.canvas_stack: ft.Stack = None          # Our tiles layered under our canvas, once tiles are on
+        self._untiled_shapes: list = []             # Shapes committed since our tiles were last rendered
+        self._tile_rendering: bool = False          # If our render thread is working. Only set and cleared on the UI thread
+        self._tiles_need_refresh: bool = False      # If our drawing changed while we were rendering tiles
+        self.stroke_file: Stroke_File = Stroke_File(self.get_strokes_path())
+
+        # Move any drawing stored in our json data (older canvases) into our strokes file
+        self._convert_json_strokes()
+
         # State tracking for canvas drawing info
         self.state: State = State()         # Used for our coordinates and how to apply things
         self.min_segment_dist: float = 3.0
 
+        # Our current zoom level in our interactive viewer, so stroke simplification matches what we can see
+        self.zoom: float = 1.0
+        self._zoom_at_interaction_start: float = 1.0
+
+        # Totals of how much our stroke simplification has saved, for checking its working
+        self.simplify_stats: dict = {'strokes': 0, 'elements_before': 0, 'elements_after': 0}
+
+        # Incremental drawing. While drawing freehand, new elements are batched and sent once per frame as small segment paths,
+        # Instead of re-sending our whole growing path on every drag event
+        self.frame_interval: float = 1 / max(1, self.story.data.get('canvas_settings', {}).get('max_updates_per_second', 60))
+        self._is_freehand: bool = False             # If our current stroke is freehand (not lines or arcs)
+        self._is_incremental: bool = False          # If our current stroke is drawn as segments (stroke style, fills can't be split up)
+        self._pending_elements: list = []           # Elements drawn since our last frame was sent
+        self._stroke_segments: list = []            # Segment paths on our canvas for our current stroke
+        self._segment_start: tuple = (0.0, 0.0)     # Where our next segment starts (end of our last one)
+        self._segment_paint_settings: dict = {}     # Paint settings for our segments
+        self._last_frame_time: float = 0.0
+        self._stroke_start_time: float = 0.0
+
+        # Per stroke and running totals for how much we send to the client while drawing, for checking performance
+        self.draw_stats: dict = {'strokes': 0, 'updates': 0, 'bytes_sent': 0, 'drawing_time': 0.0}
+        self._stroke_stats: dict = {'updates': 0, 'bytes_sent': 0}
+
         # Track last known canvas size to rescale drawings on resize
         self._last_canvas_size: tuple[float, float] | None = None
 
+        # UI Elements. Built the first time we're shown, so hidden canvases don't hold controls they aren't using
+        self.canvas: cv.Canvas = None                           # Our drawing canvas
+        self.canvas_container: ft.Container = None              # Container that sizes and clips our canvas
+        self.header: ft.Row = None                              # Our background options above our canvas
+        self.interactive_viewer: ft.InteractiveViewer = None    # Our interactive viewer for zooming and panning
+
+        self.current_path= cv.Path(elements=[], paint=ft.Paint(**self.story.data.get('paint_settings', {})))
+       
+        # Our drawing loads when we first build, so hidden canvases don't replay their strokes on launch
+        self.reload_widget()
+
+    
+
+
+    # Called the first time we're shown, and after our UI was released
+    def _build_canvas_ui(self):
+        ''' Builds our canvas, its container, our header, and our interactive viewer '''
+
+        self.tile_layer = ft.Stack(controls=[], width=2000, height=1000)
+
         self.canvas = cv.Canvas(
             content=ft.GestureDetector(
                 mouse_cursor=ft.MouseCursor.PRECISE,
@@ -110,6 +207,13 @@ class Canvas(Widget):
         )
 
 
+        # Only shown while we have strokes selected
+        self.delete_selection_button = ft.IconButton(
+            icon=ft.Icons.DELETE_OUTLINE, tooltip="Delete the selected strokes",
+            visible=bool(self.selected_path_ids),
+            on_click=lambda e: self.delete_selected(),
+        )
+
         # Other UI elements
         self.header = ft.Row([
             ft.PopupMenuButton(
@@ -122,44 +226,76 @@ class Canvas(Widget):
                     ft.PopupMenuItem("Image", on_click=self._set_canvas_background, tooltip="Set an image as the background"),
                 ]
             ),
+            self.delete_selection_button,
             # Show Notes/comments toggle
         ])
 
 
-        self.interactive_viewer = ft.InteractiveViewer(content=self.canvas_container)
+        self.interactive_viewer = ft.InteractiveViewer(
+            content=self.canvas_container,
+            on_interaction_start=self._on_interaction_start,
+            on_interaction_update=self._on_interaction_update,
+            on_interaction_end=self._on_interaction_end,
+        )
 
-        self.current_path= cv.Path(elements=[], paint=ft.Paint(**self.story.data.get('paint_settings', {})))
-       
-        # Load our drawing/display
-        self.load_canvas()
 
-        self.reload_widget()
+    # Called whenever we need our strokes file
+    def get_strokes_path(self) -> str:
+        ''' Returns the path to our strokes file, which sits next to our json file '''
+        return os.path.join(self.directory_path, self.data['canvas']['strokes_file'])
 
-    
+    # Called on launch, for canvases that stored their drawing in their json data
+    def _convert_json_strokes(self):
+        ''' Moves paths and points out of our json data and into our strokes file '''
 
+        # Nothing to convert
+        if 'paths' not in self.data['canvas'] and 'points' not in self.data['canvas']:
+            return
+
+        try:
+            # Write our old drawing into our strokes file, then drop it from our json data
+            paths = self.data['canvas'].get('paths', [])
+            points = self.data['canvas'].get('points', [])
+            self.stroke_file.write_all(paths, points)
+
+            self.data['canvas'].pop('paths', None)
+            self.data['canvas'].pop('points', None)
+            self.data['canvas']['path_count'] = len(paths)
+            self.data['canvas']['point_count'] = len(points)
+            self.save_dict()
+
+        # Keep our json data as is so nothing is lost
+        except Exception as e:
+            print(f"Error converting drawing for {self.title}: {e}")
 
     # Called on launch to load our drawing from data into our canvas
     def load_canvas(self):
-        """Loads our drawing from our saved map drawing file."""
+        """Loads our drawing from our strokes file."""
 
-        # Clear our canvas, and load our shapes stored in data
-        self.canvas.shapes.clear()
-        shapes = self.data.get('canvas', {})
+        self.canvas_loaded = True
+
+        # Load our shapes stored in our strokes file
+        self.stroke_file.file_path = self.get_strokes_path()
+        try:
+            self.paths, self.points = self.stroke_file.read()
+        except Exception as e:
+            print(f"Error loading drawing for {self.title}: {e}")
+            self.paths, self.points = [], []
 
         # Load our background color if we have one
         bgcolor = self.data.get('canvas', {}).get('bgcolor', None)
+        self.bgcolor_shape = None
         if bgcolor is not None:
-            self.canvas.shapes.append(
-                cv.Color(       # Can use effects here as well
-                    color=bgcolor.get('color', 'surface'),
-                    blend_mode=bgcolor.get('blend_mode', 'src_over'),
-                )
+            self.bgcolor_shape = cv.Color(       # Can use effects here as well
+                color=bgcolor.get('color', 'surface'),
+                blend_mode=bgcolor.get('blend_mode', 'src_over'),
             )
 
         # Loading points
-        for point in shapes.get('points', []):
+        self.point_shapes = []
+        for point in self.points:
             px, py, point_mode, paint_settings = point
-            self.canvas.shapes.append(
+            self.point_shapes.append(
                 cv.Points(
                     points=[(px, py)],
                     point_mode=point_mode,
@@ -168,63 +304,528 @@ class Canvas(Widget):
             )
 
         # Loading our paths, which most of the drawing
-        for path in shapes.get('paths', []):
-            
-            elements = path.get('elements', [])         # List of the elements in this path
-            paint_settings = path.get('paint', {})      # Paint settings for this path
-
-            # Grab our style for simple logic
-            style = path.get('paint', {}).get('style', 'stroke')
-
-            # Make a copy of our paint settings to modify for drawing
-            safe_paint_settings = path.get('paint', {}).copy()
-
-            # If in erase mode, we have to set blur_image to 0 and
-            if safe_paint_settings.get('blend_mode', 'src_over') == 'clear':
-                safe_paint_settings['blur_image'] = 0
-
-            # Set stroke or fill based on custom styles
-            safe_stroke = 'fill' if style.endswith('fill') else 'stroke'
-            safe_paint_settings['style'] = safe_stroke
-
-            new_path = cv.Path(elements=[], paint=ft.Paint(**safe_paint_settings))   # Set a new path for this path with our paint settings
-
-            # Iterate through each element for its type, and create a new path element based on that
-            for element in elements:
-
-                # MoveTo just has x and y
-                if element['type'] == 'moveto':
-                    new_path.elements.append(cv.Path.MoveTo(element['x'], element['y']))
-
-                # Lineto jjust has x and y
-                elif element['type'] == 'lineto':
-                    new_path.elements.append(cv.Path.LineTo(element['x'], element['y']))
-                        
-
-                # QuadraticTo has cp1x, cp1y, x, y, w
-                elif element['type'] == 'arcto':
-                    new_path.elements.append(
-                        cv.Path.ArcTo(
-                            radius=element['radius'],
-                            rotation=element['rotation'],
-                            large_arc=element['large_arc'],
-                            x=element['x'],
-                            y=element['y'],
-                        )
+        self.path_shapes = [self._build_path_shape(path) for path in self.paths]
+
+        # Index our paths so we can find them by point or area
+        self._rebuild_spatial_index()
+
+        # Big drawings show as image tiles instead of shapes
+        self._update_tile_mode()
+
+        # Only put the shapes we can see on our canvas
+        self._visible_path_ids = None
+        self.selected_path_ids.clear()
+        self.selection_shapes = []
+        self.render_visible_shapes(force=True)
+
+    # Called when loading our canvas
+    def _build_path_shape(self, path: dict) -> cv.Path:
+        ''' Builds the canvas shape for one of our stored paths '''
+
+        elements = path.get('elements', [])         # List of the elements in this path
+        paint_settings = path.get('paint', {})      # Paint settings for this path
+
+        # Grab our style for simple logic
+        style = path.get('paint', {}).get('style', 'stroke')
+
+        # Make a copy of our paint settings to modify for drawing
+        safe_paint_settings = path.get('paint', {}).copy()
+
+        # If in erase mode, we have to set blur_image to 0 and
+        if safe_paint_settings.get('blend_mode', 'src_over') == 'clear':
+            safe_paint_settings['blur_image'] = 0
+
+        # Set stroke or fill based on custom styles
+        safe_stroke = 'fill' if style.endswith('fill') else 'stroke'
+        safe_paint_settings['style'] = safe_stroke
+
+        new_path = cv.Path(elements=[], paint=ft.Paint(**safe_paint_settings))   # Set a new path for this path with our paint settings
+
+        # Iterate through each element for its type, and create a new path element based on that
+        for element in elements:
+
+            # MoveTo just has x and y
+            if element['type'] == 'moveto':
+                new_path.elements.append(cv.Path.MoveTo(element['x'], element['y']))
+
+            # Lineto jjust has x and y
+            elif element['type'] == 'lineto':
+                new_path.elements.append(cv.Path.LineTo(element['x'], element['y']))
+                    
+
+            # QuadraticTo has cp1x, cp1y, x, y, w
+            elif element['type'] == 'arcto':
+                new_path.elements.append(
+                    cv.Path.ArcTo(
+                        radius=element['radius'],
+                        rotation=element['rotation'],
+                        large_arc=element['large_arc'],
+                        x=element['x'],
+                        y=element['y'],
                     )
+                )
 
-                
-                else:
-                    print("Unknown path element type while loading: ", element)
-                    self.p.open(Snack_Bar(f"Error loading {self.title}"))
+            # Arc has its bounding box and angles
+            elif element['type'] == 'arc':
+                new_path.elements.append(
+                    cv.Path.Arc(
+                        x=element['x'],
+                        y=element['y'],
+                        width=element['width'],
+                        height=element['height'],
+                        start_angle=element['start_angle'],
+                        sweep_angle=element['sweep_angle'],
+                    )
+                )
+
+            
+            else:
+                print("Unknown path element type while loading: ", element)
+                self.p.open(Snack_Bar(f"Error loading {self.title}"))
+
+        return new_path
+
+    # Called when loading our paths
+    def _rebuild_spatial_index(self):
+        ''' Gives all our paths new ids, and rebuilds our spatial index from them '''
+
+        self.spatial_index.clear()
+        self.path_ids = list(range(len(self.paths)))
+        self._next_path_id = len(self.paths)
+
+        for path_id, path in zip(self.path_ids, self.paths):
+            box = path_bounds(path)
+            if box is not None:
+                self.spatial_index.insert(path_id, box)
+
+    # Called when a new path is added to the end of our paths
+    def _index_new_path(self, path: dict) -> tuple:
+        ''' Gives a new path its id and adds it to our spatial index. Returns its bounding box '''
+
+        path_id = self._next_path_id
+        self._next_path_id += 1
+        self.path_ids.append(path_id)
+
+        box = path_bounds(path)
+        if box is not None:
+            self.spatial_index.insert(path_id, box)
+
+        return box
+
+    def _path_positions(self, path_ids) -> list:
+        ''' Returns where each path id is in our paths list, in drawing order '''
+        return sorted(bisect_left(self.path_ids, path_id) for path_id in path_ids)
+
+    # Called whenever we pan or zoom
+    def get_viewport(self) -> tuple:
+        ''' Returns the area of our canvas we can currently see, as (min_x, min_y, max_x, max_y) in canvas coordinates '''
+
+        width, height = self._last_canvas_size or (self.canvas_container.width or 2000, self.canvas_container.height or 1000)
+        offset_x, offset_y = self.viewport_offset
+
+        return (offset_x, offset_y, offset_x + width / self.zoom, offset_y + height / self.zoom)
+
+    # Called when loading our canvas, and after we pan or zoom
+    def render_visible_shapes(self, force: bool = False):
+        ''' Puts only the paths inside our viewport (plus a margin) on our canvas, so the client doesn't draw what we can't see '''
+
+        # Never swap shapes out from under a stroke we're drawing
+        if self._is_freehand or self._is_erasing_objects:
+            return
+
+        # Our tiles already only show what we can see, so our canvas just has our untiled shapes
+        if self.use_tiles:
+            if force:
+                self.canvas.shapes = list(self._untiled_shapes) + self.selection_shapes
+            self.refresh_tiles()
+            return
+
+        # When we're zoomed out enough to see our whole canvas, everything is visible anyway
+        if self.zoom <= 1.0:
+            visible_ids = list(self.path_ids)
+
+        # Otherwise grab whats in our viewport, with half a viewport of margin so panning doesn't show gaps
+        else:
+            min_x, min_y, max_x, max_y = self.get_viewport()
+            margin_x, margin_y = (max_x - min_x) / 2, (max_y - min_y) / 2
+            visible = self.spatial_index.query_rect((min_x - margin_x, min_y - margin_y, max_x + margin_x, max_y + margin_y))
+            visible_ids = sorted(visible)
+
+        # Nothing changed, so nothing to send
+        if not force and visible_ids == self._visible_path_ids:
+            return
+
+        self._visible_path_ids = visible_ids
+
+        # Same order as we loaded: background, points, then paths (in the order they were drawn), then our selection on top
+        shapes = [self.bgcolor_shape] if self.bgcolor_shape is not None else []
+        shapes.extend(self.point_shapes)
+        shapes.extend(self.path_shapes[position] for position in self._path_positions(visible_ids))
+        shapes.extend(self.selection_shapes)
+        self.canvas.shapes = shapes
+
+        if not force:
+            try:
+                self.canvas.page = self.p
+                self.canvas.update()
+            except Exception:
+                self.p.update()
+
+    # Called when selecting strokes
+    def select_paths_at(self, x: float, y: float, radius: float = 5.0) -> list:
+        ''' Returns the indexes of our paths that actually pass within radius of a point, newest first '''
+
+        hits = []
+        for position in self._path_positions(self.spatial_index.query_point(x, y, radius)):
+            path = self.paths[position]
+
+            # Our index only knows bounding boxes, so check the actual path (including its stroke width)
+            stroke_radius = (path.get('paint', {}).get('stroke_width', 1) or 1) / 2
+            if path_distance(path, x, y) <= radius + stroke_radius:
+                hits.append(position)
+
+        return hits[::-1]
+
+    # Called when erasing whole strokes
+    def erase_paths_at(self, x: float, y: float, radius: float = None) -> int:
+        ''' Removes every path under a point from our canvas. Returns how many were removed. Storage is rewritten in _save_erased_paths '''
+
+        # Default to our brush size, at our current zoom
+        if radius is None:
+            radius = max(1.0, (self.story.data.get('paint_settings', {}).get('stroke_width', 5) or 5) / 2) / self.zoom
+
+        hits = self.select_paths_at(x, y, radius)
+        if not hits:
+            return 0
+
+        self._remove_paths(hits)
+        return len(hits)
+
+    # Called when erasing or deleting selected strokes
+    def _remove_paths(self, positions: list):
+        ''' Removes the paths at the given positions from our canvas and spatial index. Storage is rewritten in _save_erased_paths '''
+
+        removed_ids = set()
+        removed_shapes = []
+
+        # Remove from the end first so our other positions don't shift
+        for position in sorted(positions, reverse=True):
+            path = self.paths.pop(position)
+            removed_shapes.append(self.path_shapes.pop(position))
+            path_id = self.path_ids.pop(position)
+
+            # Our other paths keep their ids, so only this one leaves our index
+            self.spatial_index.remove(path_id)
+            removed_ids.add(path_id)
+
+            # Redraw the tiles it was in
+            if self.use_tiles:
+                box = path_bounds(path)
+                if box is not None:
+                    self.tile_cache.invalidate_rect(box)
+
+        self._remove_shapes(removed_shapes)
+
+        if self._visible_path_ids is not None:
+            self._visible_path_ids = [path_id for path_id in self._visible_path_ids if path_id not in removed_ids]
+
+        self._erased_paths = True
+
+        # Drop any of them we had selected
+        if self.selected_path_ids & removed_ids:
+            self.selected_path_ids -= removed_ids
+            self._draw_selection(update=False)
+
+        if self.use_tiles:
+            self.refresh_tiles()
+
+        try:
+            self.canvas.page = self.p
+            self.canvas.update()
+        except Exception:
+            self.p.update()
+
+    # Called when tapping the canvas in select mode
+    def select_at(self, x: float, y: float, add: bool = False):
+        ''' Toggles the selection of our newest path under a point. Tapping empty canvas clears our selection unless we're adding to it '''
+
+        hits = self.select_paths_at(x, y, max(1.0, 5.0 / self.zoom))
+
+        if not hits:
+            if add or not self.selected_path_ids:
+                return
+            self.selected_path_ids.clear()
+
+        # Dragging only adds to our selection
+        elif add:
+            new_ids = {self.path_ids[position] for position in hits} - self.selected_path_ids
+            if not new_ids:
+                return
+            self.selected_path_ids |= new_ids
+
+        else:
+            path_id = self.path_ids[hits[0]]
+            if path_id in self.selected_path_ids:
+                self.selected_path_ids.discard(path_id)
+            else:
+                self.selected_path_ids.add(path_id)
+
+        self._draw_selection()
+
+    # Called when leaving select mode
+    def clear_selection(self):
+        ''' Deselects all our paths '''
+
+        if not self.selected_path_ids:
+            return
+
+        self.selected_path_ids.clear()
+        self._draw_selection()
+
+    # Called from our header when we have strokes selected
+    def delete_selected(self):
+        ''' Removes our selected paths from our drawing and saves it '''
+
+        if not self.selected_path_ids:
+            return
+
+        self._remove_paths(self._path_positions(self.selected_path_ids))
+        self._save_erased_paths()
+
+    # Called whenever our selection changes
+    def _draw_selection(self, update: bool = True):
+        ''' Swaps the outlines on our canvas for ones around our currently selected paths '''
+
+        if self.canvas is None:
+            return
+
+        self._remove_shapes(self.selection_shapes)
+        self.selection_shapes = []
+        for path_id in sorted(self.selected_path_ids):
+            box = self.spatial_index.boxes.get(path_id, None)
+            if box is None:
+                continue
+
+            self.selection_shapes.append(
+                cv.Rect(
+                    x=box[0], y=box[1], width=box[2] - box[0], height=box[3] - box[1],
+                    paint=ft.Paint(color=ft.Colors.PRIMARY, stroke_width=1, style=ft.PaintingStyle.STROKE, stroke_dash_pattern=[5, 5]),
+                )
+            )
+
+        self.canvas.shapes.extend(self.selection_shapes)
+        self.delete_selection_button.visible = bool(self.selected_path_ids)
+
+        if not update:
+            return
+
+        try:
+            self.canvas.page = self.p
+            self.canvas.update()
+            self.header.update()
+        except Exception:
+            self.p.update()
+
+    # Called when removing shapes from our canvas
+    def _remove_shapes(self, shapes: list):
+        ''' Removes shapes from our canvas and our untiled shapes. Flet controls compare by value, so this matches by identity instead '''
+
+        if not shapes:
+            return
+
+        removed = set(id(shape) for shape in shapes)
+        self._untiled_shapes[:] = [shape for shape in self._untiled_shapes if id(shape) not in removed]
+        if self.canvas is not None:
+            self.canvas.shapes[:] = [shape for shape in self.canvas.shapes if id(shape) not in removed]
+
+    # Called when loading our canvas, and when our drawing grows
+    def _update_tile_mode(self):
+        ''' Switches our canvas to show image tiles once we have more paths than our tile cache threshold '''
+
+        threshold = self.story.data.get('canvas_settings', {}).get('tile_cache_threshold', 500)
+        if self.use_tiles or not threshold or len(self.paths) < threshold:
+            return
+
+        try:
+            # Each canvas gets its own tile directory, keyed by its strokes file
+            cache_directory = os.path.join(data_paths.tile_cache_path, hashlib.sha1(self.get_strokes_path().encode("utf-8")).hexdigest()[:16])
+            self.tile_cache = Tile_Cache(cache_directory, signature=self._tile_signature())
+
+        except Exception as e:
+            print(f"Error creating tile cache for {self.title}: {e}")
+            return
+
+        self.use_tiles = True
+
+        # Everything already on our canvas is about to be in our tiles
+        self._untiled_shapes = []
+
+        # Our tiles go under our canvas, with our background color under them (a background shape would cover our tiles)
+        bgcolor = self.data.get('canvas', {}).get('bgcolor', {}) or {}
+        self.canvas_container.bgcolor = bgcolor.get('color', None)
+        self.canvas.left, self.canvas.top, self.canvas.right, self.canvas.bottom = 0, 0, 0, 0
+        self.canvas_stack = ft.Stack([self.tile_layer, self.canvas], expand=True)
+        self.canvas_container.content = self.canvas_stack
+
+    def _tile_signature(self) -> str:
+        ''' Returns a signature of our strokes files, so tiles left on disk are only reused if our drawing hasn't changed '''
+
+        parts = []
+        for path in (self.stroke_file.file_path, self.stroke_file.compacting_path, self.stroke_file.journal_path):
+            try:
+                stat = os.stat(path)
+                parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+            except OSError:
+                parts.append("-")
+
+        return "|".join(parts)
+
+    # Called after we load, pan, zoom, draw, or erase with tiles on
+    def refresh_tiles(self):
+        ''' Renders (or grabs from our cache) the tiles for what we can see on a background thread, then shows them '''
+
+        if not self.use_tiles:
+            return
+
+        # Only one render at a time. If one is running, it runs again once its shown
+        if self._tile_rendering:
+            self._tiles_need_refresh = True
+            return
+
+        self._tile_rendering = True
+        self._tiles_need_refresh = False
+        level = self.tile_cache.get_level(self.zoom)
+        canvas_width, canvas_height = self.canvas_container.width or 2000, self.canvas_container.height or 1000
+
+        # Everything is visible when zoomed out, otherwise our viewport with some margin for panning
+        if self.zoom <= 1.0:
+            area = (0, 0, canvas_width, canvas_height)
+        else:
+            min_x, min_y, max_x, max_y = self.get_viewport()
+            margin_x, margin_y = (max_x - min_x) / 2, (max_y - min_y) / 2
+            area = (max(0, min_x - margin_x), max(0, min_y - margin_y), min(canvas_width, max_x + margin_x), min(canvas_height, max_y + margin_y))
+
+        # Grab just the paths and points each tile needs here on the UI thread, so our render thread never touches our live lists
+        jobs = []
+        for column, row in self.tile_cache.tiles_for_rect(level, area):
+            if self.tile_cache.is_empty(level, column, row):
+                continue
+
+            rect = self.tile_cache.tile_rect(level, column, row)
+            paths = [self.paths[position] for position in self._path_positions(self.spatial_index.query_rect(rect))]
+            points = [
+                point for point in self.points
+                if rect[0] - 50 <= point[0] <= rect[2] + 50 and rect[1] - 50 <= point[1] <= rect[3] + 50
+            ]
+            jobs.append((column, row, rect, paths, points))
+
+        # The shapes our new tiles will cover once they're shown
+        tiled_shapes = list(self._untiled_shapes)
+
+        Thread(target=self._render_tiles, args=(level, jobs, tiled_shapes), daemon=True).start()
+
+    # Called on our tile render thread
+    def _render_tiles(self, level: int, jobs: list, tiled_shapes: list):
+        ''' Renders our tile images, then hands them to the UI thread to show. Never touches our controls or live lists '''
+
+        tiles = []
+        stale = False
+
+        try:
+            for column, row, rect, paths, points in jobs:
+                file_path = self.tile_cache.get_tile(level, column, row, paths, points)
+
+                if file_path is None:
+
+                    # Our drawing changed while we rendered, so these tiles are already old
+                    if not self.tile_cache.is_empty(level, column, row):
+                        stale = True
+                        break
+
+                    continue
 
-            self.canvas.shapes.append(new_path)
+                tiles.append((file_path, rect))
+
+        except Exception as e:
+            print(f"Error rendering tiles for {self.title}: {e}")
+            tiles = None
+
+        try:
+            self.p.run_task(self._show_tiles, tiles, tiled_shapes, stale)
+        except Exception as e:
+            print(f"Error showing tiles for {self.title}: {e}")
+            self._tile_rendering = False
+
+    # Called on the UI thread once our render thread is done
+    async def _show_tiles(self, tiles: list, tiled_shapes: list, stale: bool):
+        ''' Swaps in our new tiles, and drops the shapes they now cover from our canvas '''
+
+        self._tile_rendering = False
+
+        # Our UI was released (or tiles turned off) while we were rendering
+        if not self.use_tiles or self.tile_layer is None or self.canvas is None:
+            return
+
+        if tiles is not None and not stale:
+            self.tile_layer.controls = [
+                ft.Image(
+                    src=file_path, left=rect[0], top=rect[1],
+                    width=rect[2] - rect[0], height=rect[3] - rect[1],
+                    fit=ft.BoxFit.FILL, gapless_playback=True,
+                )
+                for file_path, rect in tiles
+            ]
+            self._remove_shapes(tiled_shapes)
+            self.p.update()
+
+        # Our drawing changed while we were working, so go again
+        if stale or self._tiles_need_refresh:
+            self.refresh_tiles()
+
+    # Called after we save our strokes file
+    def _save_tile_signature(self):
+        ''' Marks the tiles left on disk as matching our strokes file, so they can be reused next time we load '''
+
+        if self.tile_cache is not None:
+            self.tile_cache.set_signature(self._tile_signature())
+
+    # Called after erasing paths
+    def _save_erased_paths(self):
+        ''' Rewrites our strokes file without our erased paths '''
+
+        if not self._erased_paths:
+            return
+
+        self._erased_paths = False
+
+        try:
+            self.stroke_file.file_path = self.get_strokes_path()
+            self.stroke_file.write_all(self.paths, self.points)
+
+            # Our erased paths already invalidated their tiles
+            self._save_tile_signature()
+        except Exception as e:
+            print(f"Error saving erased drawing for {self.title}: {e}")
+
+        self.data['canvas']['path_count'] = len(self.paths)
+        self.save_dict()
     
 
     # Called when we click the canvas and don't initiate a drag
     async def add_point(self, e: ft.TapEvent):
         ''' Adds a point to the canvas if we just clicked and didn't initiate a drag '''
 
+        # Selecting strokes instead of drawing
+        if self._selecting_enabled():
+            self.select_at(e.local_x, e.local_y)
+            return
+
+        # Erasing whole strokes instead of drawing
+        if self._erasing_objects_enabled():
+            self.erase_paths_at(e.local_x, e.local_y)
+            self._save_erased_paths()
+            return
+
         # Create the point using our paint settings and point mode
         point = cv.Points(
             points=[(e.local_x, e.local_y)],
@@ -233,13 +834,14 @@ class Canvas(Widget):
         
         # Add point to the canvas and our state data
         self.canvas.shapes.append(point)
+        self.point_shapes.append(point)
         self.state.points.append((e.local_x, e.local_y, point.point_mode, point.paint.__dict__))
 
         # After dragging canvas widget, it loses page reference and can't update
         try:
             self.canvas.update()
             
-        except Exception as ex:
+        except Exception:
             self.p.update()
             
             
@@ -250,6 +852,18 @@ class Canvas(Widget):
     async def start_drawing(self, e: ft.DragStartEvent):
         ''' Set our initial starting x and y coordinates for the element we're drawing '''
 
+        # Dragging in select mode adds every stroke we drag over to our selection
+        if self._selecting_enabled():
+            self._is_selecting = True
+            self.select_at(e.local_x, e.local_y, add=True)
+            return
+
+        # Erasing whole strokes instead of drawing
+        if self._erasing_objects_enabled():
+            self._is_erasing_objects = True
+            self.erase_paths_at(e.local_x, e.local_y)
+            return
+
         # Grab our style so we can compare it
         style = str(self.story.data.get('paint_settings', {}).get('style', 'stroke'))
 
@@ -279,6 +893,16 @@ class Canvas(Widget):
         self.state.paths.clear()
         self.state.paths.append({'elements': list(), 'paint': state_paint_settings})
 
+        # Set up our incremental drawing for freehand strokes
+        self._is_freehand = style not in ("lineto", "arc", "arcfill", "arcto", "arctofill")
+        self._is_incremental = self._is_freehand and safe_stroke == 'stroke'
+        self._pending_elements = []
+        self._stroke_segments = []
+        self._segment_start = (e.local_x, e.local_y)
+        self._segment_paint_settings = safe_paint_settings
+        self._stroke_start_time = self._last_frame_time = time.perf_counter()
+        self._stroke_stats = {'updates': 0, 'bytes_sent': 0}
+
         # Set move to element at our starting position that the mouse is at for the path to start from
         move_to_element = cv.Path.MoveTo(e.local_x, e.local_y)
 
@@ -328,6 +952,16 @@ class Canvas(Widget):
     async def is_drawing(self, e: ft.DragUpdateEvent):
         ''' Creates our line to add to the canvas as we draw, and saves that paths data to self.state '''
 
+        # Selecting whole strokes as we drag over them
+        if self._is_selecting:
+            self.select_at(e.local_x, e.local_y, add=True)
+            return
+
+        # Erasing whole strokes as we drag over them
+        if self._is_erasing_objects:
+            self.erase_paths_at(e.local_x, e.local_y)
+            return
+
         # Sampling to improve perforamance. If the line length is too small, we skip it
         dx = e.local_x - self.state.x
         dy = e.local_y - self.state.y
@@ -358,7 +992,7 @@ class Canvas(Widget):
                 # Page reference gets lost after dragging widget to new canvas, so we reset it and update
                 self.canvas.page = self.p
                 self.canvas.update()
-            except Exception as ex:
+            except Exception:
                 self.p.update()
             return
         
@@ -390,7 +1024,7 @@ class Canvas(Widget):
                 # Page reference gets lost after dragging widget to new canvas, so we reset it and update
                 self.canvas.page = self.p
                 self.canvas.update()
-            except Exception as ex:
+            except Exception:
                 self.p.update()
             return
         
@@ -412,7 +1046,7 @@ class Canvas(Widget):
                 # Page reference gets lost after dragging widget to new canvas, so we reset it and update
                 self.canvas.page = self.p
                 self.canvas.update()
-            except Exception as ex:
+            except Exception:
                 self.p.update()
             return
         
@@ -420,51 +1054,305 @@ class Canvas(Widget):
         # If its not one of our custom styles, use free-draw stroke, which is constantly adding line_to segements
         else:
 
-            # Set the path element based on what kind of path we're adding, add it to our current path and our state paths
+            # Set the path element based on what kind of path we're adding, add it to our state paths
             path_element = cv.Path.LineTo(e.local_x, e.local_y)
-
-            # Add the declared element to our current path and state paths
-            self.current_path.elements.append(path_element)
             self.state.paths[0]['elements'].append((path_element.__dict__))  
 
-            # After dragging canvas widget, it loses page reference and can't update
-            try:
-                # Page reference gets lost after dragging widget to new canvas, so we reset it and update
-                self.canvas.page = self.p
-                self.canvas.update()
-            except Exception as ex:
-                self.p.update()
-            
+            # Strokes batch their new elements into a segment. Fills have to stay one path, so they grow our current path
+            if self._is_incremental:
+                self._pending_elements.append(path_element)
+            else:
+                self.current_path.elements.append(path_element)
 
             # Update our state x and y for the next segment
             self.state.x, self.state.y = e.local_x, e.local_y
+
+            # Only send to the client once per frame, no matter how many drag events we get
+            if time.perf_counter() - self._last_frame_time >= self.frame_interval:
+                self._send_frame()
         
 
+    # Called when we start drawing or tap
+    def _erasing_objects_enabled(self) -> bool:
+        ''' Returns if we're in erase mode and set to erase whole strokes '''
+        canvas_settings = self.story.data.get('canvas_settings', {})
+        return canvas_settings.get('erase_mode', False) and canvas_settings.get('erase_objects', False)
+
+    # Called when we start drawing or tap. Selecting takes priority over erasing and drawing
+    def _selecting_enabled(self) -> bool:
+        ''' Returns if we're in select mode '''
+        return self.story.data.get('canvas_settings', {}).get('select_mode', False)
+
+    # Called at most once per frame while drawing freehand
+    def _send_frame(self):
+        ''' Sends what we've drawn since our last frame to the client. Strokes only send their new segment '''
+
+        # Turn our batched elements into a small segment path that starts where our last one ended
+        if self._is_incremental:
+            if not self._pending_elements:
+                return
+
+            segment = cv.Path(
+                elements=[cv.Path.MoveTo(self._segment_start[0], self._segment_start[1])] + self._pending_elements,
+                paint=ft.Paint(**self._segment_paint_settings),
+            )
+            self.canvas.shapes.append(segment)
+            self._stroke_segments.append(segment)
+            self._stroke_stats['bytes_sent'] += self._estimate_bytes(segment.elements)
+
+            last_element = self._pending_elements[-1]
+            self._segment_start = (last_element.x, last_element.y)
+            self._pending_elements = []
+
+        # Fills can't be split up, so our whole current path goes out again
+        else:
+            self._stroke_stats['bytes_sent'] += self._estimate_bytes(self.current_path.elements)
+
+        self._last_frame_time = time.perf_counter()
+        self._stroke_stats['updates'] += 1
+
+        # After dragging canvas widget, it loses page reference and can't update
+        try:
+            # Page reference gets lost after dragging widget to new canvas, so we reset it and update
+            self.canvas.page = self.p
+            self.canvas.update()
+        except Exception:
+            self.p.update()
+
+    # Called on pen up
+    def _finish_stroke(self):
+        ''' Swaps our stroke segments for our one (simplified) stroke path, and records our drawing stats '''
+
+        if not self._is_freehand or not self.state.paths:
+            return
+
+        self._is_freehand = False
+
+        # Our current path gets the whole stroke, and our segments are removed
+        elements = self.state.paths[0].get('elements', [])
+        if elements:
+            self.current_path.elements = [cv.Path.MoveTo(elements[0]['x'], elements[0]['y'])]
+            self.current_path.elements.extend(cv.Path.LineTo(element['x'], element['y']) for element in elements[1:])
+
+        self._remove_shapes(self._stroke_segments)
+
+        self._pending_elements = []
+        self._stroke_segments = []
+
+        # Send our final stroke to the client
+        self._stroke_stats['updates'] += 1
+        self._stroke_stats['bytes_sent'] += self._estimate_bytes(self.current_path.elements)
+        try:
+            self.canvas.page = self.p
+            self.canvas.update()
+        except Exception:
+            self.p.update()
+
+        # Report what we sent
+        stroke_time = max(time.perf_counter() - self._stroke_start_time, 0.001)
+        self.draw_stats['strokes'] += 1
+        self.draw_stats['updates'] += self._stroke_stats['updates']
+        self.draw_stats['bytes_sent'] += self._stroke_stats['bytes_sent']
+        self.draw_stats['drawing_time'] += stroke_time
+        if self.story.data.get('canvas_settings', {}).get('debug_stats', False):
+            print(f"Stroke sent {self._stroke_stats['bytes_sent']} bytes in {self._stroke_stats['updates']} updates ({self._stroke_stats['updates'] / stroke_time:.0f} updates/s)")
+
+    def _estimate_bytes(self, elements: list) -> int:
+        ''' Estimates how many bytes a list of path elements takes to send to the client '''
+        return sum(len(json.dumps(element.__dict__, default=str)) for element in elements)
+
+    # Called when we start zooming or panning our interactive viewer
+    def _on_interaction_start(self, e):
+        ''' Remembers our zoom level when a zoom starts, since updates give us the scale relative to it '''
+        self._zoom_at_interaction_start = self.zoom
+
+    # Called while zooming or panning our interactive viewer
+    def _on_interaction_update(self, e):
+        ''' Tracks our current zoom level and where our viewport is '''
+
+        scale = getattr(e, 'scale', None)
+        if scale:
+            self.zoom = max(0.1, self._zoom_at_interaction_start * scale)
+
+        # Panning moves our viewport the opposite way, in canvas coordinates
+        delta = getattr(e, 'focal_point_delta', None)
+        if delta is not None:
+            self.viewport_offset = (
+                self.viewport_offset[0] - (getattr(delta, 'x', 0) or 0) / self.zoom,
+                self.viewport_offset[1] - (getattr(delta, 'y', 0) or 0) / self.zoom,
+            )
+
+    # Called when we stop zooming or panning
+    def _on_interaction_end(self, e):
+        ''' Updates which shapes (or tiles) are on our canvas for our new viewport '''
+        self.render_visible_shapes()
+
+    # Called on pen up before saving our stroke
+    def _simplify_stroke(self):
+        ''' Simplifies our stored freehand stroke (moveto + linetos) with Ramer-Douglas-Peucker. _finish_stroke then draws it '''
+
+        canvas_settings = self.story.data.get('canvas_settings', {})
+        if not canvas_settings.get('simplify_strokes', True):
+            return
+
+        # Tolerance is in screen pixels, so zoomed in strokes keep more detail and zoomed out strokes keep less
+        tolerance = canvas_settings.get('simplify_tolerance', 1.0) / self.zoom
+
+        for path in self.state.paths:
+            elements = path.get('elements', [])
+
+            # Only freehand strokes. Shapes (lines, arcs) are already just a few elements
+            if len(elements) < 3 or elements[0].get('type') != 'moveto' or any(element.get('type') != 'lineto' for element in elements[1:]):
+                continue
+
+            points = [(element['x'], element['y']) for element in elements]
+            simplified = simplify_points(points, tolerance)
+
+            # Replace our stored path with its simplified form
+            path['elements'] = [{'type': 'moveto', 'x': simplified[0][0], 'y': simplified[0][1]}]
+            path['elements'].extend({'type': 'lineto', 'x': x, 'y': y} for x, y in simplified[1:])
+
+            # Report how much we saved
+            self.simplify_stats['strokes'] += 1
+            self.simplify_stats['elements_before'] += len(points)
+            self.simplify_stats['elements_after'] += len(simplified)
+            if canvas_settings.get('debug_stats', False):
+                print(f"Simplified stroke from {len(points)} to {len(simplified)} elements ({len(simplified) / len(points):.0%} kept)")
+
     # Called when we release the mouse to stop drawing a line
     def save_canvas(self):
-        """ Saves our paths to our canvas data for storage """
-        
-        # Add on to what we already have
-        if self.state.paths:
-            self.data['canvas']['paths'].extend(self.state.paths)
-        if self.state.points:
-            self.data['canvas']['points'].extend(self.state.points)
+        """ Appends our new paths and points to our strokes file for storage """
+
+        # Selecting doesn't change our drawing
+        if self._is_selecting:
+            self._is_selecting = False
+            return
+
+        # Object erasing saves our whole drawing once at the end of the drag
+        if self._is_erasing_objects:
+            self._is_erasing_objects = False
+            self._save_erased_paths()
+            return
 
+        # Drop empty paths (taps that never started a stroke)
+        self.state.paths = [path for path in self.state.paths if path.get('elements')]
+
+        # Shrink our freehand strokes before we store them, then draw the final stroke in place of its segments
+        self._simplify_stroke()
+        self._finish_stroke()
+
+        # Append just this stroke to our strokes journal, instead of rewriting our whole drawing
+        try:
+            self.stroke_file.file_path = self.get_strokes_path()
+            self.stroke_file.append(self.state.paths, self.state.points)
+        except Exception as e:
+            print(f"Error saving drawing for {self.title}: {e}")
+
+        # Add on to what we already have, and index our new paths
+        for path in self.state.paths:
+            self.paths.append(path)
+            self.path_shapes.append(self.current_path)
+            box = self._index_new_path(path)
+
+            if self._visible_path_ids is not None:
+                self._visible_path_ids.append(self.path_ids[-1])
+
+            # Keep it as a shape until the tiles it lands in are redrawn
+            if self.use_tiles:
+                self._untiled_shapes.append(self.current_path)
+                if box is not None:
+                    self.tile_cache.invalidate_rect(box)
+
+        if self.use_tiles and self.state.points:
+            self._untiled_shapes.extend(self.point_shapes[-len(self.state.points):])
+            for point in self.state.points:
+                self.tile_cache.invalidate_rect((point[0] - 50, point[1] - 50, point[0] + 50, point[1] + 50))
+
+        self.points.extend(self.state.points)
+
+        # Now that the tiles our new strokes landed in are invalidated, the rest still match our strokes file
+        self._save_tile_signature()
+
+        # Our json data just tracks our counts
+        self.data['canvas']['path_count'] = len(self.paths)
+        self.data['canvas']['point_count'] = len(self.points)
         self.save_dict()
 
         # Clear the current state, otherwise it constantly grows and lags the program
         self.state.paths.clear()
         self.state.points.clear()
 
-        #print("Length of canvas paths data: ", len(self.data['canvas']['paths']))
-        #print("Number of elements in all paths: ", sum(len(p['elements']) for p in self.data['canvas']['paths']))
+        # Switch to tiles if we just got big enough, and redraw the tiles our new strokes landed in
+        if self.use_tiles:
+            self.refresh_tiles()
+        else:
+            self._update_tile_mode()
+            if self.use_tiles:
+                self.render_visible_shapes(force=True)
+
+        #print("Length of canvas paths data: ", len(self.paths))
+        #print("Number of elements in all paths: ", sum(len(p['elements']) for p in self.paths))
+
+    # Called when deleting our widget, or moving it (which deletes our old json file)
+    def delete_file(self, old_file_path: str) -> bool:
+        ''' Deletes our json file, and our strokes file unless we are just moving '''
+
+        deleted = super().delete_file(old_file_path)
+
+        # Moving keeps our strokes file, move_file moves it for us
+        if deleted and not getattr(self, '_moving', False):
+            try:
+                self.stroke_file.delete()
+                if self.tile_cache is not None:
+                    shutil.rmtree(self.tile_cache.cache_directory, ignore_errors=True)
+            except Exception as e:
+                print(f"Error deleting strokes file for {self.title}: {e}")
+
+        return deleted
+
+    # Called when moving our canvas to a new directory
+    def move_file(self, new_directory: str):
+        ''' Moves our json file, and our strokes file along with it '''
+
+        old_directory = self.directory_path
+
+        self._moving = True
+        try:
+            super().move_file(new_directory)
+        finally:
+            self._moving = False
+
+        # Only move our strokes file if we actually moved
+        if self.directory_path != old_directory:
+            try:
+                self.stroke_file.move(self.get_strokes_path())
+            except Exception as e:
+                print(f"Error moving strokes file for {self.title}: {e}")
+
+    # Called when renaming our canvas
+    def rename(self, title: str):
+        ''' Renames our canvas, and our strokes file to match '''
+
+        old_strokes_path = self.get_strokes_path()
+
+        # Point our data at our new strokes file name before the json file is saved
+        self.data['canvas']['strokes_file'] = f"{title.capitalize()}.strokes"
+
+        try:
+            self.stroke_file.file_path = old_strokes_path
+            self.stroke_file.move(os.path.join(self.directory_path, self.data['canvas']['strokes_file']))
+        except Exception as e:
+            print(f"Error renaming strokes file for {self.title}: {e}")
+
+        super().rename(title)
 
 
     # Called when the canvas control is resized
     async def on_canvas_resize(self, e: ft.ControlEvent):
         """Rescales stored drawing coordinates to match the new canvas size."""
-        print(e.height, e.width)
-        pass
+
+        # Track our size for our viewport
+        self._last_canvas_size = (e.width, e.height)
 
     def _set_canvas_background(self, e):
         """Sets the canvas background based on menu selection."""
@@ -495,90 +1383,211 @@ class Canvas(Widget):
             # Open file dialog to select image
 
 
-    # NOT TESTED ----------------------------------
-    def export_canvas(self, filename: str = "canvas_export.png", desired_width: int = 1920, desired_height: int = 1080):
-        """Exports the canvas as an image at desired size, computing bounds if no meta exists."""
-        shapes = self.data.get('canvas', {})
-        
+    # Called when right clicking our tab
+    def get_menu_options(self) -> list[ft.Control]:
+        ''' Returns our list of menu options for this widget '''
+
+        return [
+            Menu_Option_Style(
+                on_click=self.export_clicked,
+                content=ft.Row([
+                    ft.Icon(ft.Icons.IMAGE_OUTLINED),
+                    ft.Text(
+                        "Export",
+                        weight=ft.FontWeight.BOLD,
+                        color=ft.Colors.ON_SURFACE
+                    ),
+                ]),
+            ),
+        ]
+
+    # Called when the export menu option is clicked
+    async def export_clicked(self, e):
+        ''' Asks what size to export at, then where to save it, then exports our canvas there '''
+
+        self.story.close_menu()
+
+        # Sizes we can export at. Keys are "widthxheight"
+        size_dropdown = ft.Dropdown(
+            label="Size",
+            options=[
+                ft.DropdownOption(key=key, text=text) for key, text in (
+                    ("1280x720", "1280 x 720 (HD)"),
+                    ("1920x1080", "1920 x 1080 (Full HD)"),
+                    ("3840x2160", "3840 x 2160 (4K)"),
+                    ("7680x4320", "7680 x 4320 (8K)"),
+                )
+            ],
+            value="1920x1080",
+            text_style=ft.TextStyle(weight=ft.FontWeight.BOLD),
+        )
+
+        # Called when cancel is clicked
+        async def _close_dialog(e):
+            dlg.open = False
+            self.p.update()
+
+        # Called when export is clicked
+        async def _export(e):
+            dlg.open = False
+            self.p.update()
+
+            width, height = (int(value) for value in (size_dropdown.value or "1920x1080").split("x"))
+
+            file_path = await ft.FilePicker().save_file(
+                dialog_title=f"Export {self.title}",
+                file_name=f"{self.title}.png",
+                allowed_extensions=["png", "jpg", "jpeg", "svg"],
+            )
+
+            # Cancelled
+            if not file_path:
+                return
+
+            # Default to a PNG if no format was picked
+            if os.path.splitext(file_path)[1].lower() not in (".png", ".jpg", ".jpeg", ".svg"):
+                file_path += ".png"
+
+            self.export_canvas(file_path, width, height)
+
+        dlg = ft.AlertDialog(
+            title=ft.Text(f"Export {self.title}", weight=ft.FontWeight.BOLD),
+            content=size_dropdown,
+            actions=[
+                ft.TextButton("Cancel", on_click=_close_dialog, style=ft.ButtonStyle(color=ft.Colors.ERROR)),
+                ft.TextButton("Export", on_click=_export),
+            ],
+        )
+
+        dlg.open = True
+        self.p.show_dialog(dlg)
+
+    # Called when exporting our canvas to an image. Format comes from the file path (.png, .jpg, or .svg)
+    def export_canvas(self, file_path: str, desired_width: int = 1920, desired_height: int = 1080):
+        """Exports the canvas as an image at desired size, fit and centered around everything drawn. Renders on a background thread."""
+
         # Compute bounding box from all coordinates
         min_x, min_y, max_x, max_y = float('inf'), float('inf'), float('-inf'), float('-inf')
-        
+
         # Check points
-        for point in shapes.get('points', []):
+        for point in self.points:
             px, py = point[0], point[1]
             min_x = min(min_x, px)
             min_y = min(min_y, py)
             max_x = max(max_x, px)
             max_y = max(max_y, py)
-        
-        # Check paths
-        for path in shapes.get('paths', []):
-            for element in path.get('elements', []):
-                if 'x' in element and 'y' in element:
-                    min_x = min(min_x, element['x'])
-                    min_y = min(min_y, element['y'])
-                    max_x = max(max_x, element['x'])
-                    max_y = max(max_y, element['y'])
-        
+
+        # Check paths. Our spatial index already knows their bounds
+        path_box = self.spatial_index.bounds()
+        if path_box is not None:
+            min_x = min(min_x, path_box[0])
+            min_y = min(min_y, path_box[1])
+            max_x = max(max_x, path_box[2])
+            max_y = max(max_y, path_box[3])
+
         # If no shapes, use defaults
         if min_x == float('inf'):
             min_x, min_y, max_x, max_y = 0, 0, desired_width, desired_height
-        
+
         # Calculate original bounds
         orig_width = max_x - min_x
         orig_height = max_y - min_y
-        
+
         # Avoid division by zero
         if orig_width == 0:
             orig_width = 1
         if orig_height == 0:
             orig_height = 1
-        
-        # Scale factor to fit desired size (maintain aspect ratio or stretch as needed)
+
+        # Scale factor to fit desired size without cropping
         scale_x = desired_width / orig_width
         scale_y = desired_height / orig_height
-        scale = min(scale_x, scale_y)  # To fit without cropping; use max for stretching
-        
-        # Create image at desired size
-        #img = Image.new("RGBA", (desired_width, desired_height), (255, 255, 255, 0))
-        #draw = ImageDraw.Draw(img)
-        
-        # Render shapes, scaled and translated
-        offset_x = (desired_width - orig_width * scale) / 2  # Center horizontally
-        offset_y = (desired_height - orig_height * scale) / 2  # Center vertically
-        
-        # Render points
-        for point in shapes.get('points', []):
-            px, py, point_mode, paint_settings = point
-            scaled_x = (px - min_x) * scale + offset_x
-            scaled_y = (py - min_y) * scale + offset_y
-            # Draw as circle (adapt for point_mode)
-            #draw.ellipse((scaled_x-2, scaled_y-2, scaled_x+2, scaled_y+2), fill=paint_settings.get('color', 'black'))
-        
-        # Render paths (simplified; full path rendering needs more logic for curves)
-        for path in shapes.get('paths', []):
-            paint_settings = path.get('paint', {})
-            points = []
-            for element in path.get('elements', []):
-                if element['type'] in ['moveto', 'lineto']:
-                    scaled_x = (element['x'] - min_x) * scale + offset_x
-                    scaled_y = (element['y'] - min_y) * scale + offset_y
-                    points.append((scaled_x, scaled_y))
-            #if points:
-                #draw.line(points, fill=paint_settings.get('color', 'black'), width=2)
-        
-        #img.save(os.path.join(self.directory_path, filename))
-        self.page.open(Snack_Bar(f"Canvas exported to {filename} at {desired_width}x{desired_height}"))
-        self.page.update()
+        scale = min(scale_x, scale_y)
+
+        # Center our drawing, by moving where our image starts on our canvas
+        offset_x = (desired_width - orig_width * scale) / 2
+        offset_y = (desired_height - orig_height * scale) / 2
+        origin_x = min_x - offset_x / scale
+        origin_y = min_y - offset_y / scale
+
+        background = self.data['canvas'].get('bgcolor', {}).get('color', None)
+
+        # Copy our lists so our export never sees strokes drawn while its running
+        Thread(
+            target=self._export_canvas,
+            args=(file_path, list(self.paths), list(self.points), desired_width, desired_height, origin_x, origin_y, scale, background),
+            daemon=True,
+        ).start()
+
+    # Called on our export thread
+    def _export_canvas(self, file_path: str, paths: list, points: list, width: int, height: int, origin_x: float, origin_y: float, scale: float, background: str):
+        ''' Renders and writes our export, then lets the user know '''
+
+        from handlers.canvas_export import export_drawing
+
+        try:
+            export_drawing(file_path, paths, points, width, height, origin_x, origin_y, scale, background=background)
+            message = f"Canvas exported to {os.path.basename(file_path)} at {width}x{height}"
+
+        except Exception as e:
+            print(f"Error exporting canvas {self.title}: {e}")
+            message = f"Error exporting canvas: {e}"
+
+        # Let the user know from the UI thread
+        self.p.run_task(self._show_export_message, message)
+
+    # Called on the UI thread once our export is done
+    async def _show_export_message(self, message: str):
+        self.p.open(Snack_Bar(message))
+        self.p.update()
+
+    # Called by our story when we've been hidden a while
+    def release_ui(self):
+        ''' Drops our built controls and our loaded drawing. Both load again next time we're shown '''
+
+        if self.visible or not self.is_built:
+            return
+
+        # Make sure any erasing is saved before we drop our paths
+        self._save_erased_paths()
+
+        super().release_ui()
+
+        self.canvas_loaded = False
+        self.paths, self.points = [], []
+        self.path_shapes, self.point_shapes = [], []
+        self.spatial_index.clear()
+        self.path_ids = []
+        self._visible_path_ids = None
+        self.selected_path_ids.clear()
+        self.selection_shapes = []
+
+        # Our canvas controls are rebuilt too, so our tiles get set up under our new canvas when we load again
+        self.canvas = self.canvas_container = self.header = self.interactive_viewer = self.delete_selection_button = None
+        self.tile_layer = self.canvas_stack = None
+        self._untiled_shapes = []
+        self.use_tiles = False
 
     # Called when we need to rebuild out timeline UI
     def reload_widget(self):       
         ''' Rebuilds/reloads our map UI '''
 
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
+
+        # Build our UI the first time we're shown
+        if self.canvas is None:
+            self._build_canvas_ui()
+
+        # Load our drawing the first time we're shown
+        if not self.canvas_loaded:
+            self.load_canvas()
+
         # Rebuild out tab to reflect any changes
         self.reload_tab()
 
-        self.canvas_container.content = self.canvas
+        self.canvas_container.content = self.canvas_stack if self.use_tiles else self.canvas
         
 
         self.canvas_container.image = ft.DecorationImage(self.data.get('canvas_meta', {}).get('bgimage_path', ""), fit=ft.BoxFit.COVER) if self.data['canvas_meta'].get('bgimage_path', "") != "" else None
@@ -591,3 +1600,71 @@ class Canvas(Widget):
         self._render_widget()
 
 
+def benchmark(stroke_lengths: tuple = (50, 200, 1000), events_per_second: int = 240, frames_per_second: int = 60) -> list:
+    ''' Draws freehand strokes and fills through our drawing handlers, with a drag event every 1 / events_per_second.
+    Compares sending on every drag event with sending once per frame.
+    Returns (style, drag events, per frame, updates sent, bytes sent, updates/s, ms of our own work per stroke) '''
+    import asyncio
+    from types import SimpleNamespace
+
+    # Borrow just our drawing handlers, so we don't need a page or a story to drive them
+    class Bench_Canvas:
+        start_drawing = Canvas.start_drawing
+        is_drawing = Canvas.is_drawing
+        _send_frame = Canvas._send_frame
+        _finish_stroke = Canvas._finish_stroke
+        _estimate_bytes = Canvas._estimate_bytes
+        _remove_shapes = Canvas._remove_shapes
+        _selecting_enabled = Canvas._selecting_enabled
+        _erasing_objects_enabled = Canvas._erasing_objects_enabled
+
+        def __init__(self, style: str, frame_interval: float):
+            self.story = SimpleNamespace(data={'paint_settings': {'color': "primary", 'stroke_width': 3, 'style': style}, 'canvas_settings': {}})
+            self.p = None
+            self.canvas = SimpleNamespace(shapes=[], page=None, update=lambda: None)
+            self.state = State()
+            self.min_segment_dist = 3.0
+            self.frame_interval = frame_interval
+            self._is_selecting = False
+            self._is_erasing_objects = False
+            self._untiled_shapes = []
+            self.draw_stats = {'strokes': 0, 'updates': 0, 'bytes_sent': 0, 'drawing_time': 0.0}
+
+    # Our drag events come in at a steady rate, so we run our own clock instead of waiting on the real one
+    clock = [0.0]
+    real_perf_counter = time.perf_counter
+    time.perf_counter = lambda: clock[0]
+    results = []
+
+    async def draw(bench: Bench_Canvas, event_count: int):
+        await bench.start_drawing(SimpleNamespace(local_x=100.0, local_y=100.0))
+        for i in range(1, event_count):
+            clock[0] += 1 / events_per_second
+            await bench.is_drawing(SimpleNamespace(local_x=100.0 + i * 4, local_y=100.0 + math.sin(i / 5) * 20))
+        bench._finish_stroke()
+
+    try:
+        for style in ("stroke", "fill"):
+            for event_count in stroke_lengths:
+                for per_frame in (False, True):
+                    bench = Bench_Canvas(style, 1 / frames_per_second if per_frame else 0.0)
+
+                    start = real_perf_counter()
+                    asyncio.run(draw(bench, event_count))
+                    work_time = (real_perf_counter() - start) * 1000
+
+                    updates = bench.draw_stats['updates']
+                    bytes_sent = bench.draw_stats['bytes_sent']
+                    updates_per_second = updates / max(bench.draw_stats['drawing_time'], 0.001)
+
+                    results.append((style, event_count, per_frame, updates, bytes_sent, updates_per_second, work_time))
+                    print(f"{style:>6} {event_count:>5} events   {'per frame' if per_frame else 'per event':>9}   {updates:>5} updates   {bytes_sent:>10} bytes   {updates_per_second:6.0f} updates/s   {work_time:8.3f} ms")
+
+    finally:
+        time.perf_counter = real_perf_counter
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
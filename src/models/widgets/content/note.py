@@ -80,6 +80,10 @@ class Note(Widget):
     def reload_widget(self):
         ''' Reloads/Rebuilds our widget based on current data '''
 
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
+
         # Rebuild out tab to reflect any changes
         self.reload_tab()
         
@@ -375,6 +375,9 @@ class Timeline(Widget):
 
     # Called when we need to rebuild out timeline UI
     def reload_widget(self):
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
 
         # Rebuild our tab to reflect any changes
         self.reload_tab()
@@ -166,6 +166,10 @@ class Map(Widget):
     def reload_widget(self):       
         ''' Rebuilds/reloads our map UI '''
 
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
+
         # Rebuild out tab to reflect any changes
         self.reload_tab()
 
@@ -129,6 +129,10 @@ class World_Building(Widget):
     # Called to reload our widget UI
     def reload_widget(self):
         ''' Reloads our world building widget '''
+
+        # Hidden widgets don't build their UI until they are first shown
+        if not self.should_build():
+            return
         
 
         self.body_container.content = ft.Text("Hellow from World Building Widget")
@@ -2,6 +2,7 @@ import flet as ft
 from models.views.story import Story
 import os
 import json
+from handlers.story_paths import widget_key
 from styles.menu_option_style import Menu_Option_Style
 from styles.colors import colors
 
@@ -19,6 +20,7 @@ class Tree_View_Directory(ft.GestureDetector):
         color: str = "primary",                                 # Color of the folder icon
         father: 'Tree_View_Directory' = None,                   # Optional parent directory tile, if there is one
         additional_menu_options: list[ft.Control] = None,       # Additional menu options when right clicking a category, depending on the rail
+        additional_file_menu_options: list[ft.Control] = None,  # Menu options for the files inside of us, used when we build our children
     ):
         
         # Reference for all our passed in data
@@ -31,6 +33,13 @@ class Tree_View_Directory(ft.GestureDetector):
         self.is_expanded = is_expanded  
         self.rail = rail
         self.additional_menu_options = additional_menu_options
+        self.additional_file_menu_options = additional_file_menu_options
+
+        # Our child tiles and files are only built while we're expanded, so big stories don't build thousands of hidden controls
+        self.children_loaded: bool = False
+
+        # Most files we show before a 'show more' button. None uses the default page size
+        self.file_limit: int = None
 
         # State tracking variables
         self.are_submitting = False
@@ -145,6 +154,12 @@ class Tree_View_Directory(ft.GestureDetector):
 
         self.is_expanded = not self.is_expanded
 
+        # Build our children when we open, and drop them when we close
+        if self.is_expanded:
+            self.load_children()
+        else:
+            self.unload_children()
+
         self.story.change_folder_data(
             full_path=self.full_path,
             key='is_expanded',
@@ -168,6 +183,50 @@ class Tree_View_Directory(ft.GestureDetector):
         self.is_focused = True
         self.refresh_expansion_tile()
 
+    # Called when we're expanded
+    def load_children(self):
+        ''' Builds the tiles and items for everything inside of us, from our story tree '''
+        from handlers.tree_view import load_directory_data
+
+        if self.children_loaded:
+            return
+
+        self.children_loaded = True
+
+        load_directory_data(
+            page=self.p,
+            story=self.story,
+            directory=self.full_path,
+            rail=self.rail,
+            dir_dropdown=self,
+            additional_directory_menu_options=self.additional_menu_options,
+            additional_file_menu_options=self.additional_file_menu_options,
+        )
+
+    # Called when we're collapsed
+    def unload_children(self):
+        ''' Drops everything inside of us so hidden controls don't stay around '''
+
+        if not self.children_loaded:
+            return
+
+        # Let our rail forget the nodes we're dropping
+        if hasattr(self.rail, "forget_nodes"):
+            self.rail.forget_nodes(self, include_tile=False)
+
+        self.expansion_tile.controls = [self.new_item_textfield]
+        self.children_loaded = False
+
+    # Called by our 'show more' button
+    def show_more_files(self):
+        ''' Shows another page of our files '''
+        from handlers.tree_view import FILE_PAGE_SIZE
+
+        self.file_limit = (self.file_limit or FILE_PAGE_SIZE) + FILE_PAGE_SIZE
+        self.unload_children()
+        self.load_children()
+        self.expansion_tile.update()
+
     def refresh_expansion_tile(self):
         if self.is_focused:
             self.expansion_tile.bgcolor = ft.Colors.with_opacity(.1, "primary")
@@ -259,15 +318,12 @@ class Tree_View_Directory(ft.GestureDetector):
         # Grab out title from the textfield, and set our new key to compare
         title = e.control.value
 
-        # Generate our new key to compare. Requires normalization
-        nk = self.full_path + "\\" + title
-        new_key = os.path.normcase(os.path.normpath(nk))
+        # Generate our new key to compare. Our folder tree normalizes it for us
+        nk = widget_key(self.full_path, title)
 
-        # Compare all our folders that would be inside of this folder, and check for uniqueness
-        for key in self.story.data['folders'].keys():
-            if os.path.normcase(os.path.normpath(key)) == new_key and title != "":
-                self.item_is_unique = False
-                break
+        # Check if a folder with this name is already inside of this folder
+        if title != "" and self.story.story_tree.get_folder(nk) is not None:
+            self.item_is_unique = False
             
         # If we are NOT unique, show our error text
         if not self.item_is_unique:
@@ -288,16 +344,12 @@ class Tree_View_Directory(ft.GestureDetector):
         # Grab out title from the textfield, and set our new key to compare
         title = e.control.value
 
-        # Generate our new key to compare. Requires normalization
-        nk = self.full_path + "\\" + title
-        new_key = os.path.normcase(os.path.normpath(nk))
+        # Generate our new key to compare. Our registry normalizes it for us
+        nk = widget_key(self.full_path, title)
 
         # Check our chapters
-        for key in self.story.chapters.keys():
-            
-            if os.path.normcase(os.path.normpath(key)) == new_key and title != "":
-                self.item_is_unique = False
-                break
+        if title != "" and self.story.registry.get(nk, "chapter") is not None:
+            self.item_is_unique = False
 
         # If we are NOT unique, show our error text
         if not self.item_is_unique:
@@ -317,16 +369,12 @@ class Tree_View_Directory(ft.GestureDetector):
         # Grab out title from the textfield, and set our new key to compare
         title = e.control.value
 
-        # Generate our new key to compare. Requires normalization
-        nk = self.full_path + "\\" + title
-        new_key = os.path.normcase(os.path.normpath(nk))
+        # Generate our new key to compare. Our registry normalizes it for us
+        nk = widget_key(self.full_path, title)
 
-        # Check our chapters
-        for key in self.story.notes.keys():
-            
-            if os.path.normcase(os.path.normpath(key)) == new_key and title != "":
-                self.item_is_unique = False
-                break
+        # Check our notes
+        if title != "" and self.story.registry.get(nk, "note") is not None:
+            self.item_is_unique = False
 
         # If we are NOT unique, show our error text
         if not self.item_is_unique:
@@ -346,16 +394,12 @@ class Tree_View_Directory(ft.GestureDetector):
         # Grab out title from the textfield, and set our new key to compare
         title = e.control.value
 
-        # Generate our new key to compare. Requires normalization
-        nk = self.full_path + "\\" + title
-        new_key = os.path.normcase(os.path.normpath(nk))
+        # Generate our new key to compare. Our registry normalizes it for us
+        nk = widget_key(self.full_path, title)
 
-        # Check our chapters
-        for key in self.story.characters.keys():
-            
-            if os.path.normcase(os.path.normpath(key)) == new_key and title != "":
-                self.item_is_unique = False
-                break
+        # Check our characters
+        if title != "" and self.story.registry.get(nk, "character") is not None:
+            self.item_is_unique = False
 
         # If we are NOT unique, show our error text
         if not self.item_is_unique:
@@ -374,16 +418,12 @@ class Tree_View_Directory(ft.GestureDetector):
         # Grab out title from the textfield, and set our new key to compare
         title = e.control.value
 
-        # Generate our new key to compare. Requires normalization
-        nk = self.full_path + "\\" + title
-        new_key = os.path.normcase(os.path.normpath(nk))
+        # Generate our new key to compare. Our registry normalizes it for us
+        nk = widget_key(self.full_path, title)
 
-        # Check our chapters
-        for key in self.story.maps.keys():
-            
-            if os.path.normcase(os.path.normpath(key)) == new_key and title != "":
-                self.item_is_unique = False
-                break
+        # Check our maps
+        if title != "" and self.story.registry.get(nk, "map") is not None:
+            self.item_is_unique = False
 
         # If we are NOT unique, show our error text
         if not self.item_is_unique:
@@ -404,10 +444,11 @@ class Tree_View_Directory(ft.GestureDetector):
 
         # If it is, call the rename function. It will do everything else
         if self.item_is_unique:
-            self.story.create_folder(
-                directory_path=self.full_path,
-                name=name,
-            )
+            with self.story.batch():
+                self.story.create_folder(
+                    directory_path=self.full_path,
+                    name=name,
+                )
             
         # Otherwise make sure we show our error
         else:
@@ -423,10 +464,11 @@ class Tree_View_Directory(ft.GestureDetector):
 
         # If it is, call the rename function. It will do everything else
         if self.item_is_unique:
-            self.story.create_chapter(
-                directory_path=self.full_path,
-                title=title,
-            )
+            with self.story.batch():
+                self.story.create_chapter(
+                    directory_path=self.full_path,
+                    title=title,
+                )
             
         # Otherwise make sure we show our error
         else:
@@ -442,10 +484,11 @@ class Tree_View_Directory(ft.GestureDetector):
 
         # If it is, call the rename function. It will do everything else
         if self.item_is_unique:
-            self.story.create_note(
-                directory_path=self.full_path,
-                title=title,
-            )
+            with self.story.batch():
+                self.story.create_note(
+                    directory_path=self.full_path,
+                    title=title,
+                )
             
         # Otherwise make sure we show our error
         else:
@@ -461,10 +504,11 @@ class Tree_View_Directory(ft.GestureDetector):
 
         # If it is, call the rename function. It will do everything else
         if self.item_is_unique:
-            self.story.create_character(
-                directory_path=self.full_path,
-                title=title,
-            )
+            with self.story.batch():
+                self.story.create_character(
+                    directory_path=self.full_path,
+                    title=title,
+                )
             
         # Otherwise make sure we show our error
         else:
@@ -480,10 +524,11 @@ class Tree_View_Directory(ft.GestureDetector):
 
         # If it is, call the rename function. It will do everything else
         if self.item_is_unique:
-            self.story.create_map(
-                directory_path=self.full_path,
-                title=title,
-            )
+            with self.story.batch():
+                self.story.create_map(
+                    directory_path=self.full_path,
+                    title=title,
+                )
             
         # Otherwise make sure we show our error
         else:
@@ -513,7 +558,7 @@ class Tree_View_Directory(ft.GestureDetector):
             # Otherwise we're not submitting (just clicking off the textbox), so we cancel the rename
             else:
 
-                self.story.active_rail.content.reload_rail()
+                self.story.update_rail('refresh_folder', self.full_path)
                 
 
         # Called everytime a change in textbox occurs
@@ -530,16 +575,13 @@ class Tree_View_Directory(ft.GestureDetector):
             self.is_unique = True
         
 
-            for key in self.story.data['folders'].keys():
-
-                # If there is no change, skip the checks
-                if new_name.capitalize() == self.title:
-                    break
+            # If there is no change, skip the checks
+            if new_name.capitalize() != self.title:
 
                 # Give us our would-be path to compare
-                nk = self.full_path[:self.full_path.rfind("\\")+1] + new_name
-                
-                if os.path.normcase(os.path.normpath(key)) == os.path.normcase(os.path.normpath(nk)):
+                nk = os.path.join(os.path.dirname(self.full_path), new_name)
+
+                if self.story.story_tree.get_folder(nk) is not None:
                     self.is_unique = False
            
 
@@ -567,15 +609,15 @@ class Tree_View_Directory(ft.GestureDetector):
             # If it is, call the rename function. It will do everything else
             if self.is_unique:
 
-                new_path = self.full_path[:self.full_path.rfind("\\")+1] + new_name
+                new_path = os.path.join(os.path.dirname(self.full_path), new_name)
                 
                 self.story.rename_folder(
                     old_path=self.full_path,
                     new_path=new_path
                 )
 
-
-                self.story.active_rail.content.reload_rail()
+                # Swap just this folder on our rail
+                self.story.update_rail('rename_folder', self.full_path, new_path)
                 
                 
             # Otherwise make sure we show our error
@@ -617,7 +659,7 @@ class Tree_View_Directory(ft.GestureDetector):
             self.color = color
             
             # Change our icon to match, apply the update
-            self.story.active_rail.content.reload_rail()
+            self.story.update_rail('recolor_folder', self.full_path)
             #self.close_menu(None)      # Auto closing menu works, but has a grey screen bug
 
         # List for our colors when formatted
@@ -674,19 +716,15 @@ class Tree_View_Directory(ft.GestureDetector):
         # Grab our key and set the widget
         widget_key = draggable.data
 
-        widget = None
-
-        for w in self.story.widgets:
-            if w.data.get('key', "") == widget_key:
-                widget = w
-                break
+        widget = self.story.registry.get(widget_key)
 
         if widget is None:
             print("Error: Widget not found for drag accept")
             return
 
-        # Call the move file using the new directory path
-        widget.move_file(new_directory=self.full_path)
+        # Call the move file using the new directory path. Batched so our saves and rail changes apply once
+        with self.story.batch():
+            widget.move_file(new_directory=self.full_path)
 
 
         
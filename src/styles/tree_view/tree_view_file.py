@@ -54,8 +54,8 @@ class Tree_View_File(ft.GestureDetector):
             mouse_cursor = ft.MouseCursor.CLICK,
         )
 
-
-        self.reload()
+        # Not on the page yet, so whoever adds us applies the update
+        self.reload(update=False)
     
     # Called when this item is right clicked
     def get_menu_options(self) -> list[ft.Control]:
@@ -155,8 +155,8 @@ class Tree_View_File(ft.GestureDetector):
             # Otherwise we're not submitting (just clicking off the textbox), so we cancel the rename
             else:
 
-                self.reload()
-                self.widget.p.update()
+                self.reload(update=False)
+                self.update()
 
         # Called everytime a change in textbox occurs
         def _name_check(e):
@@ -175,32 +175,11 @@ class Tree_View_File(ft.GestureDetector):
             is_unique = True
 
 
-            # Check our widgets tag, and then check for uniqueness accordingly
+            # Check for other widgets with our tag and this name
             if tag is not None:
-
-                # Chapters check 
-                if tag == "chapter":
-                    for chapter in self.widget.story.chapters.values():
-                        if chapter.title.lower() == name and chapter.title.lower() != current_name:
-                            is_unique = False
-
-                # Notes
-                elif tag == "note":
-                    for note in self.widget.story.notes.values():
-                        if note.title.lower() == name and note.title.lower() != current_name:
-                            is_unique = False
-
-                # Characters
-                elif tag == "character":
-                    for character in self.widget.story.characters.values():
-                        if character.title.lower() == name and character.title.lower() != current_name:
-                            is_unique = False
-
-                # Maps
-                elif tag == "map":
-                    for map_ in self.widget.story.maps.values():
-                        if map_.title.lower() == name and map_.title.lower() != current_name:
-                            is_unique = False
+                for widget in self.widget.story.registry.with_title(name, tag):
+                    if widget.title.lower() != current_name:
+                        is_unique = False
 
             # Give us our error text if not unique
             if not is_unique:
@@ -267,8 +246,9 @@ class Tree_View_File(ft.GestureDetector):
             self.widget.change_data(**{'color': color})
             self.icon_color = color
             
-            # Change our icon to match, apply the update
-            self.reload()
+            # Change our icon to match, and only update ourselves
+            self.reload(update=False)
+            self.update()
             self.widget.reload_widget()
             self.widget.story.workspace.reload_workspace()
 
@@ -313,7 +293,7 @@ class Tree_View_File(ft.GestureDetector):
 
 
     # Called to reload our tree view file display
-    def reload(self):
+    def reload(self, update: bool = True):
 
         # If dir dropdown is not None, insert indentation icon ??
 
@@ -341,5 +321,6 @@ class Tree_View_File(ft.GestureDetector):
         # If dir dropdown is not None, insert indentation icon ??
         #ft.Icon(ft.Icons.HORIZONTAL_RULE, rotate=ft.Rotate(math.pi/2)),
 
-        self.widget.p.update()
+        if update:
+            self.widget.p.update()
 
@@ -16,9 +16,37 @@ import asyncio
 def create_menu_bar(page: ft.Page, story: Story = None) -> ft.Container:
 
     
-    def handle_delete_click(e):
-        # Should pop open dialog to confirm deletion, warning that it cannot be undone
-        pass
+    # Called when file -> delete story is clicked
+    async def handle_delete_click(e):
+        ''' Opens a dialog to confirm deleting our story, since it cannot be undone '''
+
+        # Nothing to delete from our home view
+        if story is None:
+            return
+
+        async def _close_dialog(e):
+            dlg.open = False
+            page.update()
+
+        async def _delete_story(e):
+            dlg.open = False
+            page.update()
+            await app.delete_story(story, page)
+
+        dlg = ft.AlertDialog(
+            title=ft.Text(
+                f"Delete {story.title}?",
+                color=ft.Colors.ON_SURFACE,
+                weight=ft.FontWeight.BOLD,
+            ),
+            content=ft.Text("This deletes the story and everything in it. It cannot be undone."),
+            actions=[
+                ft.TextButton("Cancel", on_click=_close_dialog),
+                ft.TextButton("Delete", on_click=_delete_story, style=ft.ButtonStyle(color=ft.Colors.ERROR)),
+            ]
+        )
+
+        page.show_dialog(dlg)
 
 
     # Called when file -> new is clicked
@@ -47,8 +75,8 @@ def create_menu_bar(page: ft.Page, story: Story = None) -> ft.Container:
 
             print(title)
 
-            for story in app.stories.values():
-                if story.title == title:
+            for entry in app.story_catalog.entries.values():
+                if entry['title'] == title:
                     is_unique = False
                     break
 
@@ -152,9 +180,9 @@ def create_menu_bar(page: ft.Page, story: Story = None) -> ft.Container:
             )
 
             # Use something better than radio in future, but for now this works
-            for story in app.stories.values():
+            for entry in app.story_catalog.entries.values():
                 stories.append(
-                    ft.Radio(expand=False, value=story.title, label=story.title, label_style=style)
+                    ft.Radio(expand=False, value=entry['title'], label=entry['title'], label_style=style)
                 )
 
             # Return our list of stories
@@ -168,8 +196,8 @@ def create_menu_bar(page: ft.Page, story: Story = None) -> ft.Container:
 
             if selected_story is not None:
                 print("Opening story: ", selected_story)
-                await page.push_route(app.stories[selected_story].route)
-                app.settings.story = app.stories[selected_story]  # Gives our settings widget the story reference it needs
+                # Route change builds the story (if needed) and gives our settings widget the story reference it needs
+                await page.push_route(app.story_catalog.get_entry_by_title(selected_story)['route'])
                 
                 dlg.open = False
                 page.update()
@@ -4,7 +4,6 @@ import flet as ft
 from models.views.story import Story
 from ui.rails.rail import Rail
 from styles.menu_option_style import Menu_Option_Style
-import math
 #from flet_contrib.color_picker import ColorPicker
 from models.app import app
 from handlers.new_canvas_alert_dlg import new_canvas_alert_dlg
@@ -190,6 +189,22 @@ class Canvas_Rail(Rail):
             self.story.data['canvas_settings']['erase_mode'] = e.control.value    # Update if we're in erase mode or not
             self.story.save_dict()
 
+        # Called when changing if erase mode removes whole strokes
+        def _paint_erase_objects_changed(e):
+            self.story.data['canvas_settings']['erase_objects'] = e.control.value
+            self.story.save_dict()
+
+        # Called when changing select mode
+        def _select_mode_changed(e):
+            self.story.data['canvas_settings']['select_mode'] = e.control.value
+            self.story.save_dict()
+
+            # Leaving select mode drops whatever our canvases had selected
+            if not e.control.value:
+                for widget in self.story.widgets:
+                    if widget.data.get('tag', None) == "canvas":
+                        widget.clear_selection()
+
         # Called when changing paint dash pattern usage
         def _paint_dash_pattern_changed(e):
             if e.control.value:   # If checked, set a default dash pattern
@@ -286,6 +301,18 @@ class Canvas_Rail(Rail):
             on_change=_paint_erase_mode_changed, value=self.story.data.get('canvas_settings', {}).get('erase_mode', False)
         )
 
+        # If erase mode removes whole strokes instead of painting over them
+        paint_erase_objects = ft.Checkbox(
+            tooltip="Erase whole strokes you touch instead of painting over them.",
+            on_change=_paint_erase_objects_changed, value=self.story.data.get('canvas_settings', {}).get('erase_objects', False)
+        )
+
+        # If tapping and dragging selects strokes instead of drawing
+        select_mode = ft.Checkbox(
+            tooltip="Tap or drag over strokes to select them instead of drawing. Selected strokes can be deleted from the canvas header.",
+            on_change=_select_mode_changed, value=self.story.data.get('canvas_settings', {}).get('select_mode', False)
+        )
+
         # Paint style (Stroke, dash, fill, etc.)
         if self.story.data.get('paint_settings', {}).get('style', 'stroke') == 'stroke':
             paint_style_icon = ft.Icons.BRUSH_OUTLINED
@@ -429,6 +456,8 @@ class Canvas_Rail(Rail):
                 ft.Row([ft.Text("Size", theme_style=ft.TextThemeStyle.LABEL_LARGE), paint_width]),
                 ft.Row([ft.Text("Opacity", theme_style=ft.TextThemeStyle.LABEL_LARGE), paint_opacity]),
                 ft.Row([ft.Text("Erase Mode", theme_style=ft.TextThemeStyle.LABEL_LARGE), paint_erase_mode]),
+                ft.Row([ft.Text("Erase Whole Strokes", theme_style=ft.TextThemeStyle.LABEL_LARGE), paint_erase_objects]),
+                ft.Row([ft.Text("Select Strokes", theme_style=ft.TextThemeStyle.LABEL_LARGE), select_mode]),
                 ft.Row([ft.Text("Stroke Cap Shape", theme_style=ft.TextThemeStyle.LABEL_LARGE), paint_stroke_cap]),
                 ft.Container(height=10),   # Spacer
                 ft.Row([ft.Text("Stroke Join Shape", theme_style=ft.TextThemeStyle.LABEL_LARGE), paint_stroke_join]),
@@ -470,4 +499,4 @@ class Canvas_Rail(Rail):
         )
 
         # Apply the update
-        self.p.update()
\ No newline at end of file
+        self.update_page()
\ No newline at end of file
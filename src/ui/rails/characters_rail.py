@@ -102,9 +102,9 @@ class Characters_Rail(Rail):
         
                  
 
-        # Build the content of our rail
-        content = ft.Column(
-            scroll=ft.ScrollMode.AUTO,
+        # Build the content of our rail. A list view only lays out the rows we can see, and fills the rest of our rail
+        content = ft.ListView(
+            expand=True,
             spacing=0,
             controls=[]
         )
@@ -123,8 +123,6 @@ class Characters_Rail(Rail):
         # Append our hidden textfield for creating new items
         content.controls.append(self.new_item_textfield)
 
-        # Add container to the bottom to make sure the drag target and gesture detector fill the rest of the space
-        content.controls.append(ft.Container(expand=True))
 
         # Wrap the gd in a drag target so we can move characters here
         dt = ft.DragTarget(
@@ -152,4 +150,4 @@ class Characters_Rail(Rail):
         )
         
         # Apply our update
-        self.p.update()
+        self.update_page()
@@ -194,9 +194,9 @@ class Content_Rail(Rail):
         )
                  
 
-        # Build the content of our rail
-        content = ft.Column(
-            scroll=ft.ScrollMode.AUTO,
+        # Build the content of our rail. A list view only lays out the rows we can see, and fills the rest of our rail
+        content = ft.ListView(
+            expand=True,
             spacing=0,
             controls=[]
         )
@@ -216,8 +216,6 @@ class Content_Rail(Rail):
         # Append our hiddent textfields for creating new categories, chapters, and notes
         content.controls.append(self.new_item_textfield)
 
-        # Add container to the bottom to make sure the drag target and gesture detector fill the rest of the space
-        content.controls.append(ft.Container(expand=True))
 
 
         # Wrap the gd in a drag target so we can move characters here
@@ -247,6 +245,6 @@ class Content_Rail(Rail):
         #self.content = content
         
         # Apply our update
-        self.p.update()
+        self.update_page()
         
 
@@ -38,6 +38,6 @@ class Planning_Rail(Rail):
         )
 
         # Apply our update
-        self.p.update()
+        self.update_page()
         
 
@@ -8,6 +8,9 @@ import json
 from models.views.story import Story
 from models.widgets.timeline import Timeline
 from styles.tree_view.tree_view_directory import Tree_View_Directory
+from styles.tree_view.tree_view_file import Tree_View_File
+from handlers.story_tree import canon_path
+from handlers.story_paths import widget_key
 
 
 class Rail(ft.Container):
@@ -60,6 +63,14 @@ class Rail(ft.Container):
         self.item_is_unique = True          # If the new category, chapter, note, etc. title is unique within its directory
         self.are_submitting = False         # If we are currently submitting this item
 
+        # Our tree view (if this rail has one), so we can update single nodes instead of reloading the whole rail
+        self.tree_column: ft.ListView = None                # List our top level tree nodes are in
+        self.directory_tiles: dict = {}                     # Directory tiles, keyed by their normalized path
+        self.file_items: dict = {}                          # File items, keyed by the id of their widget
+        self.tree_directory_menu_options: list = None       # Menu options our tree was built with, for new nodes
+        self.tree_file_menu_options: list = None
+        self.file_limit: int = None                         # Most top level files we show before a 'show more' button
+
         # Calling initial rail to reload. Child override this one
         #self.reload_rail() 
 
@@ -85,19 +96,15 @@ class Rail(ft.Container):
         # Grab our key and set the widget
         widget_key = draggable.data
 
-        widget = None
-
-        for w in self.story.widgets:
-            if w.data.get('key', "") == widget_key:
-                widget = w
-                break
+        widget = self.story.registry.get(widget_key)
 
         if widget is None:
             print("Error: Widget not found for drag accept")
             return
 
-        # Call the move file using the new directory path
-        widget.move_file(new_directory=new_directory)
+        # Call the move file using the new directory path. Batched so our saves and rail changes apply once
+        with self.story.batch():
+            widget.move_file(new_directory=new_directory)
 
         # Remove the drag targets from our workspace to clean up
         widget.story.workspace.remove_drag_targets()
@@ -130,69 +137,32 @@ class Rail(ft.Container):
         title = e.control.value
         tag = e.control.data
 
-        # Generate our new key to compare. Requires normalization
-        nk = self.directory_path + "\\" + title
-        new_key = os.path.normcase(os.path.normpath(nk))
+        # Generate our new key to compare. Our registry and folder tree normalize it for us
+        nk = widget_key(self.directory_path, title)
 
         title = title.rstrip() if title is not None else ""
 
         # Check all our folders and compare them to the new key
         if tag == "category":
-            for key in self.story.data['folders'].keys():
-                
-                # Path comparisons require normalization
-                if os.path.normcase(os.path.normpath(key)) == new_key:
-                    self.item_is_unique = False
-                
-        # Check our chapters
-        elif tag == "chapter":
-            for key in self.story.chapters.keys():
-                if os.path.normcase(os.path.normpath(key)) == new_key:
-                    self.item_is_unique = False
-
-        # Check our notes
-        elif tag == "note":
-            for key in self.story.notes.keys():
-                if os.path.normcase(os.path.normpath(key)) == new_key:
-                    self.item_is_unique = False
-
-        # Check our canvass
-        elif tag == "canvas":
-            for key in self.story.canvases.keys():
-                if os.path.normcase(os.path.normpath(key)) == new_key:
-                    self.item_is_unique = False
-
-        # Check our characters
-        elif tag == "character":
-            for key in self.story.characters.keys():
-                if os.path.normcase(os.path.normpath(key)) == new_key:
-                    self.item_is_unique = False
-
-        # Check our timelines
-        elif tag == "timeline":
-            for key in self.story.timelines.keys():
-                if os.path.normcase(os.path.normpath(key)) == new_key:
-                    self.item_is_unique = False
+            if self.story.story_tree.get_folder(nk) is not None:
+                self.item_is_unique = False
 
         # Check our plot points
         elif tag == "plot_point":
             if self.timeline is not None:
-                for key in self.timeline.plot_points.keys():
-                    if key == title.capitalize():
-                        self.item_is_unique = False
+                if title.capitalize() in self.timeline.plot_points:
+                    self.item_is_unique = False
 
         # Check our arcs
         elif tag == "arc":
             if self.timeline is not None:
-                for key in self.timeline.arcs.keys():
-                    if key == title.capitalize():
-                        self.item_is_unique = False
-
-        # Check our maps
-        elif tag == "map":
-            for key in self.story.maps.keys():
-                if os.path.normcase(os.path.normpath(key)) == new_key:
+                if title.capitalize() in self.timeline.arcs:
                     self.item_is_unique = False
+
+        # Check our widgets (chapters, notes, canvases, characters, timelines, and maps)
+        elif tag in self.story.tag_dicts:
+            if self.story.registry.get(nk, tag) is not None:
+                self.item_is_unique = False
                 
         # If we are NOT unique, show our error text
         if not self.item_is_unique:
@@ -252,54 +222,57 @@ class Rail(ft.Container):
         # If our new title unique (check from on_new_item_change), create the new item
         if self.item_is_unique:
 
-            # Check what kind of item we're creating based on textfield data
-            tag = e.control.data
+            # Creating can save, refresh our rail, and reload our workspace several times over, so do it all once
+            with self.story.batch():
+
+                # Check what kind of item we're creating based on textfield data
+                tag = e.control.data
 
-            # New categories
-            if tag == "category":
-                # Create our new category
-                self.story.create_folder(directory_path=self.directory_path, name=title)
+                # New categories
+                if tag == "category":
+                    # Create our new category
+                    self.story.create_folder(directory_path=self.directory_path, name=title)
                  
-            # New chapters
-            elif tag == "chapter":
-                self.story.create_chapter(title)
-
-            # New Notes
-            elif tag == "note":
-                self.story.create_note(title)
-
-            elif tag == "canvas":
-                self.story.create_canvas(title)
-                self.story.change_data(**{'selected_rail': 'canvas'})
-                self.story.workspaces_rail.selected_rail = "canvas"
-                self.story.workspaces_rail.reload_rail(self.story)
-                self.story.active_rail.display_active_rail(self.story)
-
-            # New Characters
-            elif tag == "character":
-                self.story.create_character(title)
-                for character in self.story.characters.values():
-                    character.reload_widget()
-
-            # New Timelines
-            elif tag == "timeline":
-                self.story.create_timeline(title)
-
-            # New plot points and arcs on timelines or arcs
-            elif tag == "plot_point":
-                if self.timeline is not None:
-                    print("Creating plot point:", title)
-                    self.timeline.create_plot_point(title)
-
-            # New arcs on timelines
-            elif tag == "arc":
-                if self.timeline is not None:
-                    print("Creating arc:", title)
-                    self.timeline.create_arc(title)
-
-            # New Maps
-            elif tag == "map":
-                self.story.create_map(title)
+                # New chapters
+                elif tag == "chapter":
+                    self.story.create_chapter(title)
+
+                # New Notes
+                elif tag == "note":
+                    self.story.create_note(title)
+
+                elif tag == "canvas":
+                    self.story.create_canvas(title)
+                    self.story.change_data(**{'selected_rail': 'canvas'})
+                    self.story.workspaces_rail.selected_rail = "canvas"
+                    self.story.workspaces_rail.reload_rail(self.story)
+                    self.story.active_rail.display_active_rail(self.story)
+
+                # New Characters
+                elif tag == "character":
+                    self.story.create_character(title)
+                    for character in self.story.characters.values():
+                        character.reload_widget()
+
+                # New Timelines
+                elif tag == "timeline":
+                    self.story.create_timeline(title)
+
+                # New plot points and arcs on timelines or arcs
+                elif tag == "plot_point":
+                    if self.timeline is not None:
+                        print("Creating plot point:", title)
+                        self.timeline.create_plot_point(title)
+
+                # New arcs on timelines
+                elif tag == "arc":
+                    if self.timeline is not None:
+                        print("Creating arc:", title)
+                        self.timeline.create_arc(title)
+
+                # New Maps
+                elif tag == "map":
+                    self.story.create_map(title)
 
     # Called when we select a new dropdown
     def refresh_buttons(self):
@@ -308,6 +281,273 @@ class Rail(ft.Container):
 
     
 
+    # Called by load_directory_data when it starts building our tree view
+    def reset_tree(self, column: ft.Column, directory_menu_options: list = None, file_menu_options: list = None):
+        ''' Forgets our old tree nodes, and tracks the new tree being built into our column '''
+
+        self.tree_column = column
+        self.directory_tiles = {}
+        self.file_items = {}
+        self.tree_directory_menu_options = directory_menu_options
+        self.tree_file_menu_options = file_menu_options
+
+    # Node level updates. Each returns True if it handled the change, or False if our story should reload the whole rail instead
+
+    # Called when a widget is created
+    def insert_widget(self, widget) -> bool:
+        ''' Adds a single widget to our tree view '''
+        from handlers.tree_view import build_file_item
+
+        if self.tree_column is None:
+            return False
+
+        # Not inside our rail, so nothing to show
+        if not self._in_tree(widget.directory_path):
+            return True
+
+        parent = self._get_parent(widget.directory_path)
+        if parent is None:
+            return False
+
+        # Folder isn't expanded, so it'll build our item when it is
+        if parent is False:
+            return True
+
+        father, controls, container = parent
+        item = build_file_item(widget, self, father=father, additional_file_menu_options=self.tree_file_menu_options)
+        self._insert_sorted(controls, item, at_start=father is None)
+        container.update()
+        return True
+
+    # Called when a widget is deleted
+    def remove_widget(self, widget) -> bool:
+        ''' Removes a single widget from our tree view '''
+
+        if self.tree_column is None:
+            return False
+
+        item = self.file_items.pop(id(widget), None)
+        if item is None:
+            return True
+
+        _, controls, container = self._get_node_parent(item.father)
+        if item in controls:
+            controls.remove(item)
+        container.update()
+        return True
+
+    # Called when a widget is moved to a new folder
+    def move_widget(self, widget) -> bool:
+        ''' Moves a single widget to its new folder in our tree view '''
+        return self.remove_widget(widget) and self.insert_widget(widget)
+
+    # Called when a widget is renamed
+    def rename_widget(self, widget) -> bool:
+        ''' Updates a single widgets title, and moves it to its new sorted spot '''
+
+        if self.tree_column is None:
+            return False
+
+        item = self.file_items.get(id(widget), None)
+        if item is None:
+            return self.insert_widget(widget)
+
+        father, controls, container = self._get_node_parent(item.father)
+        if item in controls:
+            controls.remove(item)
+
+        item.reload(update=False)
+        self._insert_sorted(controls, item, at_start=father is None)
+        container.update()
+        return True
+
+    # Called when a widgets color is changed
+    def recolor_widget(self, widget) -> bool:
+        ''' Updates a single widgets icon color '''
+
+        if self.tree_column is None:
+            return False
+
+        item = self.file_items.get(id(widget), None)
+        if item is None:
+            return True
+
+        item.icon_color = widget.data.get('color', "primary")
+        item.reload(update=False)
+        item.update()
+        return True
+
+    # Called when a folder is created
+    def insert_folder(self, full_path: str) -> bool:
+        ''' Adds a single folder (and anything already inside it) to our tree view '''
+        from handlers.tree_view import build_directory_tile
+
+        if self.tree_column is None:
+            return False
+
+        if not self._in_tree(full_path) or canon_path(full_path) in self.directory_tiles:
+            return True
+
+        parent = self._get_parent(os.path.dirname(os.path.normpath(full_path)))
+        if parent is None:
+            return False
+
+        if parent is False:
+            return True
+
+        father, controls, container = parent
+        tile = build_directory_tile(
+            page=self.p,
+            story=self.story,
+            directory=full_path,
+            rail=self,
+            father=father,
+            additional_directory_menu_options=self.tree_directory_menu_options,
+            additional_file_menu_options=self.tree_file_menu_options,
+        )
+        self._insert_sorted(controls, tile, at_start=father is None)
+        container.update()
+        return True
+
+    # Called when a folder is deleted
+    def remove_folder(self, full_path: str) -> bool:
+        ''' Removes a single folder and everything inside it from our tree view '''
+
+        if self.tree_column is None:
+            return False
+
+        tile = self.directory_tiles.get(canon_path(full_path), None)
+        if tile is None:
+            return True
+
+        self.forget_nodes(tile)
+
+        _, controls, container = self._get_node_parent(tile.father)
+        if tile in controls:
+            controls.remove(tile)
+        container.update()
+        return True
+
+    # Called when a folder is renamed
+    def rename_folder(self, old_path: str, new_path: str) -> bool:
+        ''' Swaps a single folder for one built at its new path. Only its own sub tree is rebuilt '''
+        return self.remove_folder(old_path) and self.insert_folder(new_path)
+
+    # Called when a folders color changes
+    def recolor_folder(self, full_path: str) -> bool:
+        ''' Updates a single folders icon color from our story data '''
+        return self.refresh_folder(full_path)
+
+    # Called when a folders tile needs to redraw its title (color change, cancelled rename)
+    def refresh_folder(self, full_path: str) -> bool:
+        ''' Rebuilds a single folders tile, keeping its children '''
+
+        if self.tree_column is None:
+            return False
+
+        tile = self.directory_tiles.get(canon_path(full_path), None)
+        if tile is None:
+            return True
+
+        folder_data = self.story.get_folder_data(full_path)
+        tile.color = folder_data.get('color', tile.color)
+        tile.reload()
+        tile.update()
+        return True
+
+    def _in_tree(self, path: str) -> bool:
+        ''' Returns if a path is inside the folder our rail shows '''
+        root = canon_path(self.directory_path)
+        path = canon_path(path)
+        return path == root or path.startswith(root + os.sep)
+
+    def _get_parent(self, directory_path: str):
+        ''' Returns (father tile, controls list, control to update) for the folder at a path.
+        None if its not shown, or False if its shown but collapsed (so it has no children built) '''
+
+        if canon_path(directory_path) == canon_path(self.directory_path):
+            return self._get_node_parent(None)
+
+        tile = self.directory_tiles.get(canon_path(directory_path), None)
+        if tile is None:
+            return None
+
+        if not tile.children_loaded:
+            return False
+
+        return self._get_node_parent(tile)
+
+    def _get_node_parent(self, father: Tree_View_Directory):
+        ''' Returns (father tile, controls list, control to update) for a parent tile, or our column if its None '''
+
+        if father is None:
+            return None, self.tree_column.controls, self.tree_column
+
+        return father, father.expansion_tile.controls, father.expansion_tile
+
+    def _insert_sorted(self, controls: list, node: ft.Control, at_start: bool):
+        ''' Inserts a tree node where a full rebuild would have put it. Folders first, then files, each by name '''
+
+        key = self._sort_key(node)
+        index = None
+        last_node_index = None
+
+        for i, control in enumerate(controls):
+            control_key = self._sort_key(control)
+            if control_key is None:
+                continue
+
+            last_node_index = i
+            if control_key > key:
+                index = i
+                break
+
+        # Goes after our last node. If there are none, tree nodes come before our rails own controls, and after a tiles textfield
+        if index is None:
+            if last_node_index is not None:
+                index = last_node_index + 1
+            else:
+                index = 0 if at_start else len(controls)
+
+        controls.insert(index, node)
+
+    def _sort_key(self, control: ft.Control):
+        if isinstance(control, Tree_View_Directory):
+            return (0, str(control.title).lower())
+        if isinstance(control, Tree_View_File):
+            return (1, str(control.widget.title).lower())
+        return None
+
+    # Called when tiles are removed, or collapsed and drop their children
+    def forget_nodes(self, tile: Tree_View_Directory, include_tile: bool = True):
+        ''' Unregisters every node inside a tile, and the tile itself unless told not to '''
+
+        if include_tile:
+            self.directory_tiles.pop(canon_path(tile.full_path), None)
+
+        for control in tile.expansion_tile.controls:
+            if isinstance(control, Tree_View_Directory):
+                self.forget_nodes(control)
+            elif isinstance(control, Tree_View_File):
+                self.file_items.pop(id(control.widget), None)
+
+    # Called by the 'show more' button at the bottom of our top level files
+    def show_more_files(self):
+        ''' Shows another page of our top level files '''
+        from handlers.tree_view import FILE_PAGE_SIZE
+
+        self.file_limit = (self.file_limit or FILE_PAGE_SIZE) + FILE_PAGE_SIZE
+        self.reload_rail()
+
+    # Called at the end of our reload_rail
+    def update_page(self):
+        ''' Updates our page, unless our story is in a batch that will update it once when its done '''
+
+        if self.story.story_batch.holds_page_updates:
+            return
+
+        self.p.update()
+
     # Called when changes occure that require rail to be reloaded. Should be overwritten by children
     def reload_rail(self) -> ft.Control:
         ''' Sets our rail (extended ft.Container) content and applies the page update '''
@@ -323,7 +563,7 @@ class Rail(ft.Container):
         )
 
         # Apply the update to UI
-        self.p.update()
+        self.update_page()
 
         # Return yourself as the control
         return self
\ No newline at end of file
@@ -209,7 +209,7 @@ class Timelines_Rail(Rail):
                 button.on_click = self.active_dropdown.new_item_clicked if self.active_dropdown is not None else self.new_item_clicked
     
         # Finally, update the page
-        self.p.update()
+        self.update_page()
            
 
 
@@ -343,7 +343,7 @@ class Timelines_Rail(Rail):
         self.refresh_buttons()
 
         # Apply the changes to the page
-        self.p.update()
+        self.update_page()
 
 
     
@@ -125,9 +125,9 @@ class World_Building_Rail(Rail):
             ),
         ])
                  
-        # Build the content of our rail
-        content = ft.Column(
-            scroll=ft.ScrollMode.AUTO,
+        # Build the content of our rail. A list view only lays out the rows we can see, and fills the rest of our rail
+        content = ft.ListView(
+            expand=True,
             spacing=0,
             controls=[]
         )
@@ -139,24 +139,22 @@ class World_Building_Rail(Rail):
         # Maps with sub maps (saved in their data for reference) get drop downs like categories
         
 
-        # Load our content directory data into the rail
-        #load_directory_data(
-            #page=self.p,
-            #story=self.story,
-            #directory=self.directory_path,
-            #column=content,
-            #rail=self,
-            #additional_directory_menu_options=self.get_directory_menu_options(),
-            #additional_file_menu_options=self.get_file_menu_options()
-        #)
+        # Load our maps directory data into the rail. Comes from our story tree, so no files are read
+        load_directory_data(
+            page=self.p,
+            story=self.story,
+            directory=self.directory_path,
+            column=content,
+            rail=self,
+            additional_directory_menu_options=self.get_directory_menu_options(),
+            additional_file_menu_options=self.get_file_menu_options()
+        )
 
         content.controls.append(ft.Container(height=6))
 
         # Append our hidden textfield for creating new items
         content.controls.append(self.new_item_textfield)
 
-        # Add container to the bottom to make sure the drag target and gesture detector fill the rest of the space
-        content.controls.append(ft.Container(expand=True))
 
         # Wrap the gd in a drag target so we can move characters here
         dt = ft.DragTarget(
@@ -184,7 +182,7 @@ class World_Building_Rail(Rail):
         )
         
         # Apply our update
-        self.p.update()
+        self.update_page()
 
 
         
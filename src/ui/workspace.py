@@ -9,8 +9,8 @@ import flet as ft
 from models.app import app
 from models.views.story import Story
 import json
-from styles.colors import dark_gradient
 from styles.snack_bar import Snack_Bar
+from handlers.pin_layout import PIN_LOCATIONS, plan_layout, steal_for_main, apply_layout
 
 
 # Our workspace object that is stored in our story object
@@ -104,6 +104,21 @@ class Workspace(ft.Container):
         # We use global stack like this so there is always a drag target, even if a pin is empty
         self.master_stack = ft.Stack(expand=True, controls=[self.widgets, self.pin_drag_targets])
 
+        # Our formatted pins (pins with their resizers), built once on our first reload and kept after that
+        self.formatted_top_pin: ft.Column = None
+        self.formatted_left_pin: ft.Row = None
+        self.formatted_main_pin: ft.Container = None
+        self.formatted_right_pin: ft.Row = None
+        self.formatted_bottom_pin: ft.Column = None
+
+        # Visible widgets in our main pin, and our main pin tabs
+        self.visible_main_controls: list = []
+        self.main_pin_tabs: ft.Tabs = None
+
+        # What we last sent to the page, so reloads know what changed
+        self.main_tab_state: tuple = ()
+        self.pin_visibility: dict = {}
+
 
 
         # We call this in the story build_view, since it errors out here if the object is not fully built yet
@@ -175,164 +190,116 @@ class Workspace(ft.Container):
         # Grab our key and set the widget
         widget_key = e.src.data
 
-        widget = None
-
-        for w in self.story.widgets:
-            if w.data.get('key', "") == widget_key:
-                widget = w
-                break
+        widget = self.story.registry.get(widget_key)
 
         if widget is None:
             self.p.show_dialog(Snack_Bar("Error moving widget"))
             return
 
-        old_pin_location = widget.data['pin_location']
+        # Moving pins re-saves the layout of every tab in our main pin and reloads our workspace. Batched so that all happens once
+        with self.story.batch():
 
-        # If we were dragged from the main pin and we were the active tab, set the first tab to new active
-        if old_pin_location == "main" and widget.data['is_active_tab'] == True:
+            old_pin_location = widget.data['pin_location']
 
-            # If there are other widgets in the main pin, set the first one to active tab
-            self.story.workspace.main_pin.controls[0].data['is_active_tab'] = True
-            self.story.workspace.main_pin.controls[0].save_dict()
+            # If we were dragged from the main pin and we were the active tab, set the first tab to new active
+            if old_pin_location == "main" and widget.data['is_active_tab'] == True:
+
+                # If there are other widgets in the main pin, set the first one to active tab
+                self.story.workspace.main_pin.controls[0].data['is_active_tab'] = True
+                self.story.workspace.main_pin.controls[0].save_layout()
                 
                 
 
-        # Set our objects pin location to the correct new location
-        widget.data['pin_location'] = pin_location  
+            # Set our objects pin location to the correct new location
+            widget.data['pin_location'] = pin_location  
 
-        # Even though we're not in the new pin location until we reload, we can just use the length to find our index
-        if pin_location == "top":
-            widget.data['index'] = len(self.story.workspace.top_pin.controls)
+            # Even though we're not in the new pin location until we reload, we can just use the length to find our index
+            if pin_location == "top":
+                widget.data['index'] = len(self.story.workspace.top_pin.controls)
         
-        elif pin_location == "left":
-            widget.data['index'] = len(self.story.workspace.left_pin.controls)
+            elif pin_location == "left":
+                widget.data['index'] = len(self.story.workspace.left_pin.controls)
         
-        elif pin_location == "main":
-            widget.data['index'] = len(self.story.workspace.main_pin.controls)   
+            elif pin_location == "main":
+                widget.data['index'] = len(self.story.workspace.main_pin.controls)   
 
-            # Set other tabs to inactive, and new one to active              
-            for w in self.story.workspace.main_pin.controls:
-                w.data['is_active_tab'] = False        # Deselect all other main pin widgets
+                # Set other tabs to inactive, and new one to active              
+                for w in self.story.workspace.main_pin.controls:
+                    w.data['is_active_tab'] = False        # Deselect all other main pin widgets
+                    w.save_layout()
 
-            widget.data['is_active_tab'] = True
+                widget.data['is_active_tab'] = True
 
-        elif pin_location == "right":
-            widget.data['index'] = len(self.story.workspace.right_pin.controls)
+            elif pin_location == "right":
+                widget.data['index'] = len(self.story.workspace.right_pin.controls)
 
-        elif pin_location == "bottom":
-            widget.data['index'] = len(self.story.workspace.bottom_pin.controls)
+            elif pin_location == "bottom":
+                widget.data['index'] = len(self.story.workspace.bottom_pin.controls)
 
 
         
-        # Make sure our widget is visible if it was dragged from the rail
-        if not widget.visible:
-            widget.toggle_visibility(value=True)      # This will save dict as well
-        else:
-            widget.save_dict()  
+            # Make sure our widget is visible if it was dragged from the rail
+            if not widget.visible:
+                widget.toggle_visibility(value=True)      # This will save our layout as well
+            else:
+                widget.save_layout()  
 
-        # Apply to UI
-        self.reload_workspace()
+            # Apply to UI
+            self.reload_workspace()
 
-        # Reload our widget to apply size changes that some of them need
-        widget.reload_widget()
+            # Reload our widget to apply size changes that some of them need
+            widget.reload_widget()
         
+
         print(f"{pin_location} pin accepted")
 
-    # Called when we drag a widget from one pin location to another
-    def arrange_widgets(self):
-        ''' Arranges our widgets to their correct pin locations after a change is made to their pin location.
-        Also adds widgets to their correct pin locations if they are missing from any pin location '''
+    # Called when we reload our workspace
+    def arrange_widgets(self) -> set:
+        ''' Moves our widgets into their correct pin locations with the fewest moves, and keeps their index data right.
+        Pins that already match are left alone. Returns the set of pin locations that changed '''
 
         story = self.story
         
         try:
-
-            # Clear all pin locations first
-            story.workspace.top_pin.controls.clear()
-            story.workspace.left_pin.controls.clear()
-            story.workspace.main_pin.controls.clear()
-            story.workspace.right_pin.controls.clear()
-            story.workspace.bottom_pin.controls.clear()
-
-            # Lets widgets keep their order between sessions
-            ordered_widgets = sorted(story.widgets, key=lambda w: w.data.get('index', 0))
-
-            # Go through all our widgets in the story
-            for widget in ordered_widgets:
-
-                # Check if they are visible
-                if widget.visible == True:
-
-                    # Check if widget has data and pin_location
-                    if hasattr(widget, 'data') and widget.data and 'pin_location' in widget.data:
-                        pin_location = widget.data['pin_location']
-                        
-                        # Add widget to the correct pin based on its pin_location
-                        if pin_location == "top":
-                            story.workspace.top_pin.controls.append(widget)
-                            widget.data['index'] = story.workspace.top_pin.controls.index(widget)
-                        elif pin_location == "left":
-                            story.workspace.left_pin.controls.append(widget)
-                            widget.data['index'] = story.workspace.left_pin.controls.index(widget)
-                        elif pin_location == "main":
-                            story.workspace.main_pin.controls.append(widget)
-                            widget.data['index'] = story.workspace.main_pin.controls.index(widget)
-                        elif pin_location == "right":
-                            story.workspace.right_pin.controls.append(widget)
-                            widget.data['index'] = story.workspace.right_pin.controls.index(widget)
-                        elif pin_location == "bottom":
-                            story.workspace.bottom_pin.controls.append(widget)
-                            widget.data['index'] = story.workspace.bottom_pin.controls.index(widget)
-                            
-                    else:
-                        # If no valid pin_location, default to main pin
-                        if widget not in story.workspace.main_pin.controls:
-                            print("Invalid pin location, adding to main pin")
-                            story.workspace.main_pin.controls.append(widget)
-                            
-                # Skip non visible widgets
-                else:
-                    continue
+            # Work out where every visible widget should be
+            targets = plan_layout(story.widgets)
 
             # If main pin is empty, steal one from other pins so we are always fullscreen
-            if len(story.workspace.main_pin.controls) == 0:
-
-                # Steal from left first
-                if len(story.workspace.left_pin.controls) > 0:
-                    # Copy and delete last widget in left pin
-                    widget = story.workspace.left_pin.controls.pop()
-                    story.workspace.main_pin.controls.append(widget)
-                # Right pin
-                elif len(story.workspace.right_pin.controls) > 0:
-                    widget = story.workspace.right_pin.controls.pop()
-                    story.workspace.main_pin.controls.append(widget)
-                # Top pin
-                elif len(story.workspace.top_pin.controls) > 0:
-                    widget = story.workspace.top_pin.controls.pop()
-                    story.workspace.main_pin.controls.append(widget)
-                # Bottom pin
-                elif len(story.workspace.bottom_pin.controls) > 0:
-                    widget = story.workspace.bottom_pin.controls.pop()
-                    story.workspace.main_pin.controls.append(widget)
-                else:
-                    pass
-
-                # If we stole a widget, make its data match its new location
-                if widget is not None:
-                    widget.data['pin_location'] = "main"
-                    widget.save_dict()
+            stolen_widget = steal_for_main(targets)
+
+            # If we stole a widget, make its layout match its new location
+            if stolen_widget is not None:
+                stolen_widget.data['pin_location'] = "main"
+
+            # Our index is just where we land in our pin. Only save the layout of widgets that moved
+            for controls in targets.values():
+                for index, widget in enumerate(controls):
+                    if widget.data.get('index', None) != index or widget is stolen_widget:
+                        widget.data['index'] = index
+                        widget.save_layout()
+
+            # Apply just the moves we need to our pins
+            return apply_layout(self.get_pins(), targets)
 
         except Exception as e:
             print(f"Error arranging widgets: {e}")
-
-    # Called when we need to reload our workspace content, especially after pin drags
-    def reload_workspace(self):
-        ''' Reloads our workspace content by clearing and re-adding our 5 pin locations to the master row '''
+            return set(PIN_LOCATIONS)
+
+    def get_pins(self) -> dict:
+        ''' Returns the control lists of our five pins by their location '''
+        return {
+            "top": self.top_pin.controls,
+            "left": self.left_pin.controls,
+            "main": self.main_pin.controls,
+            "right": self.right_pin.controls,
+            "bottom": self.bottom_pin.controls,
+        }
+
+    # Called the first time we reload our workspace
+    def build_layout(self):
+        ''' Builds our pin resizers and formatted pins once. Reloads only change the pins inside them, so these controls stay stable '''
         from models.widget import Widget
 
-        # Make sure our widgets are arranged correctly
-        self.arrange_widgets()
-
         # Change our cursor when we hover over a resizer (divider). Either vertical or horizontal
         def show_vertical_cursor(e: ft.HoverEvent):
             e.control.mouse_cursor = ft.MouseCursor.RESIZE_UP_DOWN
@@ -486,47 +453,71 @@ class Workspace(ft.Container):
             drag_interval=10,
         )
 
-        # Called when selected new tab in the main pin
-        def main_pin_tab_change(e: ft.ControlEvent):
-            ''' Updates the widgets data to reflect the new active tab '''
 
+        # Formatted pin locations that hold our pins, and our resizer gesture detectors.
+        # Main pin is always expanded and has no resizer, so it only needs a container we can swap its content in
+        self.formatted_top_pin = ft.Column(spacing=0, visible=False, controls=[self.top_pin, top_pin_resizer])
+        self.formatted_left_pin = ft.Row(spacing=0, visible=False, controls=[self.left_pin, left_pin_resizer]) 
+        self.formatted_right_pin = ft.Row(spacing=0, visible=False, controls=[right_pin_resizer, self.right_pin])  # Right pin formatting row
+        self.formatted_bottom_pin = ft.Column(spacing=0, visible=False, controls=[bottom_pin_resizer, self.bottom_pin])  # Bottom pin formatting column
+        self.formatted_main_pin = ft.Container(expand=True, content=ft.Container(expand=True))
 
-            # Run through our visible main pin widgets
-            for widget in visible_main_controls:
+        # Format our pins on the page
+        self.widgets.controls = [
+            self.formatted_left_pin,    # formatted left pin
+            ft.Column(
+                expand=True, spacing=0, 
+                controls=[
+                    self.formatted_top_pin,    # formatted top pin
+                    self.formatted_main_pin,   # formatted main pin
+                    self.formatted_bottom_pin,     # formatted bottom pin
 
-                # If the widgets tab is selected, make the widget data match, otherwise deselect the rest
-                if widget.tab == e.control.tabs[e.control.selected_index]:
-                    widget.data['is_active_tab'] = True
-                    self.main_pin_tabs.indicator_color = widget.data.get('color', ft.Colors.PRIMARY)
-                else:
-                    widget.data['is_active_tab'] = False
+            ]),
+            self.formatted_right_pin,    # formatted right pin
+        ]
 
-                # Save the data. This allows for selected main pin tabs to save between sessions
-                widget.save_dict()
+        # Set the master_stack as the content of this container
+        self.content = self.master_stack
 
-            self.update()
+    # Called when selected new tab in the main pin
+    def main_pin_tab_change(self, e: ft.ControlEvent):
+        ''' Updates the widgets data to reflect the new active tab '''
 
+        # Run through our visible main pin widgets
+        for widget in self.visible_main_controls:
 
+            # If the widgets tab is selected, make the widget data match, otherwise deselect the rest
+            if widget.tab == e.control.tabs[e.control.selected_index]:
+                widget.data['is_active_tab'] = True
+                self.main_pin_tabs.indicator_color = widget.data.get('color', ft.Colors.PRIMARY)
+            else:
+                widget.data['is_active_tab'] = False
 
-        # Main pin is rendered as a tab control, so we won't use dividers and will use different logic
-        visible_main_controls = [control for control in self.main_pin.controls if getattr(control, 'visible', True)]
-        #print(f"Visible main pin controls: {len(visible_main_controls)}")
-        if len(visible_main_controls) > 1:
-            print("More than 1 pin in main pin")
+            # Save our layout. This allows for selected main pin tabs to save between sessions
+            widget.save_layout()
+
+        self.update()
 
+    # Called when our main pin changes
+    def format_main_pin(self):
+        ''' Sets what our main pin shows: our main pin row if it has multiple widgets, the widget itself if it has one, or an empty container '''
+
+        # Main pin is rendered as a tab control, so we won't use dividers and will use different logic
+        self.visible_main_controls = [control for control in self.main_pin.controls if getattr(control, 'visible', True)]
+        if len(self.visible_main_controls) > 1:
 
             # PC: Save tabs as variable, change active color to match widget color when tab change
                 
             # Temporary
             self.main_pin_tabs = ft.Tabs(
                 animation_duration=0,
-                on_change=main_pin_tab_change,
+                on_change=self.main_pin_tab_change,
                 expand=True, 
                 
                 length=1,
                 content=ft.Column([
                     ft.TabBar(
-                        tabs=[widget.tab for widget in visible_main_controls],
+                        tabs=[widget.tab for widget in self.visible_main_controls],
                         divider_color=ft.Colors.TRANSPARENT,
                         padding=ft.Padding.all(0),
                         label_padding=ft.Padding.only(left=6, right=6, top=0, bottom=0),
@@ -534,125 +525,84 @@ class Workspace(ft.Container):
                     ),
                     ft.TabBarView(
                         expand=True,
-                        controls=[widget.body_container for widget in visible_main_controls],
+                        controls=[widget.body_container for widget in self.visible_main_controls],
                     ),
                 ]),    # Gives our tab control here   
             )
-            
-                    
 
-            # Stick it in a container for styling
-            formatted_main_pin = ft.Container(
-                
-                expand=True, 
-            
-                border_radius=ft.BorderRadius.all(8),
-            
-                gradient=dark_gradient,
-                animate=ft.Animation(300, ft.AnimationCurve.EASE_OUT),
-                margin=ft.Margin.all(0),
-                padding=ft.Padding.only(top=0, bottom=8, left=8, right=8),
-                content=self.main_pin_tabs
-                )
-            
-            formatted_main_pin = self.main_pin
-
-            #print(len(tabs.tabs), " tabs added to main pin")
+            self.formatted_main_pin.content = self.main_pin
 
         else:
+            self.formatted_main_pin.content = self.visible_main_controls[0] if len(self.visible_main_controls) == 1 else ft.Container(expand=True)
 
-            formatted_main_pin = visible_main_controls[0] if len(visible_main_controls) == 1 else ft.Container(expand=True)
-
-        
-        # Formatted pin locations that hold our pins, and our resizer gesture detectors.
-        # Main pin is always expanded and has no resizer, so it doesnt need to be formatted
-        formatted_top_pin = ft.Column(spacing=0, controls=[self.top_pin, top_pin_resizer])
-        formatted_left_pin = ft.Row(spacing=0, controls=[self.left_pin, left_pin_resizer]) 
-        formatted_right_pin = ft.Row(spacing=0, controls=[right_pin_resizer, self.right_pin])  # Right pin formatting row
-        formatted_bottom_pin = ft.Column(spacing=0, controls=[bottom_pin_resizer, self.bottom_pin])  # Bottom pin formatting column
-
-        # Check if our pins have any visible widgets or not, so if they should show up on screen
-        # Check if top pin is empty. If yes, hide the formatted pin
-        if len(self.top_pin.controls) == 0:
-            formatted_top_pin.visible = False
-        # If top pin not empty, make sure there is at least one visible widget
-        elif all(obj.visible == False for obj in self.top_pin.controls[:]):
-            formatted_top_pin.visible = False
-        else:   # If not empty, check if any of the widgets are visible
-            for obj in self.top_pin.controls:
-                if obj.visible == True:     # If any widgets are visible, show our formatted pin
-                    formatted_top_pin.visible = True
-                    break   # No need to keep checking if at least one is visible
-            # Makes sure our height is set correctly
-            if self.top_pin.height < self.minimum_pin_height:
-                self.top_pin.height = self.minimum_pin_height
-
-        # Left pin
-        if len(self.left_pin.controls) == 0:
-            formatted_left_pin.visible = False
-        elif all(obj.visible == False for obj in self.left_pin.controls[:]):
-            formatted_left_pin.visible = False
-        else:
-            for obj in self.left_pin.controls:
-                if obj.visible == True:
-                    formatted_left_pin.visible = True
-                    break
-            if self.left_pin.width < self.minimum_pin_width:
-                self.left_pin.width = self.minimum_pin_width
-
-        # Right pin
-        if len(self.right_pin.controls) == 0:
-            formatted_right_pin.visible = False
-        elif all(obj.visible == False for obj in self.right_pin.controls[:]):
-            formatted_right_pin.visible = False
-        else:
-            for obj in self.right_pin.controls:
-                if obj.visible == True:
-                    formatted_right_pin.visible = True
-                    break
-            if self.right_pin.width < self.minimum_pin_width:
-                self.right_pin.width = self.minimum_pin_width
-
-        # Bottom pin
-        if len(self.bottom_pin.controls) == 0:
-            formatted_bottom_pin.visible = False
-        elif all(obj.visible == False for obj in self.bottom_pin.controls[:]):
-            formatted_bottom_pin.visible = False
-        else:
-            for obj in self.bottom_pin.controls:
-                if obj.visible == True:
-                    formatted_bottom_pin.visible = True
-                    break
-            if self.bottom_pin.height < self.minimum_pin_height:
-                self.bottom_pin.height = self.minimum_pin_height
+    # Called when our other pins change
+    def format_pin(self, formatted_pin: ft.Control, pin: ft.Control, sizes_height: bool):
+        ''' Shows our formatted pin only if it has visible widgets, and makes sure its size is right.
+        Our top and bottom pins are sized by their height, our left and right pins by their width '''
 
+        # Check if our pin has any visible widgets or not, so if it should show up on screen
+        formatted_pin.visible = any(obj.visible == True for obj in pin.controls)
 
-        
-
-        # Format our pins on the page
-        self.widgets.controls.clear()
-        self.widgets.controls = [
-            formatted_left_pin,    # formatted left pin
-            ft.Column(
-                expand=True, spacing=0, 
-                controls=[
-                    formatted_top_pin,    # formatted top pin
-                    formatted_main_pin,   # formatted main pin
-                    #self.main_pin_tabs,   # main pin as tab control
-                    formatted_bottom_pin,     # formatted bottom pin
+        # Makes sure our size is set correctly
+        if formatted_pin.visible:
+            if sizes_height and pin.height < self.minimum_pin_height:
+                pin.height = self.minimum_pin_height
+            elif not sizes_height and pin.width < self.minimum_pin_width:
+                pin.width = self.minimum_pin_width
 
-            ]),
-            formatted_right_pin,    # formatted right pin
-        ]
+    # Called when we need to reload our workspace content, especially after pin drags
+    def reload_workspace(self):
+        ''' Applies any changes to our pins, then sends only the pins that changed to the page '''
 
-        # Set the master_stack as the content of this container
-        self.content = self.master_stack
+        # Inside a batch, we reload once when it ends
+        if self.story.story_batch.active:
+            self.story.story_batch.workspace_changed = True
+            return
 
-        # Finally update the UI
+        # Our formatted pins and resizers are only built once
+        first_load = self.formatted_main_pin is None
+        if first_load:
+            self.build_layout()
+
+        # Make sure our widgets are arranged correctly, and see which pins changed
+        changed_pins = self.arrange_widgets()
+
+        # Our main pin also changes if its active tab did
+        main_tab_state = tuple((id(widget), widget.data.get('is_active_tab', False)) for widget in self.main_pin.controls)
+        if main_tab_state != self.main_tab_state:
+            self.main_tab_state = main_tab_state
+            changed_pins.add("main")
+
+        # Format only the pins that changed, and collect what we need to send
+        changed_controls = []
+        formatted_pins = {
+            "top": (self.formatted_top_pin, self.top_pin, True),
+            "left": (self.formatted_left_pin, self.left_pin, False),
+            "right": (self.formatted_right_pin, self.right_pin, False),
+            "bottom": (self.formatted_bottom_pin, self.bottom_pin, True),
+        }
+        for pin_location, (formatted_pin, pin, sizes_height) in formatted_pins.items():
+            if pin_location in changed_pins or first_load:
+                self.format_pin(formatted_pin, pin, sizes_height)
+                changed_controls.append(formatted_pin)
+
+        if "main" in changed_pins or first_load:
+            self.format_main_pin()
+            changed_controls.append(self.formatted_main_pin)
+
+        # Did any pin show or hide? That resizes our main pin too
+        pin_visibility = {pin_location: formatted_pin.visible for pin_location, (formatted_pin, _, _) in formatted_pins.items()}
+        visibility_changed = pin_visibility != self.pin_visibility
+        self.pin_visibility = pin_visibility
+
+        # Finally update the UI. If only one pin changed, we only send that pin.
+        # Widgets moving between pins (or pins showing/hiding) send our pins row, whose controls are stable so only the changes go out
         try: 
-            self.update()
+            if first_load:
+                self.update()
+            elif len(changed_controls) == 1 and not visibility_changed:
+                changed_controls[0].update()
+            elif changed_controls:
+                self.widgets.update()
         except:
             self.p.update()
-
-
-        
@@ -0,0 +1,126 @@
+'''
+Shared setup for our tests. Our tests import our app code straight from src, and never touch a real flet page:
+Flet is swapped for a stand in where every control just keeps the values its given, so our models can be built without a client.
+Our app data (settings, stories, caches) goes in a temporary folder.
+'''
+
+import os
+import sys
+import types
+import tempfile
+import pytest
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_PATH not in sys.path:
+    sys.path.insert(0, SRC_PATH)
+
+# Our data paths are read when they're first imported, so this has to be set before any of our app code is
+os.environ["FLET_APP_STORAGE_DATA"] = tempfile.mkdtemp(prefix="storyboard_tests_")
+
+
+class Stub_Value(str):
+    ''' Stands in for flet enum values (ft.Colors.PRIMARY) and class helpers (ft.Padding.only), which can also be called '''
+
+    def __call__(self, *args, **kwargs):
+        return Control(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub_Value(f"{self}.{name}")
+
+
+class Stub_Meta(type):
+    def __getattr__(cls, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub_Value(name.lower())
+
+
+class Control(metaclass=Stub_Meta):
+    ''' Stands in for every flet control. Keeps whatever its given, and updating it does nothing '''
+
+    # Attributes that hold lists of child controls or shapes
+    LIST_ATTRIBUTES = ("controls", "shapes", "views", "overlay", "elements", "items", "actions", "tabs")
+
+    def __init__(self, *args, **kwargs):
+        if args and isinstance(args[0], list):
+            self.controls = list(args[0])
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        if name in Control.LIST_ATTRIBUTES:
+            value = []
+            setattr(self, name, value)
+            return value
+
+        return None
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+def make_flet_module(name: str) -> types.ModuleType:
+    ''' Returns a module where every capitalized name is its own control class, and everything else is a callable helper '''
+
+    module = types.ModuleType(name)
+    classes = {}
+
+    def module_getattr(attribute: str):
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)
+
+        if attribute[:1].isupper():
+            if attribute not in classes:
+                classes[attribute] = Stub_Meta(attribute, (Control,), {})
+            return classes[attribute]
+
+        return Stub_Value(attribute)
+
+    module.__getattr__ = module_getattr
+    return module
+
+
+flet = make_flet_module("flet")
+flet.canvas = make_flet_module("flet.canvas")
+sys.modules["flet"] = flet
+sys.modules["flet.canvas"] = flet.canvas
+
+
+
+class Fake_Page(flet.Page):
+    ''' A page that's never connected to a client '''
+
+    def __init__(self):
+        super().__init__()
+        self.route = "/"
+        self.views = []
+        self.width, self.height = 1920, 1080
+
+    def show_dialog(self, dialog):
+        pass
+
+    def open(self, control):
+        pass
+
+
+@pytest.fixture
+def page():
+    return Fake_Page()
+
+
+@pytest.fixture
+def settings(page, monkeypatch):
+    ''' Our app's settings, saved in our temporary app data '''
+    from models.app import app
+    from models.views.settings import Settings
+    from constants import data_paths
+
+    settings = Settings(page=page, file_path=os.path.join(data_paths.app_data_path, "settings.json"), data=None)
+    monkeypatch.setattr(app, "settings", settings)
+    return settings
@@ -0,0 +1,137 @@
+'''
+Our exports are split into bands that only get the strokes touching them, and are written band by band as PNG, JPEG, or SVG.
+'''
+
+import zlib
+import struct
+import pytest
+import xml.etree.ElementTree as ElementTree
+from handlers import canvas_export
+from handlers.canvas_export import export_drawing, split_bands, BAND_HEIGHT
+from handlers.canvas_paths import parse_color
+
+
+def stroke(x: float, y: float, length: float = 10, color: str = "red", blend_mode: str = "src_over") -> dict:
+    return {
+        'elements': [{'type': 'moveto', 'x': x, 'y': y}, {'type': 'lineto', 'x': x, 'y': y + length}],
+        'paint': {'color': color, 'stroke_width': 2, 'style': "stroke", 'blend_mode': blend_mode},
+    }
+
+
+def read_png(file_path: str) -> tuple:
+    ''' Returns the (width, height, rows) of an RGBA PNG we wrote, with each rows filter byte checked and dropped '''
+
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    assert data.startswith(b"\x89PNG\r\n\x1a\n")
+
+    position, chunks = 8, []
+    while position < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        chunk_data = data[position + 8:position + 8 + length]
+        assert struct.unpack(">I", data[position + 8 + length:position + 12 + length])[0] == zlib.crc32(chunk_type + chunk_data)
+        chunks.append((chunk_type, chunk_data))
+        position += 12 + length
+
+    assert chunks[0][0] == b"IHDR" and chunks[-1][0] == b"IEND"
+    width, height = struct.unpack(">II", chunks[0][1][:8])
+
+    pixels = zlib.decompress(b"".join(chunk_data for chunk_type, chunk_data in chunks if chunk_type == b"IDAT"))
+    row_size = width * 4 + 1
+    rows = [pixels[row * row_size:(row + 1) * row_size] for row in range(height)]
+    assert all(row[0] == 0 for row in rows)
+
+    return width, height, [row[1:] for row in rows]
+
+
+def test_bands_cover_our_image_and_only_get_strokes_touching_them():
+    top, bottom = stroke(5, 10), stroke(5, BAND_HEIGHT * 2 + 10)
+    height = BAND_HEIGHT * 2 + 50
+
+    bands = split_bands([top, bottom], [(5, BAND_HEIGHT + 60, None, {})], height, origin_y=0, scale=1)
+
+    assert [band[0] for band in bands] == [0, BAND_HEIGHT, BAND_HEIGHT * 2]
+    assert [band[1] for band in bands] == [BAND_HEIGHT, BAND_HEIGHT, 50]
+    assert [band[3] for band in bands] == [[top], [], [bottom]]
+    assert [len(band[4]) for band in bands] == [0, 1, 0]
+
+    # Scaled down, everything lands in our first band
+    bands = split_bands([top, bottom], [], BAND_HEIGHT, origin_y=0, scale=0.25)
+    assert len(bands) == 1 and bands[0][3] == [top, bottom]
+
+
+def test_png_bands_are_written_as_they_finish(tmp_path):
+    file_path = str(tmp_path / "bands.png")
+    width, height = 3, BAND_HEIGHT + 2
+    written = []
+
+    # Each band is one solid color, so we can tell them apart
+    def bands():
+        for band_top, band_height, color in ((0, BAND_HEIGHT, b"\xff\x00\x00\xff"), (BAND_HEIGHT, 2, b"\x00\x00\xff\x80")):
+            yield band_top, band_height, color * width * band_height
+            written.append(band_top)
+
+    canvas_export._write_png(file_path, width, height, bands(), quality=90)
+
+    assert written == [0, BAND_HEIGHT]
+    assert read_png(file_path)[:2] == (width, height)
+    rows = read_png(file_path)[2]
+    assert rows[0] == b"\xff\x00\x00\xff" * width
+    assert rows[BAND_HEIGHT - 1] == b"\xff\x00\x00\xff" * width
+    assert rows[BAND_HEIGHT] == b"\x00\x00\xff\x80" * width
+
+
+def test_svg_export_writes_our_strokes_and_erasers(tmp_path):
+    file_path = str(tmp_path / "drawing.svg")
+    paths = [stroke(10, 10), stroke(10, 10, blend_mode="clear"), stroke(30, 10, color="blue")]
+
+    export_drawing(file_path, paths, [], 200, 100, origin_x=5, origin_y=0, scale=2, background="white")
+
+    root = ElementTree.parse(file_path).getroot()
+    namespace = "{http://www.w3.org/2000/svg}"
+    assert (root.get("width"), root.get("height")) == ("200", "100")
+
+    # Our background, then everything drawn scaled into our image
+    assert root.find(f"{namespace}rect").get("fill") == "rgb(255,255,255)"
+    group = root.find(f"{namespace}g")
+    assert group.get("transform") == "scale(2) translate(-5 0)"
+
+    # Our eraser masks the red stroke drawn before it, but not the blue one after
+    mask = next(root.iter(f"{namespace}mask"))
+    assert mask.find(f"{namespace}path").get("d") == "M10 10 L10 20"
+
+    masked = group.find(f"{namespace}g")
+    assert masked.get("mask") == f"url(#{mask.get('id')})"
+    assert [path.get("stroke") for path in masked.findall(f"{namespace}path")] == ["rgb({},{},{})".format(*parse_color("red")[:3])]
+    assert [path.get("stroke") for path in group.findall(f"{namespace}path")] == ["rgb({},{},{})".format(*parse_color("blue")[:3])]
+
+
+def test_png_and_jpeg_exports_draw_our_strokes(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+
+    paths = [{
+        'elements': [{'type': 'moveto', 'x': 0, 'y': 0}, {'type': 'lineto', 'x': 40, 'y': 0}, {'type': 'lineto', 'x': 40, 'y': 300}, {'type': 'lineto', 'x': 0, 'y': 300}],
+        'paint': {'color': "red", 'style': "fill"},
+    }]
+    height = BAND_HEIGHT * 2 + 44
+
+    png_path = str(tmp_path / "drawing.png")
+    export_drawing(png_path, paths, [], 80, height, origin_x=0, origin_y=0, scale=1)
+
+    width, png_height, rows = read_png(png_path)
+    assert (width, png_height) == (80, height)
+    with Image.open(png_path) as image:
+        assert image.getpixel((20, BAND_HEIGHT + 10)) == parse_color("red")
+        assert image.getpixel((60, BAND_HEIGHT + 10))[3] == 0
+
+    jpeg_path = str(tmp_path / "drawing.jpg")
+    export_drawing(jpeg_path, paths, [], 80, height, origin_x=0, origin_y=0, scale=1)
+
+    with Image.open(jpeg_path) as image:
+        assert image.size == (80, height)
+        pixel = image.getpixel((20, BAND_HEIGHT + 10))
+        assert all(abs(value - expected) < 16 for value, expected in zip(pixel, parse_color("red")))
+        assert min(image.getpixel((70, BAND_HEIGHT + 10))) > 200
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["drawing.jpg", "drawing.png"]
@@ -0,0 +1,102 @@
+'''
+Routing away from a story and back should just resume it. Nothing in it gets built again.
+'''
+
+import asyncio
+import collections
+import flet as ft
+from models.app import app
+from models.widget import Widget
+from models.views.story import Story
+from handlers.route_change import route_change
+from handlers.save_scheduler import save_scheduler
+from handlers import storage
+import os
+
+
+def test_no_widget_constructed_twice_across_route_revisits(monkeypatch, page, settings):
+
+    # Count every widget we build, by which widget it is
+    built = collections.Counter()
+    widget_init = Widget.__init__
+
+    def counting_init(self, title, page, directory_path, story, data=None):
+        built[(type(self).__name__, directory_path, title)] += 1
+        widget_init(self, title, page, directory_path, story, data)
+
+    monkeypatch.setattr(Widget, "__init__", counting_init)
+    async def run():
+        story = Story("Revisit Story", page, data=None)
+
+        # Some widgets that were open last session (built before our view shows), and some that weren't (filled in after)
+        for i in range(6):
+            tag = "chapter" if i % 2 == 0 else "note"
+            storage.write_json(
+                os.path.join(story.data['content_directory_path'], f"Widget {i}.json"),
+                {'title': f"Widget {i}", 'tag': tag, 'visible': i < 2},
+            )
+        app.stories[story.title] = story
+        app.story_catalog.update_story(story)
+
+        async def go(route: str):
+            page.route = route
+            await route_change(ft.RouteChangeEvent(page=page, route=route))
+
+            # Let our story finish filling in its widgets before we move on
+            if story.fill_task is not None:
+                await story.fill_task
+
+        await go(story.route)
+        first_visit = dict(built)
+        assert story.state == "ready"
+        assert sum(1 for tag, _, _ in first_visit if tag in ("Chapter", "Note")) == 6
+
+        for route in ("/home", story.route, "/settings", story.route):
+            await go(route)
+
+        return first_visit
+
+    try:
+        first_visit = asyncio.run(run())
+    finally:
+        save_scheduler.flush()
+        app.stories.clear()
+
+    assert dict(built) == first_visit
+    assert all(count == 1 for count in built.values()), [key for key, count in built.items() if count > 1]
+
+
+def test_widgets_created_while_filling_in_are_added_once(monkeypatch, page, settings):
+    story = Story("Fill Story", page, data=None)
+    for i in range(4):
+        storage.write_json(
+            os.path.join(story.data['content_directory_path'], f"Hidden {i}.json"),
+            {'title': f"Hidden {i}", 'tag': "note", 'visible': False},
+        )
+
+    # Create a chapter while our fill yields between chunks, like a user would
+    build_widget_files = Story.build_widget_files
+    created = []
+
+    async def building_while_creating(self, *args, **kwargs):
+        if self.state == "ready" and not created:
+            created.append(self.create_chapter("Created While Filling"))
+        return await build_widget_files(self, *args, **kwargs)
+
+    monkeypatch.setattr(Story, "build_widget_files", building_while_creating)
+
+    async def run():
+        app.stories[story.title] = story
+        await story.startup()
+        if story.fill_task is not None:
+            await story.fill_task
+
+    try:
+        asyncio.run(run())
+    finally:
+        save_scheduler.flush()
+        app.stories.clear()
+
+    assert len(story.widgets) == len({id(widget) for widget in story.widgets})
+    assert sum(1 for widget in story.widgets if widget.title == "Created While Filling") == 1
+    assert sum(1 for widget in story.widgets if widget.title.startswith("Hidden")) == 4
@@ -0,0 +1,26 @@
+'''
+Our save scheduler writes a snapshot of data as it was when saved, even if the data keeps changing before its written.
+'''
+
+import json
+import types
+from handlers.save_scheduler import Save_Scheduler
+
+
+def test_writes_our_data_as_it_was_when_scheduled(tmp_path):
+    file_path = str(tmp_path / "widget.json")
+    scheduler = Save_Scheduler(save_delay=60)
+    widget = types.SimpleNamespace(data={'title': "Widget", 'tags': ["one"], 'paint': {'color': "red"}})
+
+    scheduler.schedule(file_path, widget)
+
+    # Changed after saving, but before our write
+    widget.data['tags'].append("two")
+    widget.data['paint']['color'] = "blue"
+
+    scheduler.flush()
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        assert json.load(f) == {'title': "Widget", 'tags': ["one"], 'paint': {'color': "red"}}
+
+    assert scheduler.save_requests == scheduler.file_writes == 1
@@ -0,0 +1,133 @@
+'''
+Operations that touch several widgets (creating from our rails, dragging between pins) run inside a story batch,
+So each file is written once, and our rail and workspace refresh once, no matter how many widgets changed.
+'''
+
+import os
+import asyncio
+import collections
+import types
+from models.app import app
+from models.views.story import Story
+from ui.workspace import Workspace
+from handlers.story_batch import Story_Batch
+from handlers.save_scheduler import save_scheduler
+from handlers import storage
+
+
+def load_story(page, title: str) -> Story:
+    ''' Builds and starts a story the same way routing to it does, and waits for it to finish filling in '''
+
+    async def run():
+        story = Story(title, page, data=None)
+        app.stories[story.title] = story
+        await story.startup()
+        if story.fill_task is not None:
+            await story.fill_task
+        return story
+
+    story = asyncio.run(run())
+    save_scheduler.flush()
+    return story
+
+
+def count_work(monkeypatch, story: Story) -> dict:
+    ''' Counts the file writes, rail refreshes, workspace reloads, and page updates that actually happen (not the ones a batch holds back),
+    And how many batches ran '''
+
+    counts = {'writes': collections.Counter(), 'rail': 0, 'workspace': 0, 'page': 0, 'batches': 0}
+
+    write_text = storage.write_text
+    def counting_write(file_path, text, backup=False):
+        counts['writes'][file_path] += 1
+        return write_text(file_path, text, backup=backup)
+
+    update_rail = Story.update_rail
+    def counting_update_rail(self, action, *args):
+        if not self.story_batch.active:
+            counts['rail'] += 1
+        return update_rail(self, action, *args)
+
+    reload_workspace = Workspace.reload_workspace
+    def counting_reload_workspace(self):
+        if not self.story.story_batch.active:
+            counts['workspace'] += 1
+        return reload_workspace(self)
+
+    page_update = story.p.update
+    def counting_page_update(*args, **kwargs):
+        counts['page'] += 1
+        return page_update(*args, **kwargs)
+
+    apply = Story_Batch.apply
+    def counting_apply(self):
+        counts['batches'] += 1
+        return apply(self)
+
+    monkeypatch.setattr(storage, "write_text", counting_write)
+    monkeypatch.setattr(Story_Batch, "apply", counting_apply)
+    monkeypatch.setattr(story.p, "update", counting_page_update)
+    monkeypatch.setattr(Story, "update_rail", counting_update_rail)
+    monkeypatch.setattr(Workspace, "reload_workspace", counting_reload_workspace)
+    return counts
+
+
+def test_creating_from_our_rail_saves_and_refreshes_once(monkeypatch, page, settings):
+    story = load_story(page, "Rail Batch Story")
+    counts = count_work(monkeypatch, story)
+
+    rail = story.active_rail.content
+    rail.item_is_unique = True
+    rail.submit_item(types.SimpleNamespace(control=types.SimpleNamespace(value="New Note", data="note")))
+    save_scheduler.flush()
+
+    note = story.registry.with_title("New Note", "note")[0]
+    assert counts['writes'][os.path.join(note.directory_path, "New Note.json")] == 1
+    assert all(count == 1 for count in counts['writes'].values())
+    assert counts['rail'] == 1
+    assert counts['workspace'] == 1
+    assert counts['page'] == counts['batches'] == 1
+
+
+def test_creating_a_canvas_from_our_rail_saves_and_refreshes_once(monkeypatch, page, settings):
+    story = load_story(page, "Canvas Batch Story")
+    counts = count_work(monkeypatch, story)
+
+    rail = story.active_rail.content
+    rail.item_is_unique = True
+    rail.submit_item(types.SimpleNamespace(control=types.SimpleNamespace(value="New Canvas", data="canvas")))
+    save_scheduler.flush()
+
+    canvas = story.registry.with_title("New Canvas", "canvas")[0]
+    assert counts['writes'][os.path.join(canvas.directory_path, "New Canvas.json")] == 1
+    assert all(count == 1 for count in counts['writes'].values())
+    assert counts['rail'] == 1
+    assert counts['page'] == counts['batches'] == 1
+
+
+def test_dragging_between_pins_saves_and_reloads_once(monkeypatch, page, settings):
+    story = load_story(page, "Pin Batch Story")
+
+    # A few tabs in our main pin, so moving one to it changes all of them
+    for i in range(4):
+        story.create_note(f"Tab {i}")
+    save_scheduler.flush()
+
+    story.create_note("Moved")
+    moved = story.registry.with_title("Moved", "note")[0]
+    moved.data['pin_location'] = "left"
+    moved.save_layout()
+    save_scheduler.flush()
+
+    counts = count_work(monkeypatch, story)
+    target = types.SimpleNamespace(content=types.SimpleNamespace(opacity=1, update=lambda: None))
+    event = types.SimpleNamespace(control=target, src=types.SimpleNamespace(data=moved.data['key']))
+    story.workspace.pin_drag_accept(event, "main")
+    save_scheduler.flush()
+
+    assert counts['writes'][story.layout.file_path] == 1
+    assert all(count == 1 for count in counts['writes'].values())
+    assert counts['workspace'] == 1
+    assert counts['page'] == counts['batches'] == 1
+    assert moved.data['pin_location'] == "main" and moved.data['is_active_tab']
+    assert sum(1 for widget in story.workspace.main_pin.controls if widget.data['is_active_tab']) == 1
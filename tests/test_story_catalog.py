@@ -0,0 +1,97 @@
+'''
+Our story catalog keeps its paths relative to our stories directory, re-reads stories whose files changed, and forgets deleted stories.
+'''
+
+import os
+import json
+import shutil
+import asyncio
+from constants import data_paths
+from handlers import storage
+from handlers.save_scheduler import save_scheduler
+from models.app import app
+from models.story_catalog import Story_Catalog
+from models.views.story import Story
+
+
+def write_story_file(folder: str, data: dict) -> str:
+    ''' Writes a story json file the way a story saves it, and returns its path '''
+
+    file_path = os.path.join(data_paths.stories_directory_path, folder, f"{folder}.json")
+    storage.write_json(file_path, data)
+    return file_path
+
+
+def test_catalog_paths_are_relative_and_stale_entries_are_read_again(tmp_path):
+    file_path = write_story_file("Catalog Story", {'title': "Catalog Story", 'route': "/Catalog Story"})
+
+    catalog = Story_Catalog()
+    catalog.file_path = str(tmp_path / "story_catalog.json")
+    catalog.load()
+
+    entry = catalog.get_entry("/Catalog Story")
+    assert entry['file_path'] == os.path.join("Catalog Story", "Catalog Story.json")
+    assert catalog.read_story_data("/Catalog Story")['title'] == "Catalog Story"
+
+    # Catalogs from before stored full paths
+    with open(catalog.file_path, "r", encoding='utf-8') as f:
+        catalog_data = json.load(f)
+    catalog_data['stories']["/Catalog Story"]['file_path'] = file_path
+    storage.write_json(catalog.file_path, catalog_data)
+
+    catalog.load()
+    assert catalog.get_entry("/Catalog Story")['file_path'] == os.path.join("Catalog Story", "Catalog Story.json")
+
+    # Changed outside of the app, so its new title is picked up
+    write_story_file("Catalog Story", {'title': "Renamed Story", 'route': "/Catalog Story"})
+    os.utime(file_path, (entry['mtime'] + 10, entry['mtime'] + 10))
+
+    catalog.load()
+    assert catalog.get_entry("/Catalog Story")['title'] == "Renamed Story"
+
+    # Unchanged stories are left alone
+    mtime = catalog.get_entry("/Catalog Story")['mtime']
+    assert not catalog.reconcile()
+    assert catalog.get_entry("/Catalog Story")['mtime'] == mtime
+
+
+def test_stories_deleted_outside_the_app_are_dropped(tmp_path):
+    file_path = write_story_file("Deleted Story", {'title': "Deleted Story", 'route': "/Deleted Story"})
+
+    catalog = Story_Catalog()
+    catalog.file_path = str(tmp_path / "story_catalog.json")
+    catalog.load()
+    assert catalog.get_entry("/Deleted Story") is not None
+
+    shutil.rmtree(os.path.dirname(file_path))
+
+    catalog.load()
+    assert catalog.get_entry("/Deleted Story") is None
+
+
+def test_deleting_a_story_removes_it_from_our_catalog(page, settings):
+    routes = []
+
+    async def push_route(route):
+        routes.append(route)
+
+    page.push_route = push_route
+
+    story = Story("Doomed Story", page, data=None)
+    save_scheduler.flush()
+    app.stories[story.title] = story
+    app.story_catalog.update_story(story)
+    settings.data['active_story'] = story.route
+
+    asyncio.run(app.delete_story(story, page))
+
+    assert not os.path.exists(os.path.dirname(story.get_file_path()))
+    assert app.story_catalog.get_entry(story.route) is None
+    assert story.title not in app.stories
+    assert settings.data['active_story'] == "/"
+    assert routes == ["/home"]
+
+    # And it stays gone next launch
+    catalog = Story_Catalog()
+    catalog.load()
+    assert catalog.get_entry(story.route) is None
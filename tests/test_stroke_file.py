@@ -0,0 +1,86 @@
+'''
+Our stroke files survive crashes: torn records are dropped, and a journal is never folded into our snapshot twice.
+'''
+
+import os
+import shutil
+from handlers.stroke_file import Stroke_File, HEADER, MAGIC, VERSION
+
+
+def stroke(x: float, y: float) -> dict:
+    return {'elements': [{'type': 'moveto', 'x': x, 'y': y}, {'type': 'lineto', 'x': x + 10, 'y': y + 10}], 'paint': {'color': "red"}}
+
+
+def starts(paths: list) -> list:
+    return [path['elements'][0]['x'] for path in paths]
+
+
+def test_truncated_last_record_is_skipped_and_cut_off(tmp_path):
+    file_path = str(tmp_path / "drawing.strokes")
+
+    stroke_file = Stroke_File(file_path)
+    stroke_file.append(paths=[stroke(1, 1)])
+    stroke_file.append(paths=[stroke(2, 2)])
+
+    # Crash part way through writing our second stroke
+    full_size = os.path.getsize(stroke_file.journal_path)
+    with open(stroke_file.journal_path, "r+b") as f:
+        f.truncate(full_size - 5)
+
+    reopened = Stroke_File(file_path)
+    paths, _ = reopened.read()
+    assert starts(paths) == [1]
+
+    # Our next append goes right after our last complete record, so the torn bytes are gone
+    valid_size = reopened.valid_size
+    written = reopened.append(paths=[stroke(3, 3)])
+    assert os.path.getsize(reopened.journal_path) == valid_size + written
+    assert starts(Stroke_File(file_path).read()[0]) == [1, 3]
+
+
+def test_compaction_folds_the_journal_exactly_once(tmp_path):
+    file_path = str(tmp_path / "drawing.strokes")
+
+    stroke_file = Stroke_File(file_path)
+    stroke_file.append(paths=[stroke(1, 1), stroke(2, 2)])
+    journal_copy = str(tmp_path / "journal.copy")
+    shutil.copy(stroke_file.journal_path, journal_copy)
+
+    stroke_file.compact(wait=True)
+    assert not os.path.exists(stroke_file.journal_path)
+    assert not os.path.exists(stroke_file.compacting_path)
+
+    # Crash after writing our snapshot, but before removing the journal we folded into it
+    shutil.copy(journal_copy, stroke_file.compacting_path)
+
+    reopened = Stroke_File(file_path)
+    paths, _ = reopened.read()
+    reopened.wait_for_compaction()
+
+    assert starts(paths) == [1, 2]
+    assert not os.path.exists(reopened.compacting_path)
+    assert starts(Stroke_File(file_path).read()[0]) == [1, 2]
+
+
+def test_journal_torn_after_its_header_gets_a_new_id(tmp_path):
+    file_path = str(tmp_path / "drawing.strokes")
+
+    # Crash right after writing our journal header, before its id
+    with open(file_path + ".journal", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION))
+
+    stroke_file = Stroke_File(file_path)
+    stroke_file.append(paths=[stroke(1, 1)])
+    assert stroke_file.journal_id is not None
+    assert Stroke_File(file_path)._read_file(stroke_file.journal_path)[2] == stroke_file.journal_id
+
+    # So folding it and crashing before it's removed still only loads it once
+    journal_copy = str(tmp_path / "journal.copy")
+    shutil.copy(stroke_file.journal_path, journal_copy)
+    stroke_file.compact(wait=True)
+    shutil.copy(journal_copy, stroke_file.compacting_path)
+
+    reopened = Stroke_File(file_path)
+    paths, _ = reopened.read()
+    reopened.wait_for_compaction()
+    assert starts(paths) == [1]
@@ -0,0 +1,44 @@
+'''
+Our widget registry finds widgets in a folder and everything under it, without looking at folders outside of it.
+'''
+
+import os
+import types
+from handlers.widget_registry import Widget_Registry
+
+
+def make_widget(directory_path: str, title: str):
+    return types.SimpleNamespace(directory_path=directory_path, title=title, data={'key': os.path.join(directory_path, title), 'tag': "note"})
+
+
+def titles(widgets: list) -> list:
+    return sorted(widget.title for widget in widgets)
+
+
+def test_recursive_lookups_only_walk_folders_under_ours(tmp_path):
+    root = str(tmp_path / "Story" / "content")
+    notes = os.path.join(root, "Notes")
+
+    top = make_widget(notes, "Top")
+    nested = make_widget(os.path.join(notes, "Themes", "Dark"), "Nested")
+    sibling = make_widget(os.path.join(root, "Notes 2"), "Sibling")
+
+    registry = Widget_Registry()
+    registry.rebuild([top, nested, sibling])
+
+    assert titles(registry.in_directory(notes, recursive=True)) == ["Nested", "Top"]
+    assert titles(registry.in_directory(notes)) == ["Top"]
+    assert titles(registry.in_directory(root, recursive=True)) == ["Nested", "Sibling", "Top"]
+
+    # Moving our nested widget out drops the empty folders from our index
+    nested.directory_path = os.path.join(root, "Notes 2")
+    registry.update(nested)
+
+    assert titles(registry.in_directory(notes, recursive=True)) == ["Top"]
+    assert titles(registry.in_directory(os.path.join(root, "Notes 2"), recursive=True)) == ["Nested", "Sibling"]
+    assert os.path.normcase(os.path.join(notes, "Themes")) not in registry.subdirectories
+
+    for widget in (top, nested, sibling):
+        registry.remove(widget)
+
+    assert registry.subdirectories == {}